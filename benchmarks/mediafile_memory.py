@@ -0,0 +1,81 @@
+"""
+Benchmark de memoria de MediaFile.
+
+Compara la representación compacta actual con la antigua dataclass (Path +
+dos diccionarios + texto del motivo) construyendo N archivos repartidos en
+carpetas de series. Ambas se construyen como lo hacía cada versión: la
+antigua con el Path del escáner, los diccionarios del parser y de ffprobe y
+el texto literal del motivo que asignaba el Recommender (compartido por
+todos los archivos).
+
+Uso:
+    python -m benchmarks.mediafile_memory [--files 200000] [--per-folder 24]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.core.models import MediaFile, ReasonCode
+
+# Copia exacta de la dataclass MediaFile anterior a la representación compacta
+@dataclass
+class LegacyMediaFile:
+    path: Path
+    size: int
+    mtime: float
+    parsed_info: Dict = field(default_factory=dict)
+    metadata_info: Optional[Dict] = None
+    recommendation: str = 'REVIEW'
+    reason: str = ""
+
+def _sample_rows(count: int, per_folder: int):
+    for i in range(count):
+        folder, episode = divmod(i, per_folder)
+        yield (
+            f"/mnt/media/Series/Show {folder:05d}/Season 01/Show.{folder:05d}.S01E{episode + 1:02d}.1080p.mkv",
+            1_500_000_000 + i, 1_700_000_000.0 + i,
+            {'season': 1, 'episode': float(episode + 1)},
+            {'duration': 1420.5, 'width': 1920, 'height': 1080, 'v_codec': 'hevc'},
+        )
+
+def _measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    gc.collect()
+    return current
+
+def run(count: int, per_folder: int) -> Dict[str, float]:
+    def build_legacy():
+        return [LegacyMediaFile(Path(p), s, m, pi, mi, 'REVIEW', "Hay una versión potencialmente mejor disponible.")
+                for p, s, m, pi, mi in _sample_rows(count, per_folder)]
+
+    def build_compact():
+        return [MediaFile(p, s, m, pi, mi, 'REVIEW', ReasonCode.BETTER_VERSION_AVAILABLE)
+                for p, s, m, pi, mi in _sample_rows(count, per_folder)]
+
+    def build_lazy():
+        return [MediaFile.from_cache(p, s, m, json.dumps(pi), json.dumps(mi))
+                for p, s, m, pi, mi in _sample_rows(count, per_folder)]
+
+    results = {"files": count}
+    for name, build in (("legacy", build_legacy), ("compact", build_compact), ("compact_lazy_from_cache", build_lazy)):
+        total = _measure(build)
+        results[f"{name}_bytes"] = total
+        results[f"{name}_bytes_per_file"] = round(total / count, 1)
+    results["savings_ratio"] = round(results["legacy_bytes"] / results["compact_bytes"], 2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--per-folder", type=int, default=24)
+    args = parser.parse_args()
+    print(json.dumps(run(args.files, args.per_folder), indent=2))
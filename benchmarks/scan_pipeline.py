@@ -0,0 +1,290 @@
+"""
+Benchmark de extremo a extremo del escaneo.
+
+Genera una biblioteca de archivos dispersos (sparse: ocupan tamaño lógico
+pero casi nada en disco) con nombres, tamaños y carpetas realistas, y dos
+raíces con copias duplicadas. En lugar de ffprobe se usa un sustituto local,
+seleccionado con MetadataExtractor.set_ffmpeg_path, que devuelve metadatos
+deterministas tras una latencia configurable.
+
+Ejecuta el pipeline completo del proceso de escaneo que lanza la interfaz
+(ScanProcessWorker -> src.core.scan_process.run) tres veces sobre la misma caché:
+  - cold: caché vacía, se sondea todo;
+  - warm: nada ha cambiado;
+  - incremental: tras modificar, añadir y borrar una parte de los archivos.
+
+Cada pasada corre en un subproceso propio para que el pico de memoria (RSS) y
+los contadores de E/S sean solo suyos. La salida es JSON: tiempos por fase
+(de src.utils.tracing; las etapas con varios hilos, como stage.probe, suman
+el tiempo de todos ellos), llamadas al sistema de lectura/escritura y bytes
+(/proc/self/io, solo Linux), uso de CPU y pico de RSS.
+
+Uso:
+    python -m benchmarks.scan_pipeline [--series 150] [--episodes 12] [--movies 300]
+                                       [--latency-ms 20] [--workdir DIR] [--keep]
+"""
+import argparse
+import io
+import json
+import os
+import pickle
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+SCENARIOS = ("cold", "warm", "incremental")
+STUB_LATENCY_ENV = "MEDIAFORGE_STUB_LATENCY_MS"
+
+WORDS = ["Dark", "Night", "River", "Empire", "Shadow", "Crown", "Signal", "Harbor", "Winter", "Ghost",
+         "Iron", "Silent", "Broken", "Golden", "Lost", "Wild", "Last", "Red", "Glass", "Echo"]
+QUALITIES = [("2160p", 3840, 2160, "hevc"), ("1080p", 1920, 1080, "h264"), ("1080p", 1920, 1080, "hevc"),
+             ("720p", 1280, 720, "h264"), ("480p", 854, 480, "mpeg4")]
+
+# Sustituto de ffprobe: responde como 'ffprobe -of json -show_format -show_streams'
+# con metadatos derivados solo del nombre del archivo (deterministas).
+STUB_FFPROBE = '''#!{python}
+import json, os, re, sys, time, zlib
+latency = float(os.environ.get("{env}", "0")) / 1000
+if latency: time.sleep(latency)
+path = sys.argv[-1]
+name = os.path.basename(path)
+if not os.path.exists(path):
+    sys.stderr.write(path + ": No such file or directory\\n"); sys.exit(1)
+width, height, codec = {qualities_by_tag}.get(next((t for t in ("2160p", "1080p", "720p", "480p") if t in name), "1080p"))
+# La duración sale del episodio o del año, no del nombre completo: las copias de un mismo contenido coinciden
+episode = re.search(r"S(\\d+)E(\\d+)|(\\d+)x(\\d+)", name, re.IGNORECASE)
+year = re.search(r"(19|20)\\d\\d", name)
+if episode:
+    season, number = [int(g) for g in episode.groups() if g]
+    duration = 1200.0 + (season * 37 + number * 11) % 1500
+else:
+    duration = 5400.0 + (int(year.group(0)) * 53 % 3600 if year else zlib.crc32(name.encode("utf-8")) % 3600)
+print(json.dumps({{
+    "streams": [{{"index": 0, "codec_type": "video", "codec_name": codec, "width": width, "height": height,
+                  "bit_rate": str(height * 4000)}},
+                {{"index": 1, "codec_type": "audio", "codec_name": "ac3", "channels": 6, "bit_rate": "448000",
+                  "tags": {{"language": "spa"}}}},
+                {{"index": 2, "codec_type": "audio", "codec_name": "aac", "channels": 2, "tags": {{"language": "en", "BPS": "128000"}}}},
+                {{"index": 3, "codec_type": "subtitle", "codec_name": "subrip", "tags": {{"language": "spa"}},
+                  "disposition": {{"forced": 1}}}}],
+    "format": {{"filename": path, "duration": "%.3f" % duration, "size": str(os.path.getsize(path)),
+                "bit_rate": str(height * 4000 + 576000)}},
+}}))
+'''
+
+def write_stub_ffprobe(directory: Path) -> Path:
+    """Crea los ejecutables 'ffprobe' y 'ffmpeg' falsos (set_ffmpeg_path exige ambos)."""
+    if sys.platform == "win32":
+        raise ValueError("El ffprobe sustituto es un script con shebang: solo funciona en Linux/macOS.")
+    directory.mkdir(parents=True, exist_ok=True)
+    qualities_by_tag = {tag: (w, h, c) for tag, w, h, c in QUALITIES}
+    source = STUB_FFPROBE.format(python=sys.executable, env=STUB_LATENCY_ENV, qualities_by_tag=repr(qualities_by_tag))
+    for name in ("ffprobe", "ffmpeg"):
+        path = directory / name
+        path.write_text(source, encoding="utf-8")
+        path.chmod(0o755)
+    return directory
+
+def _sparse_file(path: Path, size: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.sample(WORDS, rng.choice((1, 2, 3))))
+
+def generate_library(root: Path, series: int, episodes: int, movies: int, seed: int = 1234) -> Dict:
+    """
+    Crea dos raíces ('disk_a' y 'disk_b'). La segunda repite parte de las
+    series y películas con otra convención de nombres y otra calidad, como
+    ocurre con las copias reales, para que el matcher encuentre duplicados.
+    """
+    rng = random.Random(seed)
+    disk_a, disk_b = root / "disk_a", root / "disk_b"
+    files = 0
+    logical_bytes = 0
+    used_titles = set()
+
+    def unique_title():
+        while True:
+            title = _title(rng)
+            if title not in used_titles:
+                used_titles.add(title)
+                return title
+
+    for _ in range(series):
+        title, year = unique_title(), rng.randint(1995, 2024)
+        seasons = rng.choice((1, 1, 2, 3))
+        tag, *_ = rng.choice(QUALITIES)
+        copy = rng.random() < 0.35
+        copy_tag, *_ = rng.choice(QUALITIES)
+        for season in range(1, seasons + 1):
+            for episode in range(1, episodes + 1):
+                size = rng.randint(250, 2500) * 1024**2
+                name = f"{title.replace(' ', '.')}.S{season:02d}E{episode:02d}.{tag}.WEB-DL.mkv"
+                _sparse_file(disk_a / "Series" / f"{title} ({year})" / f"Season {season:02d}" / name, size)
+                files += 1; logical_bytes += size
+                if copy:
+                    size = rng.randint(250, 2500) * 1024**2
+                    name = f"{title} - {season}x{episode:02d} [{copy_tag}].mkv"
+                    _sparse_file(disk_b / "TV" / title / name, size)
+                    files += 1; logical_bytes += size
+
+    for _ in range(movies):
+        title, year = unique_title(), rng.randint(1970, 2024)
+        tag, *_ = rng.choice(QUALITIES)
+        size = rng.randint(1500, 60000) * 1024**2
+        _sparse_file(disk_a / "Movies" / f"{title} ({year})" / f"{title.replace(' ', '.')}.{year}.{tag}.BluRay.mkv", size)
+        files += 1; logical_bytes += size
+        if rng.random() < 0.25:
+            copy_tag, *_ = rng.choice(QUALITIES)
+            size = rng.randint(1500, 60000) * 1024**2
+            _sparse_file(disk_b / "Peliculas" / f"{title} ({year}) [{copy_tag}].mp4", size)
+            files += 1; logical_bytes += size
+
+    return {"roots": [str(disk_a), str(disk_b)], "files": files, "logical_bytes": logical_bytes}
+
+def apply_incremental_changes(roots: List[str], fraction: float = 0.05, seed: int = 99) -> Dict:
+    """Modifica, borra y añade una fracción de los archivos, como entre dos escaneos reales."""
+    rng = random.Random(seed)
+    all_files = sorted(p for root in roots for p in Path(root).rglob("*.mkv"))
+    count = max(1, int(len(all_files) * fraction))
+    sample = rng.sample(all_files, min(len(all_files), count * 2))
+    modified, removed = sample[:count], sample[count:]
+    for path in modified:
+        _sparse_file(path, path.stat().st_size + 1024**2)
+    for path in removed:
+        path.unlink()
+    added = 0
+    for i in range(count):
+        _sparse_file(Path(roots[0]) / "Nuevos" / f"Fresh Show {i // 10:03d}" / f"Fresh.Show.{i // 10:03d}.S01E{i % 10 + 1:02d}.1080p.mkv",
+                     rng.randint(250, 2500) * 1024**2)
+        added += 1
+    return {"modified": len(modified), "removed": len(removed), "added": added}
+
+def _proc_io() -> Dict[str, int]:
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+def _read_messages(data: bytes) -> List:
+    """Mensajes (tipo, contenido) que scan_process.run escribe en su canal."""
+    stream, messages = io.BytesIO(data), []
+    while stream.tell() < len(data):
+        messages.append(pickle.load(stream))
+    return messages
+
+def run_once(roots: List[str], stub_dir: str) -> Dict:
+    """
+    Una pasada de scan_process.run() en este proceso (se ejecuta en el
+    subproceso hijo): es lo mismo que hace el proceso que lanza
+    ScanProcessWorker, sin el hilo de la interfaz que solo reenvía mensajes.
+    """
+    from src.cli.commands import DEFAULT_PRIORITY_ORDER
+    from src.core import scan_process
+    from src.core.cache_manager import DB_FILE
+    from src.utils.tracing import tracer
+
+    tracer.enabled = True
+    config = {"paths": roots, "db_path": DB_FILE, "priority_order": DEFAULT_PRIORITY_ORDER, "ffmpeg_path": stub_dir}
+    channel = io.BytesIO()
+
+    io_before, usage_before = _proc_io(), resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    exit_code = scan_process.run(config, channel)
+    wall = time.perf_counter() - start
+    io_after, usage = _proc_io(), resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    # Como ScanProcessWorker: una entrega repetida de una serie o película sustituye a la anterior
+    series, movies, errors = {}, {}, []
+    for kind, payload in _read_messages(channel.getvalue()):
+        if kind == "groups":
+            series.update(payload["series"])
+            movies.update((group.identity, group) for group in payload["movies"])
+        elif kind == "error": errors.append(payload)
+    if exit_code != 0 and not errors: errors.append(f"scan_process.run devolvió {exit_code}")
+
+    summary = tracer.summary()
+    phases = {name: round(total_ms / 1000, 4) for name, kind, _, total_ms, _ in summary
+              if kind == "span" and name.split(".")[0] in ("phase", "stage")}
+    counters = {name: value for name, kind, value, _, _ in summary if kind == "counter"}
+    ffprobe_calls = next((calls for name, _, calls, _, _ in summary if name == "ffprobe"), 0)
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "wall_s": round(wall, 4),
+        "error": errors[0] if errors else None,
+        "duplicate_groups": len(movies) + sum(len(groups) for groups in series.values()),
+        "ffprobe_calls": ffprobe_calls,
+        "phases_s": phases,
+        "counters": counters,
+        "syscalls": {key: io_after[key] - io_before[key] for key in ("syscr", "syscw") if key in io_after},
+        "io_bytes": {key: io_after[key] - io_before[key] for key in ("rchar", "wchar", "read_bytes", "write_bytes") if key in io_after},
+        "cpu_s": {"user": round(usage.ru_utime - usage_before.ru_utime, 4), "system": round(usage.ru_stime - usage_before.ru_stime, 4),
+                  "children_user": round(children.ru_utime, 4), "children_system": round(children.ru_stime, 4)},
+        "context_switches": {"voluntary": usage.ru_nvcsw - usage_before.ru_nvcsw, "involuntary": usage.ru_nivcsw - usage_before.ru_nivcsw},
+        "peak_rss_bytes": usage.ru_maxrss * rss_unit,
+    }
+
+def _run_child(workdir: Path, roots: List[str], stub_dir: Path, latency_ms: float) -> Dict:
+    env = dict(os.environ, **{STUB_LATENCY_ENV: str(latency_ms)})
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).resolve().parent.parent), env.get("PYTHONPATH")]))
+    # El hijo trabaja en workdir: la caché (y las trazas) quedan en el directorio actual
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.scan_pipeline", "--child", "--stub-dir", str(stub_dir), *roots],
+        cwd=workdir, env=env, capture_output=True, text=True, check=False
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"La pasada de benchmark falló:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run(series: int, episodes: int, movies: int, latency_ms: float, workdir: Path, keep: bool) -> Dict:
+    workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        stub_dir = write_stub_ffprobe(workdir / "stub_bin")
+        start = time.perf_counter()
+        library = generate_library(workdir / "library", series, episodes, movies)
+        report = {
+            "config": {"series": series, "episodes": episodes, "movies": movies, "latency_ms": latency_ms,
+                       "python": sys.version.split()[0], "platform": sys.platform, "cpu_count": os.cpu_count()},
+            "library": {"files": library["files"], "logical_bytes": library["logical_bytes"],
+                        "generate_s": round(time.perf_counter() - start, 3)},
+            "runs": {},
+        }
+        for scenario in SCENARIOS:
+            if scenario == "incremental":
+                report["library"]["incremental_changes"] = apply_incremental_changes(library["roots"])
+            report["runs"][scenario] = _run_child(workdir, library["roots"], stub_dir, latency_ms)
+        return report
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=150)
+    parser.add_argument("--episodes", type=int, default=12)
+    parser.add_argument("--movies", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latencia simulada de cada llamada a ffprobe.")
+    parser.add_argument("--workdir", default=None, help="Carpeta de trabajo (por defecto, una temporal).")
+    parser.add_argument("--keep", action="store_true", help="No borrar la biblioteca ni la caché al terminar.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stub-dir", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("roots", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_once(args.roots, args.stub_dir)))
+    else:
+        workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="mediaforge-bench-"))
+        print(json.dumps(run(args.series, args.episodes, args.movies, args.latency_ms, workdir, args.keep), indent=2))
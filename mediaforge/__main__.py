@@ -0,0 +1,4 @@
+from src.cli.__main__ import main
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,35 @@
+import argparse
+from src.agent.server import ScanAgent, serve, is_loopback, DEFAULT_PORT
+from src.modules.scanners.default_scanner import DefaultScanner
+from src.utils.metadata_extractor import MetadataExtractor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.agent",
+        description="Agente de escaneo headless de MediaForge para ejecutar junto a los discos (NAS)."
+    )
+    parser.add_argument("--root", action="append", required=True, help="Ruta a escanear (se puede repetir).")
+    parser.add_argument("--db", default="mediaforge_agent.db", help="Base de datos de caché del agente.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="Permitir --host distinto de la interfaz local. El agente no tiene autenticación: "
+                             "úsalo solo en una red de confianza (o mejor, un túnel SSH a 127.0.0.1).")
+    parser.add_argument("--interval", type=float, default=None, help="Segundos entre escaneos automáticos.")
+    parser.add_argument("--ffmpeg-path", default="", help="Carpeta con los binarios ffmpeg/ffprobe.")
+    parser.add_argument("--scan-only", action="store_true", help="Escanear una vez y salir sin servir.")
+    args = parser.parse_args(argv)
+
+    if not args.allow_remote and not is_loopback(args.host):
+        parser.error(f"--host {args.host} no es local y el agente no tiene autenticación; añade --allow-remote "
+                     "si la red es de confianza.")
+    MetadataExtractor.set_ffmpeg_path(args.ffmpeg_path)
+    agent = ScanAgent(args.root, args.db, DefaultScanner())
+    if args.scan_only:
+        agent.scan()
+        return 0
+    serve(agent, args.host, args.port, args.interval, args.allow_remote)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
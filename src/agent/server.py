@@ -0,0 +1,182 @@
+import ipaddress
+import json
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+from urllib.parse import parse_qs, urlparse
+from src.core.cache_manager import CacheManager
+from src.core.scan_engine import ScanEngine
+from src.modules.base import ScannerBase
+
+DEFAULT_PORT = 8765
+# Cambios máximos por respuesta; el cliente pide la siguiente página con el token devuelto
+CHANGES_PAGE_SIZE = 5000
+EPOCH_KEY = "agent/epoch"
+
+class ScanAgent:
+    """
+    Agente de escaneo headless (sin PyQt). Ejecuta las fases 1 y 2 de
+    ScanEngine junto a los discos y guarda el resultado en su propia caché
+    con el registro de cambios activado, para que el escritorio solo tenga
+    que descargar lo que ha cambiado desde su última sincronización.
+    """
+    def __init__(self, roots: List[str], db_path: str, scanner: ScannerBase):
+        self.roots = roots
+        self.db_path = db_path
+        self.scanner = scanner
+        self.scanning = False
+        self.last_scan_finished: Optional[float] = None
+        self._scan_lock = threading.Lock()
+
+        cache = CacheManager(db_path)
+        try:
+            cache.enable_change_log()
+            # La época identifica esta base de datos: si cambia, los tokens antiguos no valen
+            self.epoch = cache.get_meta(EPOCH_KEY)
+            if self.epoch is None:
+                self.epoch = uuid.uuid4().hex
+                cache.set_meta(EPOCH_KEY, self.epoch)
+        finally:
+            cache.close()
+
+    def scan(self, on_status: Optional[Callable[[str], None]] = None) -> bool:
+        """Escanea todas las raíces. Devuelve False si ya había un escaneo en curso."""
+        if not self._scan_lock.acquire(blocking=False):
+            return False
+        self.scanning = True
+        cache = CacheManager(self.db_path)
+        try:
+            ScanEngine(self.roots, self.scanner, cache, on_status=on_status).scan()
+            self.last_scan_finished = time.time()
+        finally:
+            cache.close()
+            self.scanning = False
+            self._scan_lock.release()
+        return True
+
+    def scan_in_background(self) -> bool:
+        if self.scanning:
+            return False
+        threading.Thread(target=self.scan, daemon=True).start()
+        return True
+
+    def status(self) -> dict:
+        cache = CacheManager(self.db_path)
+        try:
+            return {
+                "epoch": self.epoch,
+                "token": cache.get_latest_change_seq(),
+                "roots": self.roots,
+                "scanning": self.scanning,
+                "last_scan_finished": self.last_scan_finished,
+            }
+        finally:
+            cache.close()
+
+    def iter_changes(self, since: int, limit: int = CHANGES_PAGE_SIZE):
+        """
+        Genera la respuesta de /changes en JSON Lines: una cabecera con el
+        token hasta el que llega la página y después un cambio por línea.
+        """
+        cache = CacheManager(self.db_path)
+        try:
+            rows = cache.get_changes_since(since, limit)
+            token = rows[-1][0] if rows else since
+            yield {"epoch": self.epoch, "since": since, "token": token, "more": len(rows) == limit, "roots": self.roots}
+            for seq, file_path, scan_path, deleted, size, mtime, parsed_json, meta_json, probe_version in rows:
+                if deleted or size is None:
+                    yield {"op": "delete", "path": file_path, "root": scan_path}
+                else:
+                    yield {"op": "upsert", "path": file_path, "root": scan_path, "size": size, "mtime": mtime,
+                           "parsed": parsed_json, "metadata": meta_json, "probe_version": probe_version}
+        finally:
+            cache.close()
+
+class _AgentRequestHandler(BaseHTTPRequestHandler):
+    agent: ScanAgent = None
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/status":
+            self._send_json(self.agent.status())
+        elif url.path == "/changes":
+            try:
+                since = int(query.get("since", ["0"])[0])
+                limit = min(int(query.get("limit", [str(CHANGES_PAGE_SIZE)])[0]), CHANGES_PAGE_SIZE)
+            except ValueError:
+                self._send_json({"error": "Parámetros 'since'/'limit' no válidos."}, 400)
+                return
+            lines = [json.dumps(item) for item in self.agent.iter_changes(since, limit)]
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({"error": "No encontrado."}, 404)
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/scan":
+            started = self.agent.scan_in_background()
+            self._send_json({"started": started}, 202 if started else 409)
+        else:
+            self._send_json({"error": "No encontrado."}, 404)
+
+    def log_message(self, format, *args):
+        pass
+
+def is_loopback(host: str) -> bool:
+    """Si todas las direcciones de `host` son locales (127.0.0.0/8, ::1)."""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses)
+
+def create_server(agent: ScanAgent, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                  allow_remote: bool = False) -> ThreadingHTTPServer:
+    """
+    Crea el servidor HTTP del agente (port=0 elige un puerto libre). El
+    protocolo no tiene autenticación: cualquiera que alcance el puerto puede
+    leer la biblioteca y lanzar escaneos, así que solo se escucha en una
+    dirección de red con `allow_remote`.
+    """
+    if not allow_remote and not is_loopback(host):
+        raise ValueError(f"El agente no tiene autenticación: no se escucha en '{host}' sin allow_remote "
+                         "(o usa 127.0.0.1 con un túnel SSH).")
+    handler = type("AgentRequestHandler", (_AgentRequestHandler,), {"agent": agent})
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(agent: ScanAgent, host: str, port: int, interval: Optional[float] = None, allow_remote: bool = False):
+    """Sirve el protocolo de sincronización y, si se indica `interval`, reescanea periódicamente."""
+    server = create_server(agent, host, port, allow_remote)
+    if not is_loopback(host):
+        print(f"AVISO: el agente escucha en {host} SIN AUTENTICACIÓN. Cualquiera que alcance este puerto puede "
+              "leer la biblioteca y lanzar escaneos; úsalo solo en una red de confianza.", file=sys.stderr)
+    if interval:
+        def periodic_scan():
+            while True:
+                agent.scan()
+                time.sleep(interval)
+        threading.Thread(target=periodic_scan, daemon=True).start()
+    print(f"Agente de MediaForge escuchando en http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,21 +1,30 @@
 import sys
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QPalette, QColor
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 
 from src.core.config_manager import ConfigManager
 from src.utils.translator import ts
 from src.utils.metadata_extractor import MetadataExtractor
+from src.utils.tracing import tracer
 from src.core.cache_manager import CacheManager
+from src.core.workers import MaintenanceWorker
 from src.ui.hub_window import HubWindow
 from src.ui.duplicate_finder_window import DuplicateFinderWindow
 
+# Tiempo que el hub debe estar abierto sin herramientas activas antes del mantenimiento de la caché
+IDLE_MAINTENANCE_DELAY_MS = 60_000
+
 class App:
     def __init__(self):
         self.qt_app = QApplication(sys.argv)
         self.config_manager = ConfigManager()
         self.cache_manager = CacheManager()
         self.current_tool_window = None
+        self.maintenance_worker = None
+        self.maintenance_timer = QTimer()
+        self.maintenance_timer.setSingleShot(True)
+        self.maintenance_timer.timeout.connect(self._run_idle_maintenance)
 
         # --- Definición de las herramientas disponibles ---
         self.TOOLS_CONFIG = [
@@ -37,6 +46,7 @@ class App:
         self._setup_style()
         self._setup_translator()
         self._setup_ffmpeg_path()
+        self._setup_tracing()
         
         # --- Lógica de arranque modificada ---
         self.hub_window = HubWindow(self.TOOLS_CONFIG, self.config_manager)
@@ -49,6 +59,9 @@ class App:
             return
 
         # Ocultar el hub antes de mostrar la herramienta para evitar parpadeos
+        self.maintenance_timer.stop()
+        # Ya no está ocioso: la compactación en curso se corta tras la pasada actual
+        if self.maintenance_worker is not None: self.maintenance_worker.requestInterruption()
         self.hub_window.hide()
 
         ToolWindowClass = tool_data['class']
@@ -62,6 +75,7 @@ class App:
     def show_hub(self):
         self.current_tool_window = None # Liberar la referencia
         self.hub_window.show()
+        self.maintenance_timer.start(IDLE_MAINTENANCE_DELAY_MS)
         # Aquí podrías refrescar la lista de "recientes" si la implementas
 
     def _setup_style(self):
@@ -90,6 +104,23 @@ class App:
         ffmpeg_path = self.config_manager.get("general/ffmpeg_path", "")
         MetadataExtractor.set_ffmpeg_path(ffmpeg_path)
 
+    def _setup_tracing(self):
+        # La variable de entorno MEDIAFORGE_TRACE también la activa, aunque el ajuste esté apagado
+        if self.config_manager.get("developer/tracing", "false") in (True, "true"):
+            tracer.enabled = True
+
+    def _run_idle_maintenance(self):
+        # Solo con el hub en primer plano: ninguna herramienta está escaneando
+        if self.current_tool_window is not None or self.maintenance_worker is not None:
+            return
+        self.maintenance_worker = MaintenanceWorker()
+        self.maintenance_worker.finished.connect(self._maintenance_finished)
+        self.maintenance_worker.start()
+
+    def _maintenance_finished(self):
+        self.maintenance_worker = None
+
     def run(self):
         self.hub_window.show()
+        self.maintenance_timer.start(IDLE_MAINTENANCE_DELAY_MS)
         sys.exit(self.qt_app.exec())
\ No newline at end of file
@@ -0,0 +1,144 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from src.cli.commands import (
+    EXIT_OK, EXIT_DUPLICATES_FOUND, EXIT_USAGE, EXIT_ERROR, EXIT_PATHS_OFFLINE, EXIT_CANCELLED,
+    OUTPUT_FORMATS, SCAN_COLUMNS, MATCH_COLUMNS, REPORT_COLUMNS, PERF_COLUMNS, SPACE_COLUMNS,
+    RowWriter, run_scan, run_match, scan_rows, match_rows, cached_files, report_rows, perf_rows, space_rows,
+    print_timings, configured_priority_order,
+)
+from src.core.cache_manager import CacheManager, DB_FILE
+from src.utils.tracing import tracer
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m mediaforge",
+        description="MediaForge sin interfaz gráfica: escanea, busca duplicados y genera informes desde la caché."
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_FILE, help="Base de datos de caché (por defecto, la misma que la aplicación).")
+    common.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl", help="Formato de salida.")
+    common.add_argument("--output", "-o", default="-", help="Archivo de salida ('-' para la salida estándar).")
+    common.add_argument("--quiet", "-q", action="store_true", help="No mostrar progreso ni tiempos en stderr.")
+
+    probing = argparse.ArgumentParser(add_help=False)
+    probing.add_argument("--ffmpeg-path", default="", help="Carpeta con los binarios ffmpeg/ffprobe.")
+    probing.add_argument("--resume", action="store_true", help="Reanudar el último escaneo interrumpido de estas rutas.")
+    probing.add_argument("--trace", metavar="ARCHIVO", default=None,
+                         help="Guardar una traza de rendimiento (JSON de Chrome) y su resumen en la caché.")
+    probing.add_argument("--background", action="store_true",
+                         help="Escaneo en segundo plano: prioridad mínima de CPU y disco, un sondeo por disco "
+                              "y pausa mientras otro programa usa el disco.")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", parents=[common, probing], help="Escanea las rutas y actualiza la caché.")
+    scan.add_argument("roots", nargs="+", help="Rutas a escanear.")
+
+    match = commands.add_parser("match", parents=[common, probing], help="Escanea y lista los grupos de duplicados.")
+    match.add_argument("roots", nargs="+", help="Rutas a comparar.")
+    match.add_argument("--no-scan", action="store_true", help="Usar solo la caché, sin recorrer los discos.")
+    match.add_argument("--priority", default=None,
+                       help="Criterios de recomendación separados por comas, en orden de prioridad "
+                            "(también bitrate_desc, codec_desc y container_pref). Por defecto, el orden "
+                            "guardado en los ajustes de la aplicación.")
+
+    report = commands.add_parser("report", parents=[common], help="Resumen de la caché por ruta de escaneo.")
+    report.add_argument("roots", nargs="*", help="Limitar el informe a estas rutas.")
+    report.add_argument("--perf", action="store_true", help="Mostrar el resumen de rendimiento del último escaneo trazado.")
+    report.add_argument("--space", action="store_true",
+                        help="Espacio recuperable por estrategia (total, por ruta y por serie) según el último 'match'.")
+    report.add_argument("--keep-on", metavar="RUTA", default=None,
+                        help="Con --space, evaluar también conservar lo que está en esta ruta escaneada.")
+    return parser
+
+def _open_output(target: str):
+    return sys.stdout if target == "-" else open(target, "w", encoding="utf-8", newline="")
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    roots = [str(Path(r)) for r in getattr(args, "roots", [])]
+
+    if args.command == "match":
+        if args.priority is None: priority_order = configured_priority_order()
+        else: priority_order = [key.strip() for key in args.priority.split(",") if key.strip()]
+        from src.core.recommender import RULES
+        unknown = [key for key in priority_order if key not in RULES]
+        if unknown:
+            print(f"Criterios de recomendación desconocidos: {', '.join(unknown)}", file=sys.stderr)
+            return EXIT_USAGE
+    if args.command in ("scan", "match"):
+        from src.utils.metadata_extractor import MetadataExtractor
+        MetadataExtractor.set_ffmpeg_path(args.ffmpeg_path)
+        if args.trace: tracer.enabled = True
+
+    governor = None
+    if getattr(args, "background", False):
+        from src.core.resource_governor import ResourceGovernor, PROFILES, PROFILE_BACKGROUND
+        governor = ResourceGovernor(PROFILES[PROFILE_BACKGROUND])
+        governor.apply_priority()
+
+    start = time.perf_counter()
+    timings = {}
+    cache = CacheManager(args.db)
+    output = _open_output(args.output)
+    try:
+        if args.command == "report":
+            if args.perf:
+                RowWriter(output, args.format, PERF_COLUMNS).write_all(perf_rows(cache))
+            elif args.space:
+                keep_on = str(Path(args.keep_on)) if args.keep_on else None
+                RowWriter(output, args.format, SPACE_COLUMNS).write_all(space_rows(cache, keep_on))
+            else:
+                RowWriter(output, args.format, REPORT_COLUMNS).write_all(report_rows(cache, roots))
+            return EXIT_OK
+
+        offline = [r for r in roots if not Path(r).is_dir()]
+        session_id = None
+        if args.command == "match" and args.no_scan:
+            files = cached_files(roots, cache)
+        else:
+            files, timings["escaneo"], session_id = run_scan(roots, cache, show_progress=not args.quiet,
+                                                          resume=args.resume, governor=governor)
+            if files is None:
+                return EXIT_CANCELLED
+
+        if args.command == "scan":
+            RowWriter(output, args.format, SCAN_COLUMNS).write_all(scan_rows(roots, files))
+            exit_code = EXIT_OK
+        else:
+            duplicate_structure, timings["duplicados"] = run_match(files, roots, cache, priority_order)
+            writer = RowWriter(output, args.format, MATCH_COLUMNS)
+            found = False
+            for row in match_rows(duplicate_structure):
+                writer.write(row)
+                found = True
+            output.flush()
+            exit_code = EXIT_DUPLICATES_FOUND if found else EXIT_OK
+
+        if args.trace:
+            tracer.export_chrome_trace(args.trace, {"session_id": session_id})
+            if session_id is not None: cache.save_perf_summary(session_id, tracer.summary())
+        if not args.quiet:
+            timings["total"] = time.perf_counter() - start
+            print_timings(timings, len(files))
+        if offline:
+            print(f"Rutas no disponibles (se usó la caché): {', '.join(offline)}", file=sys.stderr)
+            if exit_code == EXIT_OK: exit_code = EXIT_PATHS_OFFLINE
+        return exit_code
+    except KeyboardInterrupt:
+        return EXIT_CANCELLED
+    except BrokenPipeError:
+        # Salida cortada por el consumidor (p. ej. 'head'): no es un error
+        return EXIT_OK
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        cache.close()
+        if output is not sys.stdout: output.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
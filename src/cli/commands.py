@@ -0,0 +1,197 @@
+import csv
+import json
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, TextIO
+from src.core.cache_manager import CacheManager
+from src.core.progress import ProgressAggregator, StageProgress
+from src.utils.tracing import tracer
+
+# Códigos de salida
+EXIT_OK = 0
+EXIT_DUPLICATES_FOUND = 1 # Solo 'match': hay duplicados (como diff/grep, útil en cron)
+EXIT_USAGE = 2            # Argumentos no válidos (el mismo que usa argparse)
+EXIT_ERROR = 3
+EXIT_PATHS_OFFLINE = 4    # Alguna ruta no estaba disponible; se usó lo que había en la caché
+EXIT_CANCELLED = 130
+
+OUTPUT_FORMATS = ("jsonl", "csv")
+# Mismo orden por defecto que muestra el diálogo de ajustes; el resto de
+# criterios de recommender.RULES (bitrate, códec, contenedor) se piden con --priority
+DEFAULT_PRIORITY_ORDER = ["quality_desc", "size_desc", "size_asc", "mtime_desc", "mtime_asc"]
+
+def configured_priority_order() -> List[str]:
+    """
+    Orden de recomendación guardado en los ajustes de la aplicación, para que
+    la CLI recomiende lo mismo que la interfaz. Sin ajustes guardados (o sin
+    PyQt6 en un servidor) se usa DEFAULT_PRIORITY_ORDER. Como el Recommender
+    de la interfaz, se ignoran los criterios que ya no existen.
+    """
+    from src.core.recommender import RULES
+    try:
+        from src.core.config_manager import ConfigManager
+        saved = ConfigManager().get("recommendation/priority_order", None)
+    except ImportError:
+        saved = None
+    if isinstance(saved, str): saved = [saved] # QSettings devuelve una lista de un elemento como texto
+    saved = [key for key in saved or [] if key in RULES]
+    return saved or list(DEFAULT_PRIORITY_ORDER)
+
+SCAN_COLUMNS = ("root", "online", "files", "bytes")
+MATCH_COLUMNS = ("kind", "title", "group", "path", "size", "duration", "width", "height", "codec", "audio",
+                 "recommendation", "reason")
+REPORT_COLUMNS = ("root", "volume_name", "last_scanned", "files", "bytes")
+PERF_COLUMNS = ("name", "kind", "calls", "total_ms", "max_ms")
+SPACE_COLUMNS = ("strategy", "scope", "name", "files", "bytes")
+
+class RowWriter:
+    """Escribe filas en JSON Lines o CSV, una a una, para poder encadenar la salida con otras herramientas."""
+    def __init__(self, stream: TextIO, output_format: str, columns: Sequence[str]):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de salida no soportado: '{output_format}'.")
+        self.stream = stream
+        self.columns = columns
+        self._csv = None
+        if output_format == "csv":
+            self._csv = csv.writer(stream)
+            self._csv.writerow(columns)
+
+    def write(self, row: Dict):
+        if self._csv is not None:
+            self._csv.writerow(["" if row.get(c) is None else row.get(c) for c in self.columns])
+        else:
+            self.stream.write(json.dumps({c: row.get(c) for c in self.columns}, ensure_ascii=False) + "\n")
+
+    def write_all(self, rows: Iterable[Dict]):
+        for row in rows:
+            self.write(row)
+        self.stream.flush()
+
+class StderrProgress:
+    """Muestra el progreso en una sola línea de stderr cuando es una terminal."""
+    def __init__(self, enabled: bool):
+        self.enabled = enabled and sys.stderr.isatty()
+
+    def __call__(self, stages: List[StageProgress]):
+        if not self.enabled: return
+        current = [p for p in stages if not p.finished and (p.total is None or p.total)]
+        if current:
+            sys.stderr.write("\r\033[K" + "  |  ".join(p.describe() for p in current))
+            sys.stderr.flush()
+
+    def clear(self):
+        if self.enabled:
+            sys.stderr.write("\r\033[K")
+            sys.stderr.flush()
+
+def run_scan(roots: List[str], cache: CacheManager, show_progress: bool = True, resume: bool = False,
+             governor=None):
+    """
+    Ejecuta las fases 1 y 2 igual que scan_process. Devuelve (archivos,
+    segundos, sesión); archivos es None si se canceló con Ctrl+C. Con `resume`
+    continúa la última sesión interrumpida de estas rutas, si la hay.
+    `governor` (ResourceGovernor) limita los sondeos.
+    """
+    from src.core.scan_engine import ScanEngine
+    from src.modules.scanners.default_scanner import DefaultScanner
+
+    session = cache.get_resumable_session(roots) if resume else None
+    progress_line = StderrProgress(show_progress)
+    engine = ScanEngine(roots, DefaultScanner(), cache, progress=ProgressAggregator(progress_line, fps=4),
+                        resume_session=session["id"] if session else None, governor=governor)
+    start = time.perf_counter()
+    try:
+        with tracer.span("phase.scan", "scan"):
+            files = engine.scan()
+    finally:
+        progress_line.clear()
+    return files, time.perf_counter() - start, engine.session_id
+
+def scan_rows(roots: List[str], files) -> List[Dict]:
+    from pathlib import Path
+    rows = {root: {"root": root, "online": Path(root).is_dir(), "files": 0, "bytes": 0} for root in roots}
+    root_paths = sorted(rows, key=len, reverse=True)
+    for f in files:
+        path = f.path_str
+        root = next((r for r in root_paths if path.startswith(r)), None)
+        if root is None: continue
+        rows[root]["files"] += 1
+        rows[root]["bytes"] += f.size
+    return list(rows.values())
+
+def match_rows(duplicate_structure: Dict) -> Iterable[Dict]:
+    from src.core.models import ReasonCode
+
+    def file_row(kind, title, group_id, f):
+        return {
+            "kind": kind, "title": title, "group": group_id, "path": f.path_str, "size": f.size,
+            "duration": f.duration or None, "width": f.m_width, "height": f.m_height, "codec": f.m_v_codec,
+            "audio": ",".join(f.audio_languages) or None,
+            "recommendation": f.recommendation, "reason": ReasonCode(f.reason_code).name.lower(),
+        }
+
+    for series_title, groups in duplicate_structure.get("series", {}).items():
+        for group in groups:
+            for f in group.files:
+                yield file_row("series", series_title, group.group_id, f)
+    for group in duplicate_structure.get("movies", []):
+        for f in group.files:
+            yield file_row("movie", group.display_title, group.group_id, f)
+
+def run_match(files, roots: List[str], cache: CacheManager, priority_order: List[str]):
+    """Fase 3 de scan_process: matcher, lista de ignorados, recomendaciones y decisiones guardadas. Devuelve (estructura, segundos)."""
+    from src.core.decision_store import DecisionStore
+    from src.core.library_snapshot import LibrarySnapshot
+    from src.core.recommender import Recommender
+    from src.core.scan_engine import find_and_process_duplicates
+    from src.core.space_planner import store_groups
+    from src.modules.matchers.media_name_matcher import MediaNameMatcher
+
+    start = time.perf_counter()
+    with tracer.span("phase.snapshot", "match"):
+        snapshot = LibrarySnapshot.from_cache(cache, roots)
+    recommender = Recommender(priority_order, snapshot=snapshot)
+    with tracer.span("phase.match", "match"):
+        duplicate_structure = find_and_process_duplicates(files, MediaNameMatcher(snapshot), recommender, cache.get_ignore_list(),
+                                                          decisions=DecisionStore(cache))
+        store_groups(cache, duplicate_structure)
+    return duplicate_structure, time.perf_counter() - start
+
+def cached_files(roots: List[str], cache: CacheManager) -> List:
+    files = []
+    for root in roots:
+        files.extend(cache.iter_files_for_path(root))
+    return files
+
+def report_rows(cache: CacheManager, roots: Optional[List[str]] = None) -> Iterable[Dict]:
+    """Resumen de la caché por ruta, sin tocar el disco ni ejecutar ffprobe."""
+    totals = {path: (files, size) for path, files, size in cache.conn.execute(
+        "SELECT scan_path, COUNT(*), COALESCE(SUM(size), 0) FROM media_files GROUP BY scan_path"
+    )}
+    for scan_path in cache.get_scanned_paths():
+        if roots and scan_path["path"] not in roots: continue
+        files, size = totals.get(scan_path["path"], (0, 0))
+        yield {
+            "root": scan_path["path"], "volume_name": scan_path["volume_name"],
+            "last_scanned": scan_path["last_scanned"], "files": files, "bytes": size,
+        }
+
+def space_rows(cache: CacheManager, keep_on: Optional[str] = None) -> Iterable[Dict]:
+    """Espacio que libera cada estrategia según los grupos del último 'match', sin tocar el disco."""
+    from src.core.space_planner import (SpacePlanner, STRATEGY_CURRENT, STRATEGY_BEST_QUALITY, STRATEGY_KEEP_ON,
+                                        STRATEGY_HARDLINK)
+    strategies = [STRATEGY_CURRENT, STRATEGY_BEST_QUALITY, STRATEGY_HARDLINK] + ([STRATEGY_KEEP_ON] if keep_on else [])
+    for report in SpacePlanner.from_cache(cache).compare(strategies, keep_on):
+        yield {"strategy": report.label, "scope": "total", "name": "", "files": report.files, "bytes": report.total}
+        for scope, totals, counts in (("root", report.by_root, report.files_by_root),
+                                      ("series", report.by_series, report.files_by_series)):
+            for name, freed in sorted(totals.items(), key=lambda item: -item[1]):
+                yield {"strategy": report.label, "scope": scope, "name": name, "files": counts.get(name, 0), "bytes": freed}
+
+def perf_rows(cache: CacheManager, session_id: Optional[int] = None) -> Iterable[Dict]:
+    for name, kind, calls, total_ms, max_ms in cache.get_perf_summary(session_id):
+        yield {"name": name, "kind": kind, "calls": calls, "total_ms": round(total_ms, 3), "max_ms": round(max_ms, 3)}
+
+def print_timings(timings: Dict[str, float], file_count: int):
+    parts = [f"{name}: {seconds:.2f} s" for name, seconds in timings.items()]
+    print(f"{' · '.join(parts)} · {file_count} archivos", file=sys.stderr)
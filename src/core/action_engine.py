@@ -0,0 +1,386 @@
+import errno
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from src.core.cache_manager import (CacheManager, SESSION_RUNNING, SESSION_COMPLETED, SESSION_CANCELLED, SESSION_ABANDONED,
+                                     ACTION_RUN_APPLY, ACTION_RUN_UNDO, ACTION_PLANNED, ACTION_DONE, ACTION_FAILED)
+from src.core.volume_trash import VolumeTrash
+from src.utils.tracing import tracer
+
+OP_TRASH = "trash"
+OP_DELETE = "delete"
+OP_MOVE = "move"
+OP_LINK = "link"
+OPERATIONS = (OP_TRASH, OP_DELETE, OP_MOVE, OP_LINK)
+# Operaciones que sacan el archivo de su ruta: al terminar, sus filas de la caché sobran (los movimientos se actualizan)
+_REMOVES_SOURCE = (OP_TRASH, OP_DELETE)
+
+# Acciones simultáneas por dispositivo: los discos se trabajan en paralelo, pero cada uno sin saturarlo
+WORKERS_PER_DEVICE = 2
+# Los resultados se anotan en el diario cada N acciones o cada N segundos
+JOURNAL_BATCH_SIZE = 200
+JOURNAL_BATCH_SECONDS = 0.5
+_POLL_SECONDS = 0.1
+_UNKNOWN_DEVICE = -1
+
+# Copias entre dispositivos: trozo por llamada al núcleo y muestras que se comparan al terminar
+COPY_CHUNK_BYTES = 64 * 1024 * 1024
+VERIFY_SAMPLES = 8
+VERIFY_SAMPLE_BYTES = 1024 * 1024
+# Trozo con el que se compara entero lo que ya había en un temporal antes de continuarlo
+COMPARE_CHUNK_BYTES = 8 * 1024 * 1024
+PART_SUFFIX = ".mediaforge-part"
+# Errores con los que copy_file_range o sendfile no sirven para ese par de archivos y se prueba el siguiente método
+_UNSUPPORTED = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+@dataclass(frozen=True)
+class FileAction:
+    """
+    Una acción sobre un archivo. `target` es el destino en OP_MOVE y, en
+    OP_LINK, el archivo que se conserva: `source` pasa a ser un enlace duro
+    a él.
+    """
+    op: str
+    source: str
+    target: Optional[str] = None
+
+def _ignore(*args):
+    pass
+
+def _device_of(path: str) -> int:
+    # Un archivo que ya no existe se agrupa por su carpeta; si tampoco está, va a un grupo aparte
+    for candidate in (path, os.path.dirname(path)):
+        try: return os.lstat(candidate).st_dev
+        except OSError: continue
+    return _UNKNOWN_DEVICE
+
+class ActionEngine:
+    """
+    Ejecuta planes de acciones (papelera, borrar, mover, enlazar) sin
+    dependencias de Qt. Las acciones se reparten por dispositivo y cada uno
+    tiene `workers_per_device` hilos, así que varios discos trabajan a la vez.
+
+    Todo queda en un diario de solo añadir en la caché: el plan entra
+    completo antes de empezar y cada resultado se anota después. Solo el
+    hilo que llama a `run` escribe en la caché. Si la ejecución se corta,
+    `run` con el mismo id retoma las acciones que siguen pendientes; las
+    acciones son idempotentes (una ya hecha cuyo resultado no llegó al diario
+    se da por hecha), así que un corte entre la acción y su anotación no
+    causa errores. Las ejecuciones con papelera (si `trash` devuelve dónde
+    dejó el archivo) y con movimientos se pueden deshacer con `plan_undo`,
+    que crea otra ejecución con diario propio.
+
+    `trash` es la papelera (VolumeTrash por defecto, o SystemTrash). Lo que
+    obligaría a copiar datos entre dispositivos se rechaza al planificar,
+    antes de tocar ningún archivo: enlaces entre discos, archivos sin
+    papelera en su volumen y, salvo con `allow_cross_device`, movimientos a
+    otro disco. Esas copias se hacen dentro del núcleo (copy_file_range o
+    sendfile) sobre un temporal que solo toma el nombre final tras
+    verificarse; si la ejecución se corta, al reanudarla la copia sigue desde
+    donde quedó el temporal.
+    """
+    def __init__(self, cache: CacheManager, workers_per_device: int = WORKERS_PER_DEVICE, trash=None,
+                 allow_cross_device: bool = False,
+                 on_progress: Optional[Callable[[int, int], None]] = None,
+                 on_failure: Optional[Callable[[str, str], None]] = None):
+        self.cache = cache
+        self.workers_per_device = max(1, workers_per_device)
+        self.trash = trash if trash is not None else VolumeTrash(cache)
+        self.allow_cross_device = allow_cross_device
+        self.on_progress = on_progress or _ignore
+        self.on_failure = on_failure or _ignore
+        self._stop_event = threading.Event()
+        self._run_created = 0.0 # Inicio de la ejecución en curso: lo que haya en la papelera de antes no es suyo
+
+    def stop(self):
+        """Las acciones en curso terminan; las que no han empezado quedan pendientes para reanudar."""
+        self._stop_event.set()
+
+    # --- Planes ---
+    def plan(self, actions: Sequence[FileAction], kind: str = ACTION_RUN_APPLY, undo_of: Optional[int] = None) -> int:
+        """Anota el plan en el diario y devuelve su id. Lanza ValueError si alguna acción no es válida."""
+        for action in actions:
+            if action.op not in OPERATIONS:
+                raise ValueError(f"Operación desconocida: {action.op}")
+            if action.op in (OP_MOVE, OP_LINK) and not action.target:
+                raise ValueError(f"La operación {action.op} necesita un destino: {action.source}")
+        # Deshacer solo invierte movimientos que ya se aceptaron al planificar
+        refused = self.refusals(actions) if kind != ACTION_RUN_UNDO else []
+        if refused:
+            listed = "\n".join(f"{source}: {reason}" for source, reason in refused[:10])
+            more = f"\n... y {len(refused) - 10} más" if len(refused) > 10 else ""
+            raise ValueError(f"{len(refused)} acciones copiarían datos entre dispositivos o no se pueden hacer:\n{listed}{more}")
+        return self.cache.start_action_run(
+            kind, [(item, action.op, action.source, action.target) for item, action in enumerate(actions)], undo_of
+        )
+
+    def abandon(self, run_id: int):
+        """Descarta una ejecución interrumpida: sus acciones pendientes no se harán y se borran sus copias a medias."""
+        for _, op, source, target, state, _ in self.cache.get_action_items(run_id):
+            if op == OP_MOVE and state == ACTION_PLANNED:
+                try: os.remove(f"{target}{PART_SUFFIX}")
+                except OSError: pass
+        self.cache.set_action_run_status(run_id, SESSION_ABANDONED)
+
+    def refusals(self, actions: Sequence[FileAction]) -> List[Tuple[str, str]]:
+        """(ruta, motivo) de las acciones que necesitarían copiar entre dispositivos o no tienen papelera."""
+        refused = []
+        devices: Dict[str, int] = {} # Por carpeta: muchos archivos comparten la misma
+        def device_of(path: str) -> int:
+            directory = os.path.dirname(os.path.abspath(path))
+            if directory not in devices: devices[directory] = _device_of(directory)
+            return devices[directory]
+        for action in actions:
+            if action.op == OP_TRASH:
+                # Un archivo que ya no está no necesita papelera (reanudación)
+                reason = self.trash.check(action.source) if os.path.lexists(action.source) else None
+                if reason: refused.append((action.source, reason))
+            elif action.op == OP_LINK or (action.op == OP_MOVE and not self.allow_cross_device):
+                source_device, target_device = device_of(action.source), device_of(action.target)
+                if _UNKNOWN_DEVICE not in (source_device, target_device) and source_device != target_device:
+                    refused.append((action.source, f"{action.target} está en otro dispositivo"))
+        return refused
+
+    def plan_undo(self, run_id: int) -> Tuple[Optional[int], List[str]]:
+        """
+        Planifica deshacer una ejecución: cada movimiento vuelve a su origen y
+        cada archivo enviado a una papelera conocida se restaura. Devuelve el id
+        de la nueva ejecución (None si no hay nada que deshacer) y las rutas
+        que no se pueden recuperar (borradas, enlazadas o en la papelera del
+        sistema).
+        """
+        undo, lost = [], []
+        for _, op, source, target, state, detail in self.cache.get_action_items(run_id):
+            if state != ACTION_DONE: continue
+            if op == OP_MOVE:
+                undo.append(FileAction(OP_MOVE, target, source))
+            elif op == OP_TRASH and detail:
+                undo.append(FileAction(OP_MOVE, detail, source))
+            else:
+                lost.append(source)
+        if not undo: return None, lost
+        return self.plan(undo, ACTION_RUN_UNDO, undo_of=run_id), lost
+
+    # --- Ejecución ---
+    def run(self, run_id: int) -> Dict:
+        """
+        Ejecuta (o reanuda) las acciones pendientes de la ejecución y devuelve
+        un resumen: total, hechas, fallidas y si se ha cancelado.
+        """
+        run = self.cache.get_action_run(run_id)
+        if run is None: raise ValueError(f"No existe la ejecución de acciones {run_id}.")
+        items = self.cache.get_action_items(run_id)
+        pending = [(item, FileAction(op, source, target)) for item, op, source, target, state, _ in items
+                   if state == ACTION_PLANNED]
+        total = len(items)
+        finished = total - len(pending)
+        failed = sum(1 for item in items if item[4] == ACTION_FAILED)
+        self.cache.set_action_run_status(run_id, SESSION_RUNNING)
+        self._run_created = run["created"]
+        self.on_progress(finished, total)
+
+        by_device: Dict[int, deque] = defaultdict(deque)
+        for entry in pending:
+            by_device[_device_of(entry[1].source)].append(entry)
+        results: queue.Queue = queue.Queue()
+        threads = []
+        for device, device_queue in by_device.items():
+            lock = threading.Lock()
+            for number in range(min(self.workers_per_device, len(device_queue))):
+                thread = threading.Thread(target=self._worker, args=(device_queue, lock, results),
+                                          name=f"actions-{device}-{number}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        batch, removed, moved, trashed, restored = [], [], [], [], []
+        last_flush = time.monotonic()
+        def flush():
+            nonlocal last_flush
+            if batch: self.cache.append_action_journal(run_id, batch)
+            if removed and run["kind"] == ACTION_RUN_APPLY: self.cache.remove_files_batch(removed)
+            if moved: self.cache.move_files_batch(moved)
+            # El índice de la papelera se escribe aquí: los hilos de trabajo no tocan la caché
+            if trashed: self.trash.record(trashed)
+            if restored: self.trash.forget(restored)
+            batch.clear(); removed.clear(); moved.clear(); trashed.clear(); restored.clear()
+            last_flush = time.monotonic()
+
+        with tracer.span("actions.run", "actions", actions=len(pending), devices=len(by_device)):
+            while any(thread.is_alive() for thread in threads) or not results.empty():
+                try:
+                    item, action, detail, error = results.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                finished += 1
+                if error is None:
+                    batch.append((item, action.op, action.source, action.target, ACTION_DONE, detail))
+                    if action.op in _REMOVES_SOURCE: removed.append(action.source)
+                    if action.op == OP_TRASH and detail: trashed.append((action.source, detail))
+                    if action.op == OP_MOVE:
+                        moved.append((action.source, action.target))
+                        if run["kind"] == ACTION_RUN_UNDO: restored.append(action.source)
+                else:
+                    failed += 1
+                    batch.append((item, action.op, action.source, action.target, ACTION_FAILED, error))
+                    self.on_failure(action.source, error)
+                if len(batch) >= JOURNAL_BATCH_SIZE or time.monotonic() - last_flush >= JOURNAL_BATCH_SECONDS:
+                    flush()
+                self.on_progress(finished, total)
+            flush()
+
+        cancelled = self._stop_event.is_set() and finished < total
+        self.cache.set_action_run_status(run_id, SESSION_CANCELLED if cancelled else SESSION_COMPLETED)
+        return {"run_id": run_id, "kind": run["kind"], "total": total, "done": finished - failed,
+                "failed": failed, "cancelled": cancelled}
+
+    def _worker(self, device_queue: deque, lock: threading.Lock, results: queue.Queue):
+        while not self._stop_event.is_set():
+            with lock:
+                if not device_queue: return
+                item, action = device_queue.popleft()
+            try:
+                results.put((item, action, self._execute(action), None))
+            except Exception as e: # send2trash lanza sus propias excepciones en algunas plataformas
+                results.put((item, action, None, str(e) or e.__class__.__name__))
+
+    def _execute(self, action: FileAction) -> Optional[str]:
+        """Realiza una acción. Devuelve el detalle para el diario (dónde quedó en la papelera) o lanza una excepción."""
+        source, target = action.source, action.target
+        if action.op == OP_DELETE:
+            if os.path.lexists(source): os.remove(source)
+            return None
+        if action.op == OP_TRASH:
+            # Si ya no está, quizá esta ejecución lo envió antes de un corte: la papelera sabe dónde quedó.
+            # Solo cuentan los envíos posteriores al plan; uno anterior es de otra ejecución
+            if not os.path.lexists(source): return self.trash.locate(source, since=self._run_created)
+            return self.trash.trash(source)
+        if action.op == OP_MOVE:
+            if not os.path.lexists(source) and os.path.lexists(target): return None
+            if os.path.lexists(target):
+                # Un corte entre que la copia entre dispositivos tomó el nombre final y el borrado
+                # del origen deja los dos: si el destino es idéntico, solo falta borrar el origen
+                if not os.path.samefile(source, target) and _same_content(source, target):
+                    os.remove(source)
+                    return None
+                raise FileExistsError(errno.EEXIST, "El destino ya existe", target)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.rename(source, target)
+            except OSError as e:
+                if e.errno != errno.EXDEV: raise
+                _copy_across_devices(source, target)
+            return None
+        # OP_LINK: se crea el enlace junto al origen y se sustituye de forma atómica
+        if os.path.lexists(source) and os.path.samefile(source, target): return None
+        temp_path = f"{source}.mediaforge-link"
+        # Un temporal que dejó un corte haría fallar os.link en cada reanudación
+        if os.path.lexists(temp_path): os.remove(temp_path)
+        os.link(target, temp_path)
+        try:
+            os.replace(temp_path, source)
+        except OSError:
+            os.remove(temp_path)
+            raise
+        return None
+
+def _copy_across_devices(source: str, target: str):
+    """
+    Mueve un archivo a otro dispositivo. Se copia a `target` + PART_SUFFIX,
+    se verifica y solo entonces toma el nombre final y se borra el origen:
+    el destino nunca queda a medias. Un temporal que dejó un corte se
+    continúa desde su tamaño si coincide entero con el origen (una escritura
+    rota antes del corte no la detectarían las muestras de _verify_copy); si
+    no, se empieza de cero. Si la copia falla, se borra.
+    """
+    temp_path = f"{target}{PART_SUFFIX}"
+    size = os.stat(source).st_size
+    try:
+        source_fd = os.open(source, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            # Sin O_APPEND: copy_file_range no acepta destinos abiertos en modo añadir
+            target_fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                offset = os.fstat(target_fd).st_size
+                if offset > size or (offset and not _same_prefix(source_fd, target_fd, offset)):
+                    os.ftruncate(target_fd, 0)
+                    offset = 0
+                _stream_copy(source_fd, target_fd, offset, size)
+                os.fsync(target_fd)
+            finally:
+                os.close(target_fd)
+        finally:
+            os.close(source_fd)
+        _verify_copy(source, temp_path, size)
+        shutil.copystat(source, temp_path)
+        os.replace(temp_path, target)
+    except OSError:
+        if os.path.lexists(temp_path): os.remove(temp_path)
+        raise
+    os.remove(source)
+
+def _stream_copy(source_fd: int, target_fd: int, offset: int, size: int):
+    # De más a menos directo: copy_file_range (el núcleo copia sin pasar por
+    # espacio de usuario), sendfile y, si ninguno sirve, lectura y escritura
+    methods = [name for name in ("copy_file_range", "sendfile") if hasattr(os, name)] + ["read"]
+    while offset < size:
+        count = min(COPY_CHUNK_BYTES, size - offset)
+        method = methods[0]
+        try:
+            if method == "copy_file_range":
+                copied = os.copy_file_range(source_fd, target_fd, count, offset, offset)
+            elif method == "sendfile":
+                os.lseek(target_fd, offset, os.SEEK_SET)
+                copied = os.sendfile(target_fd, source_fd, offset, count)
+            else:
+                os.lseek(source_fd, offset, os.SEEK_SET)
+                os.lseek(target_fd, offset, os.SEEK_SET)
+                copied = os.write(target_fd, os.read(source_fd, count))
+        except OSError as e:
+            if e.errno in _UNSUPPORTED and len(methods) > 1:
+                methods.pop(0)
+                continue
+            raise
+        if copied == 0: raise OSError(errno.EIO, "El origen es más corto de lo esperado")
+        offset += copied
+
+def _same_prefix(source_fd: int, target_fd: int, length: int) -> bool:
+    """Los primeros `length` bytes de los dos archivos son iguales."""
+    position = 0
+    while position < length:
+        os.lseek(source_fd, position, os.SEEK_SET)
+        os.lseek(target_fd, position, os.SEEK_SET)
+        expected = os.read(source_fd, min(COMPARE_CHUNK_BYTES, length - position))
+        if not expected or os.read(target_fd, len(expected)) != expected: return False
+        position += len(expected)
+    return True
+
+def _same_content(first: str, second: str) -> bool:
+    """Los dos archivos tienen el mismo tamaño y los mismos bytes."""
+    size = os.stat(first).st_size
+    if os.stat(second).st_size != size: return False
+    first_fd = os.open(first, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        second_fd = os.open(second, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            return _same_prefix(first_fd, second_fd, size)
+        finally:
+            os.close(second_fd)
+    finally:
+        os.close(first_fd)
+
+def _verify_copy(source: str, copy: str, size: int):
+    """Compara el tamaño y VERIFY_SAMPLES trozos repartidos por el archivo (incluidos el principio y el final)."""
+    if os.stat(copy).st_size != size:
+        raise OSError(errno.EIO, "La copia no tiene el tamaño del original", copy)
+    last = max(0, size - VERIFY_SAMPLE_BYTES)
+    offsets = sorted({last * number // (VERIFY_SAMPLES - 1) for number in range(VERIFY_SAMPLES)})
+    with open(source, "rb") as original, open(copy, "rb") as copied:
+        for offset in offsets:
+            original.seek(offset); copied.seek(offset)
+            if original.read(VERIFY_SAMPLE_BYTES) != copied.read(VERIFY_SAMPLE_BYTES):
+                raise OSError(errno.EIO, "La copia no coincide con el original", copy)
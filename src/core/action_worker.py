@@ -1,18 +1,56 @@
 from PyQt6.QtCore import QThread, pyqtSignal
-from typing import List
-from src.core.models import MediaFile
-# pip install send2trash
-import send2trash
+from typing import List, Optional
+from src.core.action_engine import ActionEngine, FileAction
+from src.core.cache_manager import CacheManager
 
 class ActionWorker(QThread):
-    def __init__(self, files_to_delete: List[MediaFile]):
+    """
+    Ejecuta en segundo plano un plan de ActionEngine: uno nuevo (`actions`),
+    la reanudación de uno interrumpido (`resume_run`) o deshacer uno anterior
+    (`undo_run`). El diario queda en la caché por defecto. Con
+    `allow_cross_device` se aceptan movimientos a otro disco (organizador).
+    """
+    progress = pyqtSignal(int, int) # hechas (incluidas las fallidas), total
+    file_failed = pyqtSignal(str, str) # ruta, error
+    run_finished = pyqtSignal(dict) # resumen de ActionEngine.run; en deshacer, 'lost' son las rutas irrecuperables
+    error = pyqtSignal(str)
+
+    def __init__(self, actions: Optional[List[FileAction]] = None, resume_run: Optional[int] = None,
+                 undo_run: Optional[int] = None, allow_cross_device: bool = False):
         super().__init__()
-        self.files_to_delete = files_to_delete
+        self.allow_cross_device = allow_cross_device
+        self.actions = actions or []
+        self.resume_run = resume_run
+        self.undo_run = undo_run
+        self.engine: Optional[ActionEngine] = None
+        self._stop_requested = False
 
     def run(self):
-        for file in self.files_to_delete:
-            try:
-                send2trash.send2trash(str(file.path))
-            except Exception as e:
-                print(f"No se pudo eliminar {file.path}: {e}")
-        # Aquí se podrían emitir señales de progreso y finalización
\ No newline at end of file
+        cache = CacheManager()
+        try:
+            self.engine = ActionEngine(cache, allow_cross_device=self.allow_cross_device, on_progress=self.progress.emit, on_failure=self.file_failed.emit)
+            if self._stop_requested: self.engine.stop()
+            lost = []
+            if self.resume_run is not None:
+                run_id = self.resume_run
+            elif self.undo_run is not None:
+                run_id, lost = self.engine.plan_undo(self.undo_run)
+                if run_id is None:
+                    self.run_finished.emit({"run_id": None, "kind": "undo", "total": 0, "done": 0, "failed": 0,
+                                            "cancelled": False, "lost": lost})
+                    return
+            else:
+                run_id = self.engine.plan(self.actions)
+            summary = self.engine.run(run_id)
+            summary["lost"] = lost
+            self.run_finished.emit(summary)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.error.emit(f"Error al aplicar las acciones: {e}")
+        finally:
+            cache.close()
+
+    def stop(self):
+        self._stop_requested = True
+        if self.engine is not None: self.engine.stop()
@@ -0,0 +1,104 @@
+import json
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+from src.core.cache_manager import CacheManager
+from src.core.cache_snapshot import remap_root
+
+REQUEST_TIMEOUT_SECONDS = 30
+
+class AgentSyncClient:
+    """
+    Cliente de sincronización con un agente headless (src.agent). Descarga
+    solo los cambios de media_files posteriores al último token guardado y
+    los fusiona en la caché local, traduciendo las raíces del agente a las
+    rutas con las que este equipo ve esos discos (`root_map`).
+    """
+    def __init__(self, base_url: str, cache: CacheManager, root_map: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.root_map = root_map or {}
+        self._token_key = f"agent_sync/{self.base_url}/token"
+        self._epoch_key = f"agent_sync/{self.base_url}/epoch"
+
+    def _get(self, path: str):
+        return urllib.request.urlopen(f"{self.base_url}{path}", timeout=REQUEST_TIMEOUT_SECONDS)
+
+    def status(self) -> Dict:
+        with self._get("/status") as response:
+            return json.load(response)
+
+    def request_scan(self) -> bool:
+        request = urllib.request.Request(f"{self.base_url}/scan", method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+                return json.load(response).get("started", False)
+        except urllib.error.HTTPError as e:
+            if e.code == 409: return False # Ya hay un escaneo en curso
+            raise
+
+    def _local_root(self, agent_root: str) -> str:
+        return self.root_map.get(agent_root, agent_root)
+
+    def _local_path(self, file_path: str, agent_root: str) -> str:
+        local_root = self._local_root(agent_root)
+        return file_path if local_root == agent_root else remap_root(file_path, agent_root, local_root)
+
+    def pull(self) -> Dict:
+        """
+        Trae y aplica todas las páginas de cambios pendientes. Si el agente
+        ha cambiado de época (base de datos nueva), se descartan los datos
+        locales de sus raíces y se resincroniza desde cero.
+        """
+        token = int(self.cache.get_meta(self._token_key, 0))
+        known_epoch = self.cache.get_meta(self._epoch_key)
+        summary = {"upserts": 0, "deletes": 0, "full_resync": False}
+        roots_registered = set()
+
+        while True:
+            with self._get(f"/changes?since={token}") as response:
+                lines = [json.loads(line) for line in response.read().decode("utf-8").splitlines() if line]
+            header, changes = lines[0], lines[1:]
+
+            if header["epoch"] != known_epoch:
+                if known_epoch is not None:
+                    # Base de datos del agente nueva: los datos locales de sus raíces ya no son fiables
+                    for agent_root in header["roots"]:
+                        self.cache.delete_scan_path(self._local_root(agent_root))
+                    summary["full_resync"] = True
+                known_epoch = header["epoch"]
+                if token:
+                    token = 0
+                    continue
+
+            for agent_root in header["roots"]:
+                if agent_root not in roots_registered:
+                    self.cache.update_scan_path(self._local_root(agent_root), "NAS")
+                    roots_registered.add(agent_root)
+
+            upserts, deletes = [], []
+            for change in changes:
+                local_path = self._local_path(change["path"], change["root"])
+                if change["op"] == "delete":
+                    deletes.append(local_path)
+                else:
+                    local_root = self._local_root(change["root"])
+                    if change["root"] not in roots_registered:
+                        self.cache.update_scan_path(local_root, "NAS")
+                        roots_registered.add(change["root"])
+                    upserts.append((local_path, local_root, change["size"], change["mtime"],
+                                    change["parsed"], change["metadata"], change.get("probe_version", 0)))
+            if upserts: self.cache.insert_rows_batch(upserts)
+            if deletes: self.cache.remove_files_batch(deletes)
+            summary["upserts"] += len(upserts)
+            summary["deletes"] += len(deletes)
+
+            # El token se guarda tras aplicar cada página: una interrupción no repite trabajo
+            token = header["token"]
+            self.cache.set_meta(self._token_key, str(token))
+            self.cache.set_meta(self._epoch_key, known_epoch)
+            if not header["more"]:
+                break
+
+        summary["token"] = token
+        return summary
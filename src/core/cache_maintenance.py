@@ -0,0 +1,117 @@
+import time
+from typing import Callable, Dict, List, Optional
+from src.core.cache_manager import CacheManager
+
+# Cada cuánto se considera que toca pasar el mantenimiento automático.
+MAINTENANCE_INTERVAL_SECONDS = 3 * 24 * 3600
+# Páginas liberadas por cada pasada de incremental_vacuum (4 KiB por página). Se
+# repiten pasadas hasta vaciar la lista libre; entre una y otra se suelta el bloqueo
+# de escritura y se puede interrumpir el mantenimiento.
+INCREMENTAL_VACUUM_PAGES = 2000
+AUTO_VACUUM_INCREMENTAL = 2
+
+class CacheMaintenance:
+    """
+    Mantenimiento de la base de datos de caché: elimina filas huérfanas,
+    refresca las estadísticas del planificador (ANALYZE) y devuelve al disco
+    las páginas libres con incremental_vacuum. Pensado para ejecutarse en
+    segundo plano cuando la aplicación está ociosa.
+    """
+    LAST_RUN_KEY = "maintenance/last_run"
+
+    def __init__(self, cache: CacheManager):
+        self.cache = cache
+        self.conn = cache.conn
+
+    def is_due(self, now: float = None) -> bool:
+        last_run = float(self.cache.get_meta(self.LAST_RUN_KEY, 0))
+        return (now or time.time()) - last_run >= MAINTENANCE_INTERVAL_SECONDS
+
+    def prune_orphans(self) -> int:
+        """
+        Borra los archivos cuya ruta de escaneo ya no existe en scanned_paths
+        y las decisiones de archivos que ya no están en la caché.
+        """
+        removed = self.conn.execute(
+            "DELETE FROM media_files WHERE scan_path IS NULL OR scan_path NOT IN (SELECT path FROM scanned_paths)"
+        ).rowcount
+        removed += self.conn.execute(
+            "DELETE FROM decisions WHERE file_path NOT IN (SELECT file_path FROM media_files)"
+        ).rowcount
+        self.conn.commit()
+        return removed
+
+    def analyze(self):
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+
+    def ensure_incremental_auto_vacuum(self) -> bool:
+        """
+        Activa auto_vacuum=INCREMENTAL. En una base ya creada el cambio solo
+        surte efecto tras un VACUUM completo, que se hace una única vez.
+        Devuelve True si ha sido necesario ese VACUUM.
+        """
+        mode = self.conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if mode == AUTO_VACUUM_INCREMENTAL:
+            return False
+        self.conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        return True
+
+    def incremental_vacuum(self, chunk_pages: int = INCREMENTAL_VACUUM_PAGES,
+                           should_continue: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Devuelve al disco las páginas vacías en pasadas de `chunk_pages`
+        hasta que no queda ninguna o `should_continue` devuelve False (la
+        aplicación ha dejado de estar ociosa). Devuelve cuántas había antes.
+        """
+        free_pages = remaining = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while remaining and (should_continue is None or should_continue()):
+            # executescript ejecuta el PRAGMA hasta el final; execute() solo da un paso (libera una página)
+            self.conn.executescript(f"PRAGMA incremental_vacuum({int(chunk_pages)});")
+            previous, remaining = remaining, self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= previous: break # auto_vacuum no es incremental: no hay nada más que hacer
+        return free_pages
+
+    def size_report(self) -> Dict:
+        """
+        Tamaño de la caché: total del archivo, páginas libres y una estimación
+        por ruta de escaneo (bytes de sus filas en media_files).
+        """
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        roots: List[Dict] = []
+        cursor = self.conn.execute('''
+            SELECT sp.path, COUNT(mf.file_path),
+                   COALESCE(SUM(LENGTH(mf.file_path) + LENGTH(mf.scan_path) + 16
+                                + COALESCE(LENGTH(mf.parsed_info_json), 0)
+                                + COALESCE(LENGTH(mf.metadata_info_json), 0)), 0)
+            FROM scanned_paths sp LEFT JOIN media_files mf ON mf.scan_path = sp.path
+            GROUP BY sp.path ORDER BY 3 DESC
+        ''')
+        for path, file_count, estimated_bytes in cursor.fetchall():
+            roots.append({"path": path, "files": file_count, "bytes": estimated_bytes})
+        return {
+            "total_bytes": page_size * page_count,
+            "free_bytes": page_size * free_pages,
+            "roots": roots,
+        }
+
+    def run(self, force: bool = False, should_continue: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        Ejecuta todas las tareas si toca (o si `force`) y devuelve un resumen.
+        `should_continue` permite cortar la compactación entre pasadas.
+        """
+        if not force and not self.is_due():
+            return {"skipped": True}
+        started = time.time()
+        summary = {"skipped": False, "orphans_removed": self.prune_orphans()}
+        summary["full_vacuum"] = self.ensure_incremental_auto_vacuum()
+        self.analyze()
+        summary["free_pages"] = self.incremental_vacuum(should_continue=should_continue)
+        summary["free_pages_left"] = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        summary["seconds"] = round(time.time() - started, 3)
+        self.cache.set_meta(self.LAST_RUN_KEY, str(time.time()))
+        return summary
@@ -1,19 +1,52 @@
 import sqlite3
+import os
 import json
 import time
 from pathlib import Path
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Iterator, Sequence, Tuple, Optional
 from src.core.models import MediaFile
+from src.utils.metadata_extractor import PROBE_VERSION
+from src.utils.tracing import tracer, traced
 
 DB_FILE = "mediaforge_cache.db"
+# Número de filas que se piden a SQLite en cada fetchmany al recorrer la caché.
+READ_CHUNK_SIZE = 2000
+MEDIA_FILE_COLUMNS = ("file_path", "scan_path", "size", "mtime", "parsed_info_json", "metadata_info_json", "probe_version")
+_UPSERT_MEDIA_FILE = (
+    "INSERT OR REPLACE INTO media_files (file_path, scan_path, size, mtime, parsed_info_json, metadata_info_json, probe_version) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+# Estados de una sesión de escaneo; 'running' también queda si el proceso muere a medias
+SESSION_RUNNING = "running"
+SESSION_COMPLETED = "completed"
+SESSION_CANCELLED = "cancelled"
+SESSION_FAILED = "failed"
+SESSION_ABANDONED = "abandoned"
+# Sesiones terminadas que se conservan como historial
+KEEP_FINISHED_SESSIONS = 20
+# Ejecuciones del motor de acciones: aplicar un plan o deshacer uno anterior.
+# Usan los mismos estados que las sesiones de escaneo.
+ACTION_RUN_APPLY = "apply"
+ACTION_RUN_UNDO = "undo"
+ACTION_PLANNED = "planned"
+ACTION_DONE = "done"
+ACTION_FAILED = "failed"
 
 class CacheManager:
     def __init__(self, db_path=DB_FILE):
-        self.conn = sqlite3.connect(db_path)
+        self.db_path = db_path
+        # Varias conexiones (etapas del escaneo, agente, mantenimiento) comparten la base:
+        # WAL permite leer mientras otra conexión escribe y el timeout espera al bloqueo
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        # Sin esto SQLite ignora las claves foráneas y 'ON DELETE CASCADE' no hace nada
+        self.conn.execute("PRAGMA foreign_keys = ON")
         self.create_tables()
 
     def create_tables(self):
         cursor = self.conn.cursor()
+        # Solo tiene efecto en una base nueva; en las existentes lo activa CacheMaintenance
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS scanned_paths (
                 path TEXT PRIMARY KEY,
@@ -29,9 +62,14 @@ class CacheManager:
                 mtime REAL,
                 parsed_info_json TEXT,
                 metadata_info_json TEXT,
+                probe_version INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (scan_path) REFERENCES scanned_paths (path) ON DELETE CASCADE
             )
         ''')
+        # Cachés anteriores a la versión de sondeo: sus filas quedan con 0 y se vuelven a sondear
+        if "probe_version" not in {row[1] for row in cursor.execute("PRAGMA table_info(media_files)")}:
+            cursor.execute("ALTER TABLE media_files ADD COLUMN probe_version INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_files_scan_path ON media_files (scan_path)")
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ignore_list (
                 ignore_key TEXT PRIMARY KEY,
@@ -39,8 +77,178 @@ class CacheManager:
                 date_added INTEGER
             )
         ''')
+        # Diario de sesiones de escaneo: qué archivos quedan por procesar para poder reanudar
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                roots_json TEXT,
+                started INTEGER,
+                finished INTEGER,
+                status TEXT,
+                walk_complete INTEGER DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_session_files (
+                session_id INTEGER,
+                file_path TEXT,
+                scan_path TEXT,
+                PRIMARY KEY (session_id, file_path),
+                FOREIGN KEY (session_id) REFERENCES scan_sessions (id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        ''')
+        # Resumen de rendimiento por escaneo (solo con la instrumentación activada)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_perf_summary (
+                session_id INTEGER,
+                name TEXT,
+                kind TEXT,
+                calls INTEGER,
+                total_ms REAL,
+                max_ms REAL,
+                PRIMARY KEY (session_id, name),
+                FOREIGN KEY (session_id) REFERENCES scan_sessions (id) ON DELETE CASCADE
+            )
+        ''')
+        # Decisiones del usuario (KEEP/DELETE) por grupo y archivo; size y mtime detectan archivos cambiados
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS decisions (
+                group_key TEXT,
+                file_path TEXT,
+                decision TEXT,
+                size INTEGER,
+                mtime REAL,
+                decided INTEGER,
+                PRIMARY KEY (group_key, file_path)
+            ) WITHOUT ROWID
+        ''')
+        # Diario del motor de acciones: solo se añaden filas. Cada acción entra como 'planned' y su
+        # resultado ('done' / 'failed') es otra fila; el estado de una acción es su última fila
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS action_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT,
+                undo_of INTEGER,
+                created INTEGER,
+                finished INTEGER,
+                status TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS action_journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER,
+                item INTEGER,
+                op TEXT,
+                source TEXT,
+                target TEXT,
+                state TEXT,
+                detail TEXT,
+                at REAL,
+                FOREIGN KEY (run_id) REFERENCES action_runs (id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_action_journal_run ON action_journal (run_id, item)")
+        # Índice de las papeleras por volumen (VolumeTrash): qué hay en cada una y de dónde salió
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS trash_entries (
+                trash_path TEXT PRIMARY KEY,
+                original_path TEXT,
+                trash_root TEXT,
+                size INTEGER,
+                trashed INTEGER
+            )
+        ''')
+        # Grupos de duplicados del último análisis para el planificador de espacio. Los datos numéricos
+        # van por columnas (un BLOB de NumPy cada una) y se leen de una vez; cada archivo tiene aquí su
+        # fila de esas columnas y su decisión, que replace_decisions mantiene al día
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS duplicate_members (
+                group_key TEXT,
+                file_path TEXT,
+                row_no INTEGER,
+                decision TEXT,
+                PRIMARY KEY (group_key, file_path)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_duplicate_members_decided ON duplicate_members (row_no) WHERE decision != ''")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS duplicate_columns (
+                name TEXT PRIMARY KEY,
+                dtype TEXT,
+                data BLOB
+            )
+        ''')
+        # Etiquetas de los números de las columnas: kind 'series' o 'root' (con su dispositivo)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS duplicate_labels (
+                kind TEXT,
+                no INTEGER,
+                label TEXT,
+                device INTEGER,
+                PRIMARY KEY (kind, no)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
         self.conn.commit()
 
+    def get_meta(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM cache_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        self.conn.execute("INSERT OR REPLACE INTO cache_meta (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def enable_change_log(self):
+        """
+        Activa el registro de cambios de media_files (lo usa el agente
+        headless para servir sincronizaciones incrementales). Unos triggers
+        anotan en media_changes la última operación de cada archivo con un
+        número de secuencia creciente, que hace de token de sincronización.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_path TEXT UNIQUE,
+                scan_path TEXT,
+                deleted INTEGER
+            )
+        ''')
+        for event, row, deleted in (("INSERT", "NEW", 0), ("UPDATE", "NEW", 0), ("DELETE", "OLD", 1)):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS media_files_log_{event.lower()} AFTER {event} ON media_files
+                BEGIN
+                    INSERT OR REPLACE INTO media_changes (file_path, scan_path, deleted)
+                    VALUES ({row}.file_path, {row}.scan_path, {deleted});
+                END
+            ''')
+        self.conn.commit()
+
+    def get_latest_change_seq(self) -> int:
+        row = self.conn.execute("SELECT MAX(seq) FROM media_changes").fetchone()
+        return row[0] or 0
+
+    @traced("cache.get_changes_since", "cache")
+    def get_changes_since(self, seq: int, limit: int) -> List[Tuple]:
+        """
+        Cambios posteriores a `seq`, en orden: (seq, file_path, scan_path,
+        deleted, size, mtime, parsed_info_json, metadata_info_json, probe_version).
+        """
+        cursor = self.conn.execute('''
+            SELECT c.seq, c.file_path, c.scan_path, c.deleted, m.size, m.mtime, m.parsed_info_json, m.metadata_info_json,
+                   m.probe_version
+            FROM media_changes c LEFT JOIN media_files m ON m.file_path = c.file_path
+            WHERE c.seq > ? ORDER BY c.seq LIMIT ?
+        ''', (seq, limit))
+        return cursor.fetchall()
+
     def delete_scan_path(self, path: str):
         """
         Elimina una ruta de escaneo de la tabla scanned_paths.
@@ -63,16 +271,20 @@ class CacheManager:
         cursor.execute("DELETE FROM ignore_list WHERE ignore_key = ?", (key,))
         self.conn.commit()
 
+    @traced("cache.get_scanned_paths", "cache")
     def get_scanned_paths(self) -> List[dict]:
         cursor = self.conn.cursor()
         cursor.execute("SELECT path, volume_name, last_scanned FROM scanned_paths ORDER BY last_scanned DESC")
         return [{"path": row[0], "volume_name": row[1], "last_scanned": row[2]} for row in cursor.fetchall()]
 
-    def update_scan_path(self, path: str, volume_name: str):
+    def update_scan_path(self, path: str, volume_name: str, last_scanned: Optional[int] = None):
         cursor = self.conn.cursor()
+        # UPSERT en lugar de INSERT OR REPLACE: REPLACE borra la fila y, con las
+        # claves foráneas activas, arrastraría en cascada todos sus media_files.
         cursor.execute(
-            "INSERT OR REPLACE INTO scanned_paths (path, volume_name, last_scanned) VALUES (?, ?, ?)",
-            (path, volume_name, int(time.time()))
+            "INSERT INTO scanned_paths (path, volume_name, last_scanned) VALUES (?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET volume_name = excluded.volume_name, last_scanned = excluded.last_scanned",
+            (path, volume_name, last_scanned if last_scanned is not None else int(time.time()))
         )
         self.conn.commit()
     
@@ -82,44 +294,193 @@ class CacheManager:
         self.conn.commit()
 
 
-    def get_files_for_path(self, scan_path: str) -> Dict[Path, MediaFile]:
+    def iter_file_rows(self, scan_path: str, columns: Sequence[str] = ("file_path", "size", "mtime"),
+                       chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Tuple]:
+        """
+        Recorre las filas de media_files de una ruta de escaneo en bloques de
+        `chunk_size` (fetchmany) devolviendo solo las columnas pedidas, en bruto.
+        Pensado para quien solo necesita (ruta, tamaño, mtime) y no quiere pagar
+        la decodificación de los JSON.
+        """
+        invalid = [c for c in columns if c not in MEDIA_FILE_COLUMNS]
+        if invalid or not columns:
+            raise ValueError(f"Columnas no válidas para media_files: {invalid or columns}")
         cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT file_path, size, mtime, parsed_info_json, metadata_info_json FROM media_files WHERE scan_path = ?",
-            (scan_path,)
+        cursor.execute(f"SELECT {', '.join(columns)} FROM media_files WHERE scan_path = ?", (scan_path,))
+        try:
+            while True:
+                with tracer.span("cache.fetchmany", "cache"):
+                    rows = cursor.fetchmany(chunk_size)
+                if not rows: break
+                tracer.count("cache.rows_read", len(rows))
+                yield from rows
+        finally:
+            cursor.close()
+
+    def iter_files_for_path(self, scan_path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[MediaFile]:
+        """
+        Devuelve los MediaFile cacheados de una ruta de forma perezosa: las filas
+        se leen por bloques y los JSON de cada archivo solo se decodifican cuando
+        se accede a parsed_info o metadata_info.
+        """
+        rows = self.iter_file_rows(
+            scan_path, ("file_path", "size", "mtime", "parsed_info_json", "metadata_info_json"), chunk_size
+        )
+        for file_path, size, mtime, parsed_json, meta_json in rows:
+            yield MediaFile.from_cache(file_path, size, mtime, parsed_json, meta_json)
+
+    def get_files_for_path(self, scan_path: str) -> Dict[Path, MediaFile]:
+        return {media_file.path: media_file for media_file in self.iter_files_for_path(scan_path)}
+
+    @staticmethod
+    def _media_file_row(scan_path: str, file: MediaFile) -> Tuple:
+        # Solo el escaneo escribe MediaFile y siempre con un sondeo recién hecho
+        return (
+            file.path_str,
+            scan_path,
+            file.size,
+            file.mtime,
+            json.dumps(file.parsed_info),
+            json.dumps(file.metadata_info) if file.metadata_info else None,
+            PROBE_VERSION
         )
-        cached_files = {}
-        for row in cursor.fetchall():
-            file_path, size, mtime, parsed_json, meta_json = row
-            p_path = Path(file_path)
-            cached_files[p_path] = MediaFile(
-                path=p_path,
-                size=size,
-                mtime=mtime,
-                parsed_info=json.loads(parsed_json) if parsed_json else {},
-                metadata_info=json.loads(meta_json) if meta_json else {}
-            )
-        return cached_files
 
+    @traced("cache.update_files_batch", "cache")
     def update_files_batch(self, scan_path: str, files: List[MediaFile]):
         cursor = self.conn.cursor()
-        data_to_insert = []
-        for file in files:
-            data_to_insert.append((
-                str(file.path),
-                scan_path,
-                file.size,
-                file.mtime,
-                json.dumps(file.parsed_info),
-                json.dumps(file.metadata_info) if file.metadata_info else None
-            ))
+        data_to_insert = [self._media_file_row(scan_path, file) for file in files]
         
-        cursor.executemany(
-            "INSERT OR REPLACE INTO media_files (file_path, scan_path, size, mtime, parsed_info_json, metadata_info_json) VALUES (?, ?, ?, ?, ?, ?)",
-            data_to_insert
+        cursor.executemany(_UPSERT_MEDIA_FILE, data_to_insert)
+        self.conn.commit()
+
+    # --- Sesiones de escaneo (reanudación) ---
+    def start_scan_session(self, roots: List[str]) -> int:
+        """
+        Abre una sesión nueva para `roots`. Las sesiones sin terminar de las
+        mismas rutas quedan abandonadas: el escaneo nuevo ya cubre su trabajo.
+        """
+        roots_json = json.dumps(sorted(roots))
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE scan_sessions SET status = ?, finished = ? WHERE roots_json = ? AND status != ?",
+                       (SESSION_ABANDONED, int(time.time()), roots_json, SESSION_COMPLETED))
+        cursor.execute("INSERT INTO scan_sessions (roots_json, started, status) VALUES (?, ?, ?)",
+                       (roots_json, int(time.time()), SESSION_RUNNING))
+        session_id = cursor.lastrowid
+        # Las terminadas no se reanudan: sus archivos pendientes sobran y solo se guarda un historial corto
+        cursor.execute("DELETE FROM scan_session_files WHERE session_id IN (SELECT id FROM scan_sessions WHERE status IN (?, ?))",
+                       (SESSION_COMPLETED, SESSION_ABANDONED))
+        cursor.execute("DELETE FROM scan_sessions WHERE status NOT IN (?, ?) AND id NOT IN "
+                       "(SELECT id FROM scan_sessions ORDER BY id DESC LIMIT ?)",
+                       (SESSION_RUNNING, SESSION_CANCELLED, KEEP_FINISHED_SESSIONS))
+        self.conn.commit()
+        return session_id
+
+    @traced("cache.write_scan_checkpoint", "cache")
+    def write_scan_checkpoint(self, session_id: int, files_by_root: Dict[str, List[MediaFile]],
+                              queued: List[Tuple[str, str]], done: List[str]):
+        """
+        Guarda en una sola transacción los archivos procesados, los que
+        entran en cola (file_path, scan_path) y los que salen de ella. Así el
+        diario nunca pierde un archivo pendiente ni da por hecho uno sin guardar.
+        """
+        cursor = self.conn.cursor()
+        for scan_path, files in files_by_root.items():
+            cursor.executemany(_UPSERT_MEDIA_FILE, [self._media_file_row(scan_path, file) for file in files])
+        cursor.executemany("INSERT OR IGNORE INTO scan_session_files (session_id, file_path, scan_path) VALUES (?, ?, ?)",
+                           [(session_id, file_path, scan_path) for file_path, scan_path in queued])
+        cursor.executemany("DELETE FROM scan_session_files WHERE session_id = ? AND file_path = ?",
+                           [(session_id, file_path) for file_path in done])
+        self.conn.commit()
+
+    def set_session_walk_complete(self, session_id: int):
+        """Marca que el diario ya contiene todos los archivos a procesar de la sesión."""
+        self.conn.execute("UPDATE scan_sessions SET walk_complete = 1 WHERE id = ?", (session_id,))
+        self.conn.commit()
+
+    def set_session_status(self, session_id: int, status: str):
+        finished = None if status == SESSION_RUNNING else int(time.time())
+        self.conn.execute("UPDATE scan_sessions SET status = ?, finished = ? WHERE id = ?",
+                          (status, finished, session_id))
+        self.conn.commit()
+
+    def get_resumable_session(self, roots: List[str]) -> Optional[Dict]:
+        """Última sesión sin terminar de exactamente estas rutas, con su número de archivos pendientes."""
+        row = self.conn.execute(
+            "SELECT id, started, status, walk_complete FROM scan_sessions WHERE roots_json = ? AND status IN (?, ?) "
+            "ORDER BY id DESC LIMIT 1",
+            (json.dumps(sorted(roots)), SESSION_RUNNING, SESSION_CANCELLED)
+        ).fetchone()
+        if row is None: return None
+        pending = self.conn.execute("SELECT COUNT(*) FROM scan_session_files WHERE session_id = ?", (row[0],)).fetchone()[0]
+        return {"id": row[0], "started": row[1], "status": row[2], "walk_complete": bool(row[3]), "pending": pending}
+
+    def save_perf_summary(self, session_id: int, rows: List[Tuple]):
+        """Guarda las filas (nombre, tipo, llamadas, ms totales, ms máximo) de Tracer.summary()."""
+        self.conn.execute("DELETE FROM scan_perf_summary WHERE session_id = ?", (session_id,))
+        self.conn.executemany(
+            "INSERT INTO scan_perf_summary (session_id, name, kind, calls, total_ms, max_ms) VALUES (?, ?, ?, ?, ?, ?)",
+            [(session_id, *row) for row in rows]
         )
         self.conn.commit()
 
+    def get_perf_summary(self, session_id: Optional[int] = None) -> List[Tuple]:
+        """Resumen de un escaneo (por defecto, el último que tenga uno), de mayor a menor tiempo."""
+        if session_id is None:
+            row = self.conn.execute("SELECT MAX(session_id) FROM scan_perf_summary").fetchone()
+            session_id = row[0]
+            if session_id is None: return []
+        return self.conn.execute(
+            "SELECT name, kind, calls, total_ms, max_ms FROM scan_perf_summary WHERE session_id = ? "
+            "ORDER BY kind DESC, total_ms DESC, name", (session_id,)
+        ).fetchall()
+
+    def iter_session_pending(self, session_id: int, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Tuple[str, str]]:
+        """Archivos (file_path, scan_path) de la sesión que aún no se han procesado."""
+        cursor = self.conn.execute(
+            "SELECT file_path, scan_path FROM scan_session_files WHERE session_id = ? ORDER BY scan_path, file_path",
+            (session_id,)
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows: break
+                yield from rows
+        finally:
+            cursor.close()
+
+    @traced("cache.insert_rows_batch", "cache")
+    def insert_rows_batch(self, rows: List[Tuple]):
+        """
+        Inserta filas ya serializadas (file_path, scan_path, size, mtime,
+        parsed_info_json, metadata_info_json, probe_version) sin pasar por
+        MediaFile.
+        """
+        self.conn.executemany(_UPSERT_MEDIA_FILE, rows)
+        self.conn.commit()
+
+    def import_root_rows(self, path: str, volume_name: str, last_scanned: Optional[int], batches: Iterator[List[Tuple]]) -> int:
+        """
+        Registra una ruta de escaneo e inserta sus filas (como
+        insert_rows_batch) en una sola transacción: si algún lote falla, la
+        caché queda como estaba. Devuelve cuántas filas se insertaron.
+        """
+        inserted = 0
+        try:
+            self.conn.execute(
+                "INSERT INTO scanned_paths (path, volume_name, last_scanned) VALUES (?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET volume_name = excluded.volume_name, last_scanned = excluded.last_scanned",
+                (path, volume_name, last_scanned if last_scanned is not None else int(time.time()))
+            )
+            for rows in batches:
+                self.conn.executemany(_UPSERT_MEDIA_FILE, rows)
+                inserted += len(rows)
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+        return inserted
+
+    @traced("cache.remove_files_batch", "cache")
     def remove_files_batch(self, file_paths: List[str]):
         if not file_paths: return
         cursor = self.conn.cursor()
@@ -127,6 +488,24 @@ class CacheManager:
         cursor.execute(f"DELETE FROM media_files WHERE file_path IN ({placeholders})", file_paths)
         self.conn.commit()
 
+    def move_files_batch(self, moves: List[Tuple[str, str]]):
+        """
+        Actualiza la ruta de archivos movidos (origen, destino) sin perder su
+        sondeo. Si el destino no cae en ninguna ruta escaneada, la fila se borra.
+        """
+        if not moves: return
+        roots = sorted((row[0] for row in self.conn.execute("SELECT path FROM scanned_paths")), key=len, reverse=True)
+        def root_of(path: str) -> Optional[str]:
+            return next((root for root in roots if path == root or path.startswith(root.rstrip(os.sep) + os.sep)), None)
+        updates, removals = [], []
+        for source, target in moves:
+            root = root_of(target)
+            if root is None: removals.append((source,))
+            else: updates.append((target, root, source))
+        self.conn.executemany("UPDATE OR REPLACE media_files SET file_path = ?, scan_path = ? WHERE file_path = ?", updates)
+        self.conn.executemany("DELETE FROM media_files WHERE file_path = ?", removals)
+        self.conn.commit()
+
     def add_to_ignore_list(self, key: str, level: str):
         cursor = self.conn.cursor()
         cursor.execute(
@@ -135,10 +514,154 @@ class CacheManager:
         )
         self.conn.commit()
 
+    @traced("cache.get_ignore_list", "cache")
     def get_ignore_list(self) -> Set[str]:
         cursor = self.conn.cursor()
         cursor.execute("SELECT ignore_key FROM ignore_list")
         return {row[0] for row in cursor.fetchall()}
 
+    # --- Decisiones ---
+    @traced("cache.get_decisions", "cache")
+    def get_decisions(self) -> List[Tuple]:
+        """Todas las decisiones: (group_key, file_path, decision, size, mtime)."""
+        return self.conn.execute("SELECT group_key, file_path, decision, size, mtime FROM decisions").fetchall()
+
+    @traced("cache.replace_decisions", "cache")
+    def replace_decisions(self, group_keys: Sequence[str], rows: List[Tuple]):
+        """
+        Sustituye en una transacción las decisiones de `group_keys` por `rows`
+        (group_key, file_path, decision, size, mtime).
+        """
+        decided = int(time.time())
+        cursor = self.conn.cursor()
+        cursor.executemany("DELETE FROM decisions WHERE group_key = ?", [(key,) for key in group_keys])
+        cursor.executemany(
+            "INSERT OR REPLACE INTO decisions (group_key, file_path, decision, size, mtime, decided) VALUES (?, ?, ?, ?, ?, ?)",
+            [(*row, decided) for row in rows]
+        )
+        cursor.executemany("UPDATE duplicate_members SET decision = '' WHERE group_key = ?", [(key,) for key in group_keys])
+        cursor.executemany("UPDATE duplicate_members SET decision = ? WHERE group_key = ? AND file_path = ?",
+                           [(row[2], row[0], row[1]) for row in rows])
+        self.conn.commit()
+
+    # --- Grupos de duplicados (planificador de espacio) ---
+    @traced("cache.replace_duplicate_groups", "cache")
+    def replace_duplicate_groups(self, members: List[Tuple], columns: Dict[str, Tuple[str, bytes]], labels: List[Tuple]):
+        """
+        Sustituye los grupos guardados por los del último análisis, en una
+        transacción. `members`: (group_key, file_path, row_no, decision);
+        `columns`: nombre -> (dtype, bytes); `labels`: (kind, no, label, device).
+        """
+        cursor = self.conn.cursor()
+        for table in ("duplicate_members", "duplicate_columns", "duplicate_labels"):
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.executemany("INSERT OR REPLACE INTO duplicate_members VALUES (?, ?, ?, ?)", members)
+        cursor.executemany("INSERT INTO duplicate_columns VALUES (?, ?, ?)",
+                           [(name, dtype, data) for name, (dtype, data) in columns.items()])
+        cursor.executemany("INSERT OR REPLACE INTO duplicate_labels VALUES (?, ?, ?, ?)", labels)
+        self.conn.commit()
+
+    def get_duplicate_columns(self) -> Dict[str, Tuple[str, bytes]]:
+        return {name: (dtype, data) for name, dtype, data in self.conn.execute("SELECT name, dtype, data FROM duplicate_columns")}
+
+    def get_duplicate_decisions(self) -> List[Tuple]:
+        """(row_no, borrar) de los archivos con decisión; solo recorre el índice parcial de los decididos."""
+        return self.conn.execute(
+            "SELECT row_no, decision = 'DELETE' FROM duplicate_members INDEXED BY idx_duplicate_members_decided "
+            "WHERE decision != ''"
+        ).fetchall()
+
+    def get_duplicate_labels(self) -> List[Tuple]:
+        """(kind, no, label, device) de las series y rutas de las columnas."""
+        return self.conn.execute("SELECT kind, no, label, device FROM duplicate_labels ORDER BY kind, no").fetchall()
+
+    # --- Diario de acciones ---
+    def start_action_run(self, kind: str, items: List[Tuple], undo_of: Optional[int] = None) -> int:
+        """Crea una ejecución con sus acciones (item, op, source, target) en estado 'planned', en una transacción."""
+        now = time.time()
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO action_runs (kind, undo_of, created, status) VALUES (?, ?, ?, ?)",
+                       (kind, undo_of, int(now), SESSION_RUNNING))
+        run_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO action_journal (run_id, item, op, source, target, state, at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, item, op, source, target, ACTION_PLANNED, now) for item, op, source, target in items]
+        )
+        self.conn.commit()
+        return run_id
+
+    @traced("cache.append_action_journal", "cache")
+    def append_action_journal(self, run_id: int, rows: List[Tuple]):
+        """Añade resultados (item, op, source, target, state, detail) al diario."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO action_journal (run_id, item, op, source, target, state, detail, at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, *row, now) for row in rows]
+        )
+        self.conn.commit()
+
+    def get_action_items(self, run_id: int) -> List[Tuple]:
+        """Estado actual de cada acción de la ejecución: (item, op, source, target, state, detail), por item."""
+        return self.conn.execute('''
+            SELECT item, op, source, target, state, detail FROM action_journal
+            WHERE seq IN (SELECT MAX(seq) FROM action_journal WHERE run_id = ? GROUP BY item)
+            ORDER BY item
+        ''', (run_id,)).fetchall()
+
+    def set_action_run_status(self, run_id: int, status: str):
+        finished = None if status == SESSION_RUNNING else int(time.time())
+        self.conn.execute("UPDATE action_runs SET status = ?, finished = ? WHERE id = ?", (status, finished, run_id))
+        self.conn.commit()
+
+    def get_action_run(self, run_id: int) -> Optional[Dict]:
+        row = self.conn.execute("SELECT id, kind, undo_of, created, finished, status FROM action_runs WHERE id = ?",
+                                (run_id,)).fetchone()
+        if row is None: return None
+        return dict(zip(("id", "kind", "undo_of", "created", "finished", "status"), row))
+
+    def get_interrupted_action_run(self) -> Optional[Dict]:
+        """Última ejecución sin terminar (cancelada o cortada a medias), con sus acciones pendientes."""
+        row = self.conn.execute("SELECT id FROM action_runs WHERE status IN (?, ?) ORDER BY id DESC LIMIT 1",
+                                (SESSION_RUNNING, SESSION_CANCELLED)).fetchone()
+        if row is None: return None
+        run = self.get_action_run(row[0])
+        run["pending"] = sum(1 for item in self.get_action_items(run["id"]) if item[4] == ACTION_PLANNED)
+        return run
+
+    def get_last_undoable_action_run(self) -> Optional[Dict]:
+        """Última ejecución que aplicó acciones y no se ha deshecho aún."""
+        row = self.conn.execute('''
+            SELECT id FROM action_runs WHERE kind = ? AND status != ?
+            AND id NOT IN (SELECT undo_of FROM action_runs WHERE kind = ? AND status = ?)
+            ORDER BY id DESC LIMIT 1
+        ''', (ACTION_RUN_APPLY, SESSION_RUNNING, ACTION_RUN_UNDO, SESSION_COMPLETED)).fetchone()
+        return self.get_action_run(row[0]) if row else None
+
+    # --- Papeleras por volumen ---
+    def add_trash_entries(self, rows: List[Tuple]):
+        """Añade (trash_path, original_path, trash_root, size) al índice de las papeleras."""
+        trashed = int(time.time())
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO trash_entries (trash_path, original_path, trash_root, size, trashed) VALUES (?, ?, ?, ?, ?)",
+            [(*row, trashed) for row in rows]
+        )
+        self.conn.commit()
+
+    def remove_trash_entries(self, trash_paths: List[str]):
+        self.conn.executemany("DELETE FROM trash_entries WHERE trash_path = ?", [(path,) for path in trash_paths])
+        self.conn.commit()
+
+    def get_trash_entries(self) -> List[Tuple]:
+        """(trash_path, original_path, trash_root, size, trashed) de todo lo que hay en las papeleras."""
+        return self.conn.execute(
+            "SELECT trash_path, original_path, trash_root, size, trashed FROM trash_entries ORDER BY trashed"
+        ).fetchall()
+
+    def get_trash_summary(self) -> List[Tuple]:
+        """(trash_root, archivos, bytes) por papelera."""
+        return self.conn.execute(
+            "SELECT trash_root, COUNT(*), COALESCE(SUM(size), 0) FROM trash_entries GROUP BY trash_root ORDER BY trash_root"
+        ).fetchall()
+
     def close(self):
         self.conn.close()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+import time
+from typing import Dict, Optional
+from src.core.cache_manager import CacheManager
+
+SNAPSHOT_FORMAT = "mediaforge-cache-snapshot"
+SNAPSHOT_VERSION = 2 # 2: añade probe_version a cada archivo
+SNAPSHOT_EXTENSION = ".mfcache"
+# Columnas de cada línea de archivo, en el orden en que se escriben
+SNAPSHOT_FILE_COLUMNS = ("relative_path", "size", "mtime", "parsed_info_json", "metadata_info_json", "probe_version")
+IMPORT_BATCH_SIZE = 5000
+
+def _relative_path(root: str, file_path: str) -> str:
+    """Ruta relativa a la raíz con '/' como separador, válida en cualquier sistema."""
+    relative = file_path[len(root):] if file_path.startswith(root) else file_path
+    return relative.replace('\\', '/').lstrip('/')
+
+def join_root(root: str, relative_path: str) -> str:
+    """Une una ruta relativa ('/' como separador) a una raíz usando el separador propio de la raíz."""
+    separator = '\\' if (len(root) > 1 and root[1] == ':') or '\\' in root else '/'
+    return root.rstrip('\\/') + separator + relative_path.replace('/', separator)
+
+def remap_root(file_path: str, old_root: str, new_root: str) -> str:
+    """Traslada una ruta de archivo de `old_root` a `new_root` (p. ej. otro punto de montaje)."""
+    return join_root(new_root, _relative_path(old_root, file_path))
+
+def export_snapshot(cache: CacheManager, root: str, destination: str) -> int:
+    """
+    Exporta la caché de una ruta de escaneo a un archivo comprimido y
+    versionado (JSON Lines + gzip). La primera línea es una cabecera; el
+    resto, una línea por archivo con rutas relativas a la raíz para poder
+    reubicarlas al importar. Devuelve el número de archivos exportados.
+    """
+    scan_path = next((p for p in cache.get_scanned_paths() if p["path"] == root), None)
+    if scan_path is None:
+        raise ValueError(f"La ruta '{root}' no está en la caché.")
+
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "root": root,
+        "volume_name": scan_path["volume_name"],
+        "last_scanned": scan_path["last_scanned"],
+        "exported_at": int(time.time()),
+        "columns": SNAPSHOT_FILE_COLUMNS,
+    }
+    count = 0
+    tmp_destination = f"{destination}.tmp"
+    with gzip.open(tmp_destination, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        rows = cache.iter_file_rows(root, ("file_path", "size", "mtime", "parsed_info_json", "metadata_info_json", "probe_version"))
+        for file_path, size, mtime, parsed_json, meta_json, probe_version in rows:
+            f.write(json.dumps([_relative_path(root, file_path), size, mtime, parsed_json, meta_json, probe_version]) + "\n")
+            count += 1
+    os.replace(tmp_destination, destination)
+    return count
+
+def read_snapshot_header(source: str) -> Dict:
+    with gzip.open(source, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"'{source}' no es una instantánea de caché de MediaForge.")
+    if header.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"La instantánea usa la versión {header['version']}, más reciente que la soportada ({SNAPSHOT_VERSION}).")
+    return header
+
+def import_snapshot(cache: CacheManager, source: str, target_root: Optional[str] = None) -> Dict:
+    """
+    Fusiona una instantánea en la caché. `target_root` permite reubicar la
+    raíz cuando la unidad está montada en otro punto (otra letra de unidad u
+    otra ruta de montaje); por defecto se usa la raíz original. Los archivos
+    de la instantánea sustituyen a los que ya hubiera con la misma ruta.
+    La importación es una sola transacción: si falla, la caché no cambia.
+    """
+    header = read_snapshot_header(source)
+    root = target_root or header["root"]
+
+    def batches():
+        batch = []
+        with gzip.open(source, "rt", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                # Las instantáneas de la versión 1 no traen probe_version: esos archivos se volverán a sondear
+                relative_path, size, mtime, parsed_json, meta_json, *probe_version = json.loads(line)
+                file_path = join_root(root, relative_path)
+                batch.append((file_path, root, size, mtime, parsed_json, meta_json, probe_version[0] if probe_version else 0))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    # Todo o nada: una instantánea truncada o corrupta no deja la raíz a medias
+    imported = cache.import_root_rows(root, header.get("volume_name") or "", header.get("last_scanned"), batches())
+    return {"root": root, "original_root": header["root"], "files": imported}
@@ -0,0 +1,128 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from src.core.models import DuplicateGroup
+from src.core.recommender import get_quality_score
+from src.utils.text_parser import standardize_text
+
+DECISION_KEEP = 'KEEP'
+DECISION_DELETE = 'DELETE'
+DECISIONS = (DECISION_KEEP, DECISION_DELETE)
+
+def keyed_groups(duplicate_structure: Dict) -> Iterator[Tuple[str, DuplicateGroup]]:
+    """
+    (clave, grupo) de cada grupo de la estructura de duplicados. La clave es
+    la misma que usa la lista de ignorados: "serie/temporada-episodio" para
+    los episodios y el título normalizado para las películas.
+    """
+    for series_title, groups in duplicate_structure.get("series", {}).items():
+        series_key = standardize_text(series_title)
+        for group in groups:
+            yield f"{series_key}/{group.group_id}", group
+    for group in duplicate_structure.get("movies", []):
+        yield standardize_text(group.display_title), group
+
+class DecisionStore:
+    """
+    Decisiones del usuario (KEEP / DELETE por archivo) guardadas en la caché
+    con la identidad (clave del grupo, ruta del archivo), que no cambia al
+    volver a escanear. Se cargan todas al abrir el almacén, así que consultar
+    es O(1), y cada cambio reescribe solo los grupos afectados.
+
+    Al reaplicarlas tras un escaneo, la decisión de un archivo cuyo tamaño o
+    mtime ha cambiado se descarta: ya no es el archivo que se revisó.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self._decisions: Dict[Tuple[str, str], Tuple[str, int, float]] = {}
+        self._paths_by_group: Dict[str, List[str]] = {}
+        for group_key, file_path, decision, size, mtime in cache.get_decisions():
+            self._decisions[(group_key, file_path)] = (decision, size, mtime)
+            self._paths_by_group.setdefault(group_key, []).append(file_path)
+
+    def __len__(self) -> int:
+        return len(self._decisions)
+
+    def get(self, group_key: str, file_path: str):
+        entry = self._decisions.get((group_key, file_path))
+        return entry[0] if entry is not None else None
+
+    def has_group(self, group_key: str) -> bool:
+        return group_key in self._paths_by_group
+
+    def record(self, groups: Iterable[Tuple[str, DuplicateGroup]]):
+        """Guarda el estado actual (KEEP / DELETE) de los archivos de cada grupo, sustituyendo el anterior."""
+        group_keys, rows = [], []
+        for group_key, group in groups:
+            for file_path in self._paths_by_group.pop(group_key, ()):
+                del self._decisions[(group_key, file_path)]
+            group_keys.append(group_key)
+            for media_file in group.files:
+                if media_file.recommendation not in DECISIONS: continue
+                file_path = media_file.path_str
+                self._decisions[(group_key, file_path)] = (media_file.recommendation, media_file.size, media_file.mtime)
+                self._paths_by_group.setdefault(group_key, []).append(file_path)
+                rows.append((group_key, file_path, media_file.recommendation, media_file.size, media_file.mtime))
+        if group_keys: self.cache.replace_decisions(group_keys, rows)
+
+    def apply(self, groups: Iterable[Tuple[str, DuplicateGroup]]) -> int:
+        """
+        Reaplica las decisiones guardadas a los grupos de un escaneo nuevo y
+        devuelve cuántos grupos se han restaurado. En un grupo restaurado, los
+        archivos sin decisión (p. ej. uno nuevo) quedan en REVIEW en lugar de
+        como sugerencia, para que el usuario los revise.
+        """
+        restored = 0
+        for group_key, group in groups:
+            if group_key not in self._paths_by_group: continue
+            decided = False
+            for media_file in group.files:
+                entry = self._decisions.get((group_key, media_file.path_str))
+                if entry is not None and entry[1] == media_file.size and entry[2] == media_file.mtime:
+                    media_file.recommendation = entry[0]
+                    decided = True
+            if not decided: continue
+            restored += 1
+            for media_file in group.files:
+                if media_file.recommendation not in DECISIONS: media_file.recommendation = 'REVIEW'
+        return restored
+
+    def marked_for_deletion(self) -> Dict[str, Set[str]]:
+        """Rutas marcadas como DELETE, por clave de grupo."""
+        marked: Dict[str, Set[str]] = {}
+        for (group_key, file_path), (decision, _, _) in self._decisions.items():
+            if decision == DECISION_DELETE: marked.setdefault(group_key, set()).add(file_path)
+        return marked
+
+# --- Operaciones en bloque ---
+# Cada una decide un grupo y devuelve si lo ha cambiado; el llamador guarda los cambiados con record().
+
+def accept_suggestion(group: DuplicateGroup) -> bool:
+    """Conserva el archivo sugerido y elimina el resto. Los grupos ya decididos no tienen sugerencia."""
+    if not any(f.recommendation == 'SUGGESTED' for f in group.files): return False
+    for media_file in group.files:
+        media_file.recommendation = DECISION_KEEP if media_file.recommendation == 'SUGGESTED' else DECISION_DELETE
+    return True
+
+def delete_lower_resolution(group: DuplicateGroup) -> bool:
+    """
+    Elimina las copias de resolución inferior a la mejor del grupo. Si la
+    mejor resolución la tiene un solo archivo, ese se conserva; si la
+    comparten varios, la elección entre ellos queda para el usuario.
+    """
+    scores = [get_quality_score(f) for f in group.files]
+    best = max(scores, default=0)
+    if all(score == best for score in scores): return False
+    single_best = scores.count(best) == 1
+    for media_file, score in zip(group.files, scores):
+        if score < best: media_file.recommendation = DECISION_DELETE
+        elif single_best: media_file.recommendation = DECISION_KEEP
+    return True
+
+def keep_on_volume(group: DuplicateGroup, root: str) -> bool:
+    """Conserva los archivos que están bajo `root` y elimina el resto, en los grupos con alguno allí."""
+    prefix = os.path.normcase(os.path.join(os.path.normpath(root), ""))
+    on_volume = [os.path.normcase(f.path_str).startswith(prefix) for f in group.files]
+    if not any(on_volume): return False
+    for media_file, keep in zip(group.files, on_volume):
+        media_file.recommendation = DECISION_KEEP if keep else DECISION_DELETE
+    return True
@@ -0,0 +1,89 @@
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+from src.core.action_engine import FileAction, OP_MOVE
+from src.core.models import MediaFile
+
+# Caracteres que no admiten los sistemas de archivos habituales (Windows es el más restrictivo)
+_UNSAFE_NAME = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+@dataclass
+class ScatteredSeries:
+    """
+    Una serie cuyos episodios están repartidos en varias carpetas. `target`
+    es la carpeta donde se reunirán; por defecto, la que ya tiene más bytes
+    (así se mueve lo mínimo), pero el usuario puede elegir otra.
+    """
+    title: str
+    files: List[MediaFile]
+    bytes_by_folder: Dict[str, int]
+    target: str = ""
+
+    def __post_init__(self):
+        if not self.target: self.target = self.folders[0]
+
+    @property
+    def folders(self) -> List[str]:
+        """Carpetas de la serie, de más a menos bytes."""
+        return sorted(self.bytes_by_folder, key=lambda folder: (-self.bytes_by_folder[folder], folder))
+
+    @property
+    def bytes_to_move(self) -> int:
+        return sum(size for folder, size in self.bytes_by_folder.items() if folder != os.path.normpath(self.target))
+
+def safe_folder_name(title: str) -> str:
+    """Nombre de carpeta válido en cualquier sistema a partir del título de una serie."""
+    name = _UNSAFE_NAME.sub(" ", title).strip(" .")
+    return re.sub(r"\s+", " ", name) or "Sin título"
+
+def scattered_series(entities: Sequence) -> List[ScatteredSeries]:
+    """
+    Series repartidas en más de una carpeta a partir de las entidades ya
+    fusionadas del matcher (MediaNameMatcher.merge_entities). Las películas
+    no se reúnen: dos carpetas de una misma película son duplicados, no una
+    colección dispersa.
+    """
+    result = []
+    for entity in entities:
+        if not entity.episodes: continue
+        bytes_by_folder: Dict[str, int] = defaultdict(int)
+        for media_file in entity.files:
+            bytes_by_folder[os.path.normpath(str(media_file.parent))] += media_file.size
+        if len(bytes_by_folder) < 2: continue
+        result.append(ScatteredSeries(entity.canonical_title, list(entity.files), dict(bytes_by_folder)))
+    result.sort(key=lambda series: series.title.lower())
+    return result
+
+def target_under(root: str, series: ScatteredSeries) -> str:
+    """Carpeta de la serie dentro de una ruta canónica común (root/<título>)."""
+    return os.path.join(root, safe_folder_name(series.title))
+
+def plan_moves(series_list: Sequence[ScatteredSeries]) -> Tuple[List[FileAction], List[Tuple[str, str]]]:
+    """
+    Movimientos para reunir cada serie en su carpeta destino, sin tocar el
+    disco salvo para comprobar que el destino está libre. Devuelve las
+    acciones y los conflictos (ruta, motivo) que se dejan sin mover: dos
+    archivos con el mismo nombre (duplicados que hay que resolver antes) o
+    un destino ocupado por otro archivo.
+    """
+    actions, conflicts = [], []
+    for series in series_list:
+        target_dir = os.path.normpath(series.target)
+        claimed: Dict[str, str] = {}
+        # Primero los que ya están en el destino: su nombre queda reservado
+        for media_file in sorted(series.files, key=lambda f: os.path.normpath(str(f.parent)) != target_dir):
+            source = media_file.path_str
+            target = os.path.join(target_dir, media_file.name)
+            key = os.path.normcase(target)
+            if key in claimed:
+                if claimed[key] != source: conflicts.append((source, f"Mismo nombre que {claimed[key]}"))
+                continue
+            claimed[key] = source
+            if os.path.normpath(source) == target: continue
+            if os.path.lexists(target):
+                conflicts.append((source, f"{target} ya existe"))
+                continue
+            actions.append(FileAction(OP_MOVE, source, target))
+    return actions, conflicts
@@ -0,0 +1,135 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from src.core.models import MediaFile
+from src.utils.text_parser import standardize_text
+
+def _resolution_score(resolution: str) -> int:
+    resolution = (resolution or '').lower()
+    if '4k' in resolution or '2160p' in resolution: return 5
+    if '1080p' in resolution: return 4
+    if '720p' in resolution: return 3
+    if '480p' in resolution: return 2
+    return 0
+
+class _Interner:
+    """Asigna ids enteros consecutivos a cadenas (códecs, títulos)."""
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __call__(self, value: str) -> int:
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+class LibrarySnapshot:
+    """
+    Instantánea columnar (NumPy) de la biblioteca. Cada fila es un archivo y
+    cada columna un array: size, mtime, duration, width, height, codec_id,
+    season, episode, title_id y quality. `paths` es la correspondencia
+    fila -> archivo. Se construye una vez por escaneo y los arrays son de solo
+    lectura, así que las fases posteriores pueden compartirla sin copiarla:
+    el Recommender lee de ella calidad, duración y códec, y el matcher las
+    duraciones de su veto (media_name_matcher.duration_score).
+
+    Valores ausentes: season = -1, episode = NaN, duration/width/height = 0.
+    """
+    def __init__(self, paths: List[str], columns: Dict[str, np.ndarray], codecs: List[str], titles: List[str]):
+        self.paths = paths
+        self.codecs = codecs
+        self.titles = titles
+        self._row_by_path = {path: row for row, path in enumerate(paths)}
+        for name, array in columns.items():
+            array.setflags(write=False)
+            setattr(self, name, array)
+
+    # --- Construcción ---
+    @classmethod
+    def _from_records(cls, records: Iterable[Tuple[str, int, float, Dict, Optional[Dict], str]]) -> "LibrarySnapshot":
+        codecs, titles = _Interner(), _Interner()
+        paths: List[str] = []
+        size, mtime, duration, width, height = [], [], [], [], []
+        codec_id, season, episode, title_id, quality = [], [], [], [], []
+        for path, file_size, file_mtime, parsed, metadata, folder_name in records:
+            metadata = metadata or {}
+            paths.append(path)
+            size.append(file_size)
+            mtime.append(file_mtime)
+            duration.append(metadata.get('duration') or 0.0)
+            width.append(metadata.get('width') or 0)
+            height.append(metadata.get('height') or 0)
+            codec_id.append(codecs(metadata.get('v_codec') or 'unknown'))
+            season.append(parsed.get('season') if parsed.get('season') is not None else -1)
+            episode.append(parsed.get('episode') if parsed.get('episode') is not None else np.nan)
+            title = parsed.get('series') or parsed.get('title') or folder_name
+            title_id.append(titles(standardize_text(title)))
+            # Sin altura real se usa la resolución del nombre, como get_quality_score
+            quality.append(0 if metadata.get('height') else _resolution_score(parsed.get('resolution', '')))
+
+        columns = {
+            'size': np.array(size, dtype=np.int64),
+            'mtime': np.array(mtime, dtype=np.float64),
+            'duration': np.array(duration, dtype=np.float64),
+            'width': np.array(width, dtype=np.int32),
+            'height': np.array(height, dtype=np.int32),
+            'codec_id': np.array(codec_id, dtype=np.int32),
+            'season': np.array(season, dtype=np.int32),
+            'episode': np.array(episode, dtype=np.float64),
+            'title_id': np.array(title_id, dtype=np.int32),
+        }
+        columns['quality'] = cls._quality_from_height(columns['height'], np.array(quality, dtype=np.int8))
+        return cls(paths, columns, codecs.values, titles.values)
+
+    @staticmethod
+    def _quality_from_height(height: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+        """Versión vectorizada de get_quality_score (1-5 por altura, o la del nombre si no hay altura)."""
+        by_height = np.select(
+            [height >= 2160, height >= 1080, height >= 720, height >= 480],
+            [5, 4, 3, 2], default=1,
+        ).astype(np.int8)
+        return np.where(height > 0, by_height, fallback).astype(np.int8)
+
+    @classmethod
+    def from_cache(cls, cache, scan_paths: Sequence[str]) -> "LibrarySnapshot":
+        """Construye la instantánea leyendo directamente las filas de la caché (sin crear MediaFile)."""
+        def records():
+            for scan_path in scan_paths:
+                rows = cache.iter_file_rows(scan_path, ("file_path", "size", "mtime", "parsed_info_json", "metadata_info_json"))
+                for file_path, file_size, file_mtime, parsed_json, meta_json in rows:
+                    yield (file_path, file_size, file_mtime,
+                           json.loads(parsed_json) if parsed_json else {},
+                           json.loads(meta_json) if meta_json else None,
+                           os.path.basename(os.path.dirname(file_path)))
+        return cls._from_records(records())
+
+    @classmethod
+    def from_files(cls, files: Iterable[MediaFile]) -> "LibrarySnapshot":
+        return cls._from_records(
+            (f.path_str, f.size, f.mtime, f.parsed_info, f.metadata_info, f.parent.name) for f in files
+        )
+
+    # --- Correspondencia fila <-> archivo ---
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def row_of(self, media_file: MediaFile) -> Optional[int]:
+        return self._row_by_path.get(media_file.path_str)
+
+    def rows_of(self, files: Iterable[MediaFile]) -> np.ndarray:
+        """Filas de los archivos dados (-1 para los que no están en la instantánea)."""
+        get = self._row_by_path.get
+        prefixes: Dict[str, str] = {}
+        def row(f: MediaFile) -> int:
+            # Igual que path_str, pero uniendo cada carpeta una sola vez
+            prefix = prefixes.get(f.directory)
+            if prefix is None:
+                prefix = prefixes[f.directory] = os.path.join(f.directory, "")
+            return get(prefix + f.name, -1)
+        return np.fromiter((row(f) for f in files), np.int64)
+
+    def codec_of(self, row: int) -> str:
+        return self.codecs[self.codec_id[row]]
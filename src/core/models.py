@@ -1,39 +1,294 @@
-from dataclasses import dataclass, field
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from enum import IntEnum
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
+from src.utils.tracing import tracer
+
+class ReasonCode(IntEnum):
+    """Motivos de recomendación. Cada archivo guarda solo el código, no el texto."""
+    NONE = 0
+    BEST_BY_PRIORITY = 1
+    BETTER_VERSION_AVAILABLE = 2
+
+REASON_TEXTS = {
+    ReasonCode.NONE: "",
+    ReasonCode.BEST_BY_PRIORITY: "Sugerido como la mejor versión según tus prioridades.",
+    ReasonCode.BETTER_VERSION_AVAILABLE: "Hay una versión potencialmente mejor disponible.",
+}
+_REASON_CODES_BY_TEXT = {text: code for code, text in REASON_TEXTS.items()}
+
+class DirectoryTable:
+    """
+    Tabla de carpetas internadas. Los MediaFile guardan su carpeta padre como
+    una cadena compartida en lugar de un Path completo, así miles de archivos
+    de una misma carpeta comparten una única cadena. Cada archivo apunta a la
+    cadena misma (no a un índice de la tabla), por lo que vaciarla al empezar
+    un escaneo nuevo es seguro: los archivos anteriores conservan su carpeta.
+    """
+    def __init__(self):
+        self._dirs: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, directory: str) -> str:
+        shared = self._dirs.get(directory)
+        if shared is not None:
+            return shared
+        with self._lock:
+            return self._dirs.setdefault(directory, directory)
+
+    def clear(self):
+        """Olvida las carpetas internadas; sin esto la tabla crece con cada escaneo."""
+        with self._lock:
+            self._dirs = {}
+
+    def __len__(self) -> int:
+        return len(self._dirs)
+
+directories = DirectoryTable()
+
+# Campos conocidos de parsed_info y metadata_info, guardados en slots fijos.
+# None en un slot equivale a "clave ausente" en el diccionario.
+PARSED_FIELDS = ('series', 'title', 'year', 'season', 'episode', 'resolution', 'codec')
+METADATA_FIELDS = ('duration', 'width', 'height', 'v_codec', 'bitrate', 'v_bitrate', 'audio', 'subtitles')
 
-@dataclass
 class MediaFile:
-    path: Path
-    size: int
-    mtime: float
-    parsed_info: Dict = field(default_factory=dict)
-    metadata_info: Optional[Dict] = None
-    
-    # Valores: 'REVIEW', 'SUGGESTED', 'KEEP', 'DELETE'
-    recommendation: str = 'REVIEW'
-    reason: str = ""
-
-    # ... (propiedades sin cambios)
+    """
+    Representación compacta de un archivo multimedia. La ruta se guarda como
+    (carpeta internada, nombre), los campos parseados y de metadatos en
+    slots fijos y el motivo de la recomendación como ReasonCode. Las
+    propiedades path, parsed_info, metadata_info y reason reconstruyen la
+    vista clásica bajo demanda; parsed_info y metadata_info devuelven
+    diccionarios nuevos, por lo que para modificarlos hay que reasignarlos.
+    """
+    __slots__ = (
+        'directory', 'name', 'size', 'mtime',
+        'p_series', 'p_title', 'p_year', 'p_season', 'p_episode', 'p_resolution', 'p_codec', 'p_extra',
+        'has_metadata', 'm_duration', 'm_width', 'm_height', 'm_v_codec',
+        'm_bitrate', 'm_v_bitrate', 'm_audio', 'm_subtitles', 'm_extra',
+        'recommendation', 'reason_code', '_raw_parsed', '_raw_metadata',
+    )
+
+    def __init__(self, path: Union[Path, str], size: int, mtime: float,
+                 parsed_info: Optional[Dict] = None, metadata_info: Optional[Dict] = None,
+                 recommendation: str = 'REVIEW', reason: Union[ReasonCode, str] = ReasonCode.NONE):
+        self._raw_parsed: Optional[str] = None
+        self._raw_metadata: Optional[str] = None
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.parsed_info = parsed_info or {}
+        self.metadata_info = metadata_info
+        # Valores: 'REVIEW', 'SUGGESTED', 'KEEP', 'DELETE'
+        self.recommendation = recommendation
+        self.reason = reason
+
+    @classmethod
+    def from_cache(cls, path: str, size: int, mtime: float,
+                   parsed_json: Optional[str], metadata_json: Optional[str]) -> "MediaFile":
+        """
+        Crea un MediaFile a partir de una fila de la caché sin decodificar sus
+        JSON; se decodifican la primera vez que se accede a un campo parseado
+        o de metadatos.
+        """
+        media_file = cls.__new__(cls)
+        media_file._set_path(path)
+        media_file.size = size
+        media_file.mtime = mtime
+        media_file._clear_parsed()
+        media_file._clear_metadata()
+        media_file.recommendation = 'REVIEW'
+        media_file.reason_code = ReasonCode.NONE
+        media_file._raw_parsed = parsed_json or ""
+        media_file._raw_metadata = metadata_json or ""
+        return media_file
+
+    def _decode_parsed(self):
+        tracer.count("json.decode")
+        raw, self._raw_parsed = self._raw_parsed, None
+        self._store_parsed(json.loads(raw) if raw else {})
+
+    def _decode_metadata(self):
+        tracer.count("json.decode")
+        raw, self._raw_metadata = self._raw_metadata, None
+        self._store_metadata(json.loads(raw) if raw else {})
+
+    # --- Ruta ---
+    def _set_path(self, path: Union[Path, str]):
+        directory, self.name = os.path.split(str(path))
+        self.directory = directories.intern(directory)
+
+    @property
+    def path(self) -> Path:
+        return Path(self.path_str)
+
+    @path.setter
+    def path(self, value: Union[Path, str]):
+        self._set_path(value)
+
+    @property
+    def path_str(self) -> str:
+        return os.path.join(self.directory, self.name)
+
+    @property
+    def parent(self) -> Path:
+        return Path(self.directory)
+
+    # --- Información parseada ---
+    def _clear_parsed(self):
+        self.p_series = self.p_title = self.p_year = self.p_season = None
+        self.p_episode = self.p_resolution = self.p_codec = self.p_extra = None
+
+    def _store_parsed(self, info: Dict):
+        self._clear_parsed()
+        extra = None
+        for key, value in info.items():
+            if key in PARSED_FIELDS:
+                setattr(self, f"p_{key}", value)
+            else:
+                if extra is None: extra = {}
+                extra[key] = value
+        self.p_extra = extra
+
+    @property
+    def parsed_info(self) -> Dict:
+        if self._raw_parsed is not None: self._decode_parsed()
+        info = {key: getattr(self, f"p_{key}") for key in PARSED_FIELDS if getattr(self, f"p_{key}") is not None}
+        if self.p_extra: info.update(self.p_extra)
+        return info
+
+    @parsed_info.setter
+    def parsed_info(self, value: Dict):
+        self._raw_parsed = None
+        self._store_parsed(value or {})
+
+    # --- Metadatos (ffprobe) ---
+    def _clear_metadata(self):
+        self.has_metadata = False
+        self.m_duration = self.m_width = self.m_height = self.m_v_codec = self.m_extra = None
+        self.m_bitrate = self.m_v_bitrate = self.m_audio = self.m_subtitles = None
+
+    def _store_metadata(self, info: Optional[Dict]):
+        self._clear_metadata()
+        if info is None:
+            return
+        self.has_metadata = True
+        extra = None
+        for key, value in info.items():
+            if key in METADATA_FIELDS:
+                setattr(self, f"m_{key}", sys.intern(value) if isinstance(value, str) else value)
+            else:
+                if extra is None: extra = {}
+                extra[key] = value
+        self.m_extra = extra
+
+    @property
+    def metadata_info(self) -> Optional[Dict]:
+        if self._raw_metadata is not None: self._decode_metadata()
+        if not self.has_metadata:
+            return None
+        info = {key: getattr(self, f"m_{key}") for key in METADATA_FIELDS if getattr(self, f"m_{key}") is not None}
+        if self.m_extra: info.update(self.m_extra)
+        return info
+
+    @metadata_info.setter
+    def metadata_info(self, value: Optional[Dict]):
+        self._raw_metadata = None
+        self._store_metadata(value)
+
+    @property
+    def duration(self) -> float:
+        if self._raw_metadata is not None: self._decode_metadata()
+        return self.m_duration or 0
+
+    @property
+    def height(self) -> int:
+        if self._raw_metadata is not None: self._decode_metadata()
+        return self.m_height or 0
+
+    @property
+    def v_codec(self) -> str:
+        if self._raw_metadata is not None: self._decode_metadata()
+        return self.m_v_codec or ""
+
+    @property
+    def audio_languages(self) -> List[str]:
+        """Idiomas de las pistas de audio en orden (vacío si el archivo se sondeó con una versión antigua)."""
+        if self._raw_metadata is not None: self._decode_metadata()
+        return [stream[0] for stream in self.m_audio or ()]
+
+    # --- Recomendación ---
+    @property
+    def reason(self) -> str:
+        if isinstance(self.reason_code, str):
+            return self.reason_code
+        return REASON_TEXTS[self.reason_code]
+
+    @reason.setter
+    def reason(self, value: Union[ReasonCode, str]):
+        if isinstance(value, str):
+            # Los textos conocidos se guardan como código; un texto libre se conserva tal cual
+            value = _REASON_CODES_BY_TEXT.get(value, value)
+        self.reason_code = value
+
+    # --- Propiedades derivadas ---
     @property
     def title(self) -> str:
-        return self.parsed_info.get('series', self.parsed_info.get('title', 'Unknown'))
+        if self._raw_parsed is not None: self._decode_parsed()
+        if self.p_series is not None: return self.p_series
+        return self.p_title if self.p_title is not None else 'Unknown'
     @property
     def year(self) -> Optional[int]:
-        return self.parsed_info.get('year')
+        if self._raw_parsed is not None: self._decode_parsed()
+        return self.p_year
     @property
     def season(self) -> Optional[int]:
-        return self.parsed_info.get('season')
+        if self._raw_parsed is not None: self._decode_parsed()
+        return self.p_season
     @property
     def episode(self) -> Optional[float]:
-        ep = self.parsed_info.get('episode')
-        return float(ep) if ep is not None else None
+        if self._raw_parsed is not None: self._decode_parsed()
+        return float(self.p_episode) if self.p_episode is not None else None
     @property
     def is_series_episode(self) -> bool:
-        return 'season' in self.parsed_info and 'episode' in self.parsed_info
+        if self._raw_parsed is not None: self._decode_parsed()
+        return self.p_season is not None and self.p_episode is not None
+
+    def _as_tuple(self):
+        return (self.path_str, self.size, self.mtime, self.parsed_info, self.metadata_info,
+                self.recommendation, self.reason)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._as_tuple() == other._as_tuple()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"MediaFile(path={self.path!r}, size={self.size!r}, mtime={self.mtime!r}, "
+                f"parsed_info={self.parsed_info!r}, metadata_info={self.metadata_info!r}, "
+                f"recommendation={self.recommendation!r}, reason={self.reason!r})")
+
+    def __reduce__(self):
+        # La carpeta internada solo se comparte en este proceso: se serializa la ruta completa
+        return (self.__class__, self._as_tuple())
 
 @dataclass
 class DuplicateGroup:
     group_id: str
     files: List[MediaFile]
-    display_title: str
\ No newline at end of file
+    display_title: str
+
+    @property
+    def identity(self) -> str:
+        """
+        Clave estable del grupo entre entregas parciales del matcher: la ruta
+        de su primer archivo. Una entidad que vuelve a entregarse tras absorber
+        más carpetas conserva su primer archivo, y dos grupos distintos nunca
+        lo comparten (el título sí pueden compartirlo).
+        """
+        return self.files[0].path_str if self.files else self.group_id
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+# Actualizaciones por segundo como máximo hacia la interfaz
+PROGRESS_FPS = 10
+# Ventana usada para calcular la velocidad (archivos/s y bytes/s)
+RATE_WINDOW_SECONDS = 5.0
+
+STAGE_DISCOVER = "discover"
+STAGE_PROBE = "probe"
+STAGE_WRITE = "write"
+STAGE_MATCH = "match"
+
+STAGE_LABELS = {
+    STAGE_DISCOVER: "Recolectando",
+    STAGE_PROBE: "Procesando",
+    STAGE_WRITE: "Guardando",
+    STAGE_MATCH: "Identificando duplicados",
+}
+
+@dataclass
+class StageProgress:
+    """Estado de una etapa en un instante. `total` es None mientras no se conoce."""
+    stage: str
+    done: int
+    total: Optional[int]
+    bytes_done: int
+    rate: float
+    bytes_rate: float
+    eta: Optional[float]
+    finished: bool
+    current: str = ""
+
+    @property
+    def percent(self) -> Optional[int]:
+        if not self.total: return 100 if self.finished else None
+        return min(100, int(self.done * 100 / self.total))
+
+    def describe(self) -> str:
+        text = STAGE_LABELS.get(self.stage, self.stage)
+        text += f" ({self.done}/{self.total})" if self.total is not None else f" ({self.done})"
+        if self.rate: text += f" · {self.rate:.1f} arch/s"
+        if self.bytes_rate: text += f" · {self.bytes_rate / 1024**2:.1f} MB/s"
+        if self.eta is not None and not self.finished: text += f" · ETA {int(self.eta // 60)}:{int(self.eta % 60):02d}"
+        if self.current and not self.finished: text += f": {self.current}"
+        return text
+
+class _StageCounters:
+    __slots__ = ('done', 'total', 'bytes_done', 'finished', 'current', 'samples')
+
+    def __init__(self, total: Optional[int]):
+        self.done = 0
+        self.total = total
+        self.bytes_done = 0
+        self.finished = False
+        self.current = ""
+        self.samples = deque()
+
+class ProgressAggregator:
+    """
+    Intermediario entre las etapas del escaneo y la interfaz. Acumula los
+    contadores de cada etapa (seguro entre hilos) y solo llama a `on_update`
+    como mucho `fps` veces por segundo, con una lista de StageProgress en el
+    orden en que se crearon las etapas. Los cambios de etapa y `flush()` se
+    entregan siempre, para que el último estado nunca se pierda.
+
+    Las etapas avanzan desde varios hilos: cada emisión toma la instantánea
+    y llama a `on_update` sin soltar `_emit_lock`, así que las
+    actualizaciones salen en el mismo orden en que se tomaron.
+    """
+    def __init__(self, on_update: Callable[[List[StageProgress]], None], fps: int = PROGRESS_FPS):
+        self.on_update = on_update
+        self.min_interval = 1.0 / fps
+        self._stages: Dict[str, _StageCounters] = {}
+        self._lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+        self._last_emit = 0.0
+
+    def start_stage(self, stage: str, total: Optional[int] = None):
+        with self._lock:
+            self._stages[stage] = _StageCounters(total)
+        self.flush()
+
+    def add_total(self, stage: str, count: int = 1):
+        with self._lock:
+            counters = self._stages[stage]
+            counters.total = (counters.total or 0) + count
+
+    def advance(self, stage: str, count: int = 1, bytes_done: int = 0, current: str = ""):
+        with self._lock:
+            counters = self._stages[stage]
+            counters.done += count
+            counters.bytes_done += bytes_done
+            if current: counters.current = current
+            now = time.monotonic()
+            if now - self._last_emit < self.min_interval:
+                return
+            self._last_emit = now # Reserva el turno: los demás hilos esperan al siguiente intervalo
+        self.flush()
+
+    def finish_stage(self, stage: str):
+        with self._lock:
+            counters = self._stages[stage]
+            counters.finished = True
+            if counters.total is None: counters.total = counters.done
+        self.flush()
+
+    def flush(self):
+        """Entrega ya el estado actual, sin esperar al límite de emisiones."""
+        with self._emit_lock:
+            with self._lock:
+                self._last_emit = now = time.monotonic()
+                snapshot = self._snapshot(now)
+            self.on_update(snapshot)
+
+    def _snapshot(self, now: float) -> List[StageProgress]:
+        result = []
+        for stage, counters in self._stages.items():
+            samples = counters.samples
+            samples.append((now, counters.done, counters.bytes_done))
+            while len(samples) > 2 and now - samples[0][0] > RATE_WINDOW_SECONDS:
+                samples.popleft()
+            start_time, start_done, start_bytes = samples[0]
+            elapsed = now - start_time
+            rate = (counters.done - start_done) / elapsed if elapsed > 0 else 0.0
+            bytes_rate = (counters.bytes_done - start_bytes) / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if counters.total is not None and rate > 0:
+                eta = max(0, counters.total - counters.done) / rate
+            result.append(StageProgress(
+                stage, counters.done, counters.total, counters.bytes_done,
+                rate, bytes_rate, eta, counters.finished, counters.current
+            ))
+        return result
@@ -1,9 +1,13 @@
-from typing import List
-from src.core.models import MediaFile, DuplicateGroup
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from src.core.models import MediaFile, DuplicateGroup, ReasonCode
+from src.core.library_snapshot import LibrarySnapshot
 
 def get_quality_score(media_file: MediaFile) -> int:
-    if media_file.metadata_info and media_file.metadata_info.get('height', 0) > 0:
-        height = media_file.metadata_info['height']
+    height = media_file.height
+    if height > 0:
         if height >= 2160: return 5
         if height >= 1080: return 4
         if height >= 720: return 3
@@ -16,47 +20,131 @@ def get_quality_score(media_file: MediaFile) -> int:
     if '480p' in resolution: return 2
     return 0
 
+# Eficiencia de compresión por códec de vídeo (nombre de ffprobe): mayor es mejor, desconocido = 0
+CODEC_EFFICIENCY = {
+    "av1": 6, "hevc": 5, "h265": 5, "vp9": 4, "h264": 3, "avc": 3, "vc1": 2, "wmv3": 2,
+    "mpeg4": 1, "msmpeg4v3": 1, "xvid": 1, "divx": 1, "mpeg2video": 0, "mpeg1video": 0,
+}
+# Contenedores de más a menos preferido; los que no están van detrás
+CONTAINER_PREFERENCE = (".mkv", ".mp4", ".m4v", ".webm", ".mov", ".m2ts", ".ts", ".avi", ".wmv", ".mpg", ".mpeg")
+_CONTAINER_RANK = {ext: rank for rank, ext in enumerate(CONTAINER_PREFERENCE)}
+
+@dataclass(frozen=True)
+class RankRule:
+    """Criterio de recomendación: una columna por archivo y si gana el mayor o el menor valor."""
+    label: str
+    column: str
+    descending: bool
+
+RULES: Dict[str, RankRule] = {
+    "quality_desc": RankRule("Mejor Calidad (Resolución)", "quality", True),
+    "size_desc": RankRule("Mayor Tamaño (Más Bitrate)", "size", True),
+    "size_asc": RankRule("Menor Tamaño (Ahorrar Espacio)", "size", False),
+    "mtime_desc": RankRule("Archivo Más Reciente", "mtime", True),
+    "mtime_asc": RankRule("Archivo Más Antiguo", "mtime", False),
+    "bitrate_desc": RankRule("Mayor Bitrate (Tamaño por Segundo)", "bitrate", True),
+    "codec_desc": RankRule("Códec Más Eficiente (AV1, HEVC...)", "codec_rank", True),
+    "container_pref": RankRule("Contenedor Preferido (MKV, MP4...)", "container_rank", False),
+}
+
+def _container_rank(media_file: MediaFile) -> int:
+    return _CONTAINER_RANK.get(os.path.splitext(media_file.name)[1].lower(), len(CONTAINER_PREFERENCE))
+
 class Recommender:
-    def __init__(self, priority_order: List[str]):
+    """
+    Elige el archivo sugerido de cada grupo según `priority_order`. El orden
+    se compila una vez en una clave lexicográfica (una columna NumPy por
+    criterio, menor es mejor) y todos los grupos se clasifican a la vez: por
+    cada criterio se descartan, grupo a grupo, los candidatos peores que el
+    mejor, y gana el primero que queda en el orden del grupo. Es el mismo
+    resultado que el mínimo de (claves..., posición). Los criterios
+    desconocidos se ignoran.
+    """
+    def __init__(self, priority_order: List[str], snapshot: Optional[LibrarySnapshot] = None):
         self.priority_order = priority_order
+        # Instantánea columnar del escaneo; si está, calidad, duración y códec se leen de ella
+        self.snapshot = snapshot
+        self.rules = [RULES[key] for key in priority_order if key in RULES]
 
-    def apply_recommendations(self, group: DuplicateGroup):
-        if not group.files or len(group.files) < 2:
-            for file in group.files:
-                file.recommendation = 'REVIEW'
-            return
-
-        candidates = list(group.files)
-        
-        for rule_key in self.priority_order:
-            if len(candidates) == 1: break
-            best_of_rule = []
-            
-            if rule_key == "quality_desc":
-                max_quality = max(get_quality_score(f) for f in candidates)
-                best_of_rule = [f for f in candidates if get_quality_score(f) == max_quality]
-            elif rule_key == "size_desc":
-                max_size = max(f.size for f in candidates)
-                best_of_rule = [f for f in candidates if f.size == max_size]
-            elif rule_key == "size_asc":
-                min_size = min(f.size for f in candidates)
-                best_of_rule = [f for f in candidates if f.size == min_size]
-            elif rule_key == "mtime_desc":
-                max_mtime = max(f.mtime for f in candidates)
-                best_of_rule = [f for f in candidates if f.mtime == max_mtime]
-            elif rule_key == "mtime_asc":
-                min_mtime = min(f.mtime for f in candidates)
-                best_of_rule = [f for f in candidates if f.mtime == min_mtime]
-            
-            if best_of_rule and len(best_of_rule) < len(candidates):
-                candidates = best_of_rule
-
-        winner = candidates[0]
-        
-        for file in group.files:
-            if file is winner:
+    def quality_scores(self, files: List[MediaFile]) -> List[int]:
+        return self._column("quality", files).tolist()
+
+    def _column(self, name: str, files: Sequence[MediaFile], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        count = len(files)
+        if name == "size":
+            return np.fromiter((f.size for f in files), np.int64, count)
+        if name == "mtime":
+            return np.fromiter((f.mtime for f in files), np.float64, count)
+        if name == "container_rank":
+            return np.fromiter((_container_rank(f) for f in files), np.int32, count)
+        if name == "bitrate":
+            duration = self._column("duration", files, rows)
+            size = self._column("size", files).astype(np.float64)
+            return np.divide(size, duration, out=np.zeros(count), where=duration > 0)
+
+        per_file = {
+            "quality": (get_quality_score, np.int32),
+            "duration": (lambda f: f.duration, np.float64),
+            "codec_rank": (lambda f: CODEC_EFFICIENCY.get(f.v_codec, 0), np.int32),
+        }[name]
+        if self.snapshot is None:
+            return np.fromiter((per_file[0](f) for f in files), per_file[1], count)
+        if rows is None: rows = self.snapshot.rows_of(files)
+        if name == "codec_rank":
+            by_codec = np.array([CODEC_EFFICIENCY.get(c, 0) for c in self.snapshot.codecs], dtype=np.int32)
+            source = by_codec[self.snapshot.codec_id] if len(by_codec) else np.zeros(len(self.snapshot), np.int32)
+        else:
+            source = getattr(self.snapshot, name)
+        # La fila -1 (archivo fuera de la instantánea) cae en el hueco final y se calcula uno a uno
+        values = np.append(source, 0).astype(per_file[1])[rows]
+        for i in np.flatnonzero(rows < 0):
+            values[i] = per_file[0](files[i])
+        return values
+
+    def sort_keys(self, files: Sequence[MediaFile]) -> List[np.ndarray]:
+        """Una columna por criterio, del más al menos importante; menor es mejor."""
+        rows = self.snapshot.rows_of(files) if self.snapshot is not None else None
+        columns: Dict[str, np.ndarray] = {}
+        keys = []
+        for rule in self.rules:
+            if rule.column not in columns:
+                columns[rule.column] = self._column(rule.column, files, rows)
+            keys.append(-columns[rule.column] if rule.descending else columns[rule.column])
+        return keys
+
+    def rank_groups(self, groups: Sequence[DuplicateGroup]):
+        """Aplica las recomendaciones a todos los grupos en una sola pasada."""
+        ranked = []
+        for group in groups:
+            if len(group.files) < 2:
+                for file in group.files:
+                    file.recommendation = 'REVIEW'
+            else:
+                ranked.append(group)
+        if not ranked: return
+
+        files = [f for group in ranked for f in group.files]
+        sizes = np.fromiter((len(group.files) for group in ranked), np.int64, len(ranked))
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        # Los grupos son tramos contiguos: cada criterio se reduce por tramo con reduceat,
+        # quedándose con los candidatos empatados en el mejor valor de su grupo
+        candidate = np.ones(len(files), dtype=bool)
+        for key in self.sort_keys(files):
+            masked = np.where(candidate, key.astype(np.float64), np.inf)
+            best = np.minimum.reduceat(masked, starts)
+            candidate &= masked == np.repeat(best, sizes)
+        # Entre los que quedan gana el primero del grupo
+        position = np.where(candidate, np.arange(len(files)), len(files))
+        is_winner = np.zeros(len(files), dtype=bool)
+        is_winner[np.minimum.reduceat(position, starts)] = True
+
+        for file, winner in zip(files, is_winner.tolist()):
+            if winner:
                 file.recommendation = 'SUGGESTED'
-                file.reason = "Sugerido como la mejor versión según tus prioridades."
+                file.reason_code = ReasonCode.BEST_BY_PRIORITY
             else:
                 file.recommendation = 'REVIEW'
-                file.reason = "Hay una versión potencialmente mejor disponible."
\ No newline at end of file
+                file.reason_code = ReasonCode.BETTER_VERSION_AVAILABLE
+
+    def apply_recommendations(self, group: DuplicateGroup):
+        self.rank_groups([group])
@@ -0,0 +1,265 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Dict, Optional
+from src.utils.tracing import tracer
+
+IO_CLASS_BEST_EFFORT = "best-effort"
+IO_CLASS_IDLE = "idle" # Solo usa el disco cuando nadie más lo pide
+
+PROFILE_NORMAL = "normal"
+PROFILE_BACKGROUND = "background"
+PROFILE_CUSTOM = "custom"
+
+# Bytes que lee ffprobe de un archivo para analizarlo (probesize por defecto de ffmpeg, 5 MB)
+PROBE_READ_BYTES = 5 * 1000 * 1000
+# Auto-cesión: E/S ajena al escaneo a partir de la cual se pausa, y cada cuánto se mide
+YIELD_THRESHOLD_BYTES = 2 * 1024 * 1024
+YIELD_SAMPLE_SECONDS = 1.0
+YIELD_PAUSE_SECONDS = 2.0
+_POLL_SECONDS = 0.1
+
+# ioprio_set no tiene envoltorio en la biblioteca estándar: número de syscall por arquitectura
+_IOPRIO_SYSCALLS = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "riscv64": 30, "armv7l": 314, "ppc64le": 273}
+_IOPRIO_CLASSES = {IO_CLASS_BEST_EFFORT: 2, IO_CLASS_IDLE: 3}
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+
+@dataclass
+class GovernorSettings:
+    """
+    Límites de recursos del escaneo. `max_probes` 0 deja el número de hilos
+    por defecto del motor; `probes_per_device` y `read_bandwidth` (bytes/s por
+    dispositivo) 0 no limitan.
+    """
+    nice: int = 0
+    io_class: str = IO_CLASS_BEST_EFFORT
+    io_level: int = 4 # 0 (más prioridad) a 7; solo con best-effort
+    max_probes: int = 0
+    probes_per_device: int = 0
+    read_bandwidth: int = 0
+    auto_yield: bool = False
+
+    @classmethod
+    def from_config(cls, config) -> "GovernorSettings":
+        """Lee los ajustes de un ConfigManager (QSettings devuelve textos)."""
+        profile = config.get("scan/profile", PROFILE_NORMAL)
+        if profile in PROFILES: return replace(PROFILES[profile])
+        defaults = cls()
+        def number(key, default):
+            try: return int(config.get(key, default))
+            except (TypeError, ValueError): return default
+        return cls(
+            nice=number("scan/nice", defaults.nice),
+            io_class=config.get("scan/io_class", defaults.io_class),
+            io_level=number("scan/io_level", defaults.io_level),
+            max_probes=number("scan/max_probes", defaults.max_probes),
+            probes_per_device=number("scan/probes_per_device", defaults.probes_per_device),
+            read_bandwidth=number("scan/read_bandwidth", defaults.read_bandwidth),
+            auto_yield=config.get("scan/auto_yield", "false") in (True, "true"),
+        )
+
+    def save(self, config, profile: str = PROFILE_CUSTOM):
+        config.set("scan/profile", profile)
+        for key, value in asdict(self).items():
+            config.set(f"scan/{key}", value)
+
+PROFILES: Dict[str, GovernorSettings] = {
+    PROFILE_NORMAL: GovernorSettings(),
+    # Pensado para escanear en una máquina que a la vez sirve vídeo: un sondeo por disco, a ritmo bajo
+    PROFILE_BACKGROUND: GovernorSettings(nice=19, io_class=IO_CLASS_IDLE, io_level=7, max_probes=2,
+                                         probes_per_device=1, read_bandwidth=8 * 1024 * 1024, auto_yield=True),
+}
+
+def _set_io_priority(io_class: str, level: int) -> bool:
+    """ioprio_set sobre el hilo actual (Linux). Lo heredan los hilos y procesos que cree después."""
+    number = _IOPRIO_SYSCALLS.get(os.uname().machine) if hasattr(os, "uname") else None
+    if number is None or io_class not in _IOPRIO_CLASSES: return False
+    import ctypes
+    value = (_IOPRIO_CLASSES[io_class] << _IOPRIO_CLASS_SHIFT) | (max(0, min(7, level)) if io_class == IO_CLASS_BEST_EFFORT else 0)
+    libc = ctypes.CDLL(None, use_errno=True)
+    return libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, value) == 0
+
+def _block_device(st_dev: int) -> Optional[str]:
+    """Nombre del disco (no de la partición) en /proc/diskstats, o None si no es un dispositivo de bloques local."""
+    sys_path = os.path.realpath(f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}")
+    if not os.path.exists(sys_path): return None
+    if os.path.exists(os.path.join(sys_path, "partition")):
+        sys_path = os.path.dirname(sys_path)
+    return os.path.basename(sys_path)
+
+def _disk_bytes(device: str) -> Optional[int]:
+    """Bytes leídos + escritos por el disco desde el arranque (sectores de 512 bytes)."""
+    try:
+        with open("/proc/diskstats") as f:
+            for line in f:
+                fields = line.split()
+                if fields[2] == device:
+                    return (int(fields[5]) + int(fields[9])) * 512
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+def _process_io_bytes(pid) -> int:
+    total = 0
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("read_bytes", "write_bytes"): total += int(value)
+    except (OSError, ValueError):
+        pass # El hijo ya terminó: su E/S pasa a la del padre
+    return total
+
+def _own_io_bytes() -> int:
+    """E/S real de este proceso y de sus hijos (los ffprobe), terminados o en curso."""
+    # /proc/self/io ya incluye los hijos recogidos con wait; faltan los que siguen en marcha
+    total = _process_io_bytes("self")
+    try:
+        for tid in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{tid}/children") as f:
+                total += sum(_process_io_bytes(pid) for pid in f.read().split())
+    except OSError:
+        pass
+    return total
+
+class _TokenBucket:
+    """Limita los bytes por segundo; se puede adelantar hasta un segundo de crédito."""
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: int) -> float:
+        """Descuenta `amount` y devuelve los segundos que hay que esperar antes de leer."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+class ResourceGovernor:
+    """
+    Aplica los límites de GovernorSettings al escaneo: prioridad de CPU y de
+    E/S del proceso, sondeos simultáneos por disco, ancho de banda de lectura
+    por disco y pausa automática mientras otro programa usa el disco (por
+    ejemplo, un reproductor). Los discos se identifican por su dispositivo de
+    bloques, así que dos particiones del mismo disco comparten límites.
+
+    La prioridad se aplica al proceso de escaneo entero (`apply_priority`);
+    el resto, por archivo, con `probe_slot` alrededor de cada ffprobe.
+    """
+    def __init__(self, settings: Optional[GovernorSettings] = None, on_status: Optional[Callable[[str], None]] = None):
+        self.settings = settings or GovernorSettings()
+        self.on_status = on_status or (lambda text: None)
+        self._lock = threading.Lock()
+        self._devices: Dict[int, str] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._yield_lock = threading.Lock()
+        self._last_sample: Dict[str, tuple] = {}
+        self._quiet_until: Dict[str, float] = {}
+
+    @property
+    def limits_probes(self) -> bool:
+        s = self.settings
+        return bool(s.probes_per_device or s.read_bandwidth or s.auto_yield)
+
+    def apply_priority(self):
+        """
+        Baja la prioridad de CPU y E/S. En Linux afecta al hilo que llama y a
+        todo lo que cree después (hilos del motor e hijos ffprobe), así que se
+        llama al inicio del proceso de escaneo.
+        """
+        s = self.settings
+        if sys.platform == "win32":
+            if s.nice > 0 or s.io_class == IO_CLASS_IDLE:
+                import ctypes
+                # IDLE_PRIORITY_CLASS / BELOW_NORMAL_PRIORITY_CLASS; los hijos heredan ambas clases
+                priority_class = 0x40 if s.nice >= 10 or s.io_class == IO_CLASS_IDLE else 0x4000
+                ctypes.windll.kernel32.SetPriorityClass(ctypes.windll.kernel32.GetCurrentProcess(), priority_class)
+            return
+        if s.nice > 0:
+            try:
+                os.nice(s.nice)
+            except OSError as e:
+                print(f"No se pudo bajar la prioridad de CPU del escaneo: {e}")
+        if (s.io_class != IO_CLASS_BEST_EFFORT or s.io_level != 4) and not _set_io_priority(s.io_class, s.io_level):
+            print("No se pudo cambiar la prioridad de E/S del escaneo en este sistema.")
+
+    def _device(self, st_dev: int) -> str:
+        with self._lock:
+            device = self._devices.get(st_dev)
+            if device is None:
+                device = (_block_device(st_dev) if sys.platform.startswith("linux") else None) or f"dev-{st_dev}"
+                self._devices[st_dev] = device
+                if self.settings.probes_per_device:
+                    self._slots[device] = threading.BoundedSemaphore(self.settings.probes_per_device)
+                if self.settings.read_bandwidth:
+                    self._buckets[device] = _TokenBucket(self.settings.read_bandwidth)
+            return device
+
+    @contextmanager
+    def probe_slot(self, st_dev: int, size: int, stop_event: threading.Event):
+        """
+        Espera turno para sondear un archivo del dispositivo `st_dev`: pausa
+        si el disco está ocupado por otros, reserva ancho de banda y ocupa
+        uno de los huecos del disco. Si `stop_event` se activa deja de
+        esperar; quien llama debe comprobarlo.
+        """
+        if not self.limits_probes:
+            yield
+            return
+        device = self._device(st_dev)
+        if self.settings.auto_yield: self._wait_for_quiet_disk(device, stop_event)
+        bucket = self._buckets.get(device)
+        if bucket is not None:
+            delay = bucket.reserve(min(size, PROBE_READ_BYTES))
+            if delay:
+                with tracer.span("governor.throttle", "governor", device=device):
+                    stop_event.wait(delay)
+        slot = self._slots.get(device)
+        if slot is None:
+            yield
+            return
+        while not slot.acquire(timeout=_POLL_SECONDS):
+            if stop_event.is_set():
+                yield
+                return
+        try:
+            yield
+        finally:
+            slot.release()
+
+    def _foreign_io_rate(self, device: str) -> Optional[float]:
+        """Bytes/s que mueve el disco sin contar los del escaneo, desde la última muestra."""
+        disk = _disk_bytes(device)
+        if disk is None: return None
+        now, own = time.monotonic(), _own_io_bytes()
+        previous = self._last_sample.get(device)
+        self._last_sample[device] = (now, disk, own)
+        if previous is None or now - previous[0] <= 0: return 0.0
+        return max(0, (disk - previous[1]) - (own - previous[2])) / (now - previous[0])
+
+    def _wait_for_quiet_disk(self, device: str, stop_event: threading.Event):
+        if not sys.platform.startswith("linux"): return
+        with self._yield_lock: # Un solo hilo mide; los demás esperan a su veredicto
+            if time.monotonic() < self._quiet_until.get(device, 0): return
+            rate = self._foreign_io_rate(device)
+            paused = False
+            while rate is not None and rate > YIELD_THRESHOLD_BYTES and not stop_event.is_set():
+                if not paused:
+                    self.on_status(f"Escaneo en pausa: otro programa está usando el disco {device}...")
+                    tracer.count("governor.yields")
+                    paused = True
+                with tracer.span("governor.yield", "governor", device=device):
+                    stop_event.wait(YIELD_PAUSE_SECONDS)
+                rate = self._foreign_io_rate(device)
+            if paused and not stop_event.is_set():
+                self.on_status("Disco libre: se reanuda el escaneo.")
+            self._quiet_until[device] = time.monotonic() + YIELD_SAMPLE_SECONDS
@@ -0,0 +1,210 @@
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+import numpy as np
+from src.core.models import DuplicateGroup
+
+KIND_SERIES = 0
+KIND_MOVIE = 1
+
+SORT_TITLE = "title"
+SORT_TOTAL_SIZE = "total_size"
+SORT_RECLAIMABLE = "reclaimable"
+SORT_FILE_COUNT = "file_count"
+SORT_TYPE = "type"
+SORT_OPTIONS = {
+    SORT_TITLE: "Título",
+    SORT_TOTAL_SIZE: "Tamaño total",
+    SORT_RECLAIMABLE: "Espacio recuperable",
+    SORT_FILE_COUNT: "Número de archivos",
+    SORT_TYPE: "Tipo (series / películas)",
+}
+_SORT_COLUMNS = {SORT_TOTAL_SIZE: "total_size", SORT_RECLAIMABLE: "reclaimable", SORT_FILE_COUNT: "file_count"}
+
+# Separadores del texto indexado: una búsqueda nunca los contiene, así que no cruza de un grupo a otro
+_GROUP_SEPARATOR = "\x00"
+_FIELD_SEPARATOR = "\n"
+
+def reclaimable_bytes(group: DuplicateGroup) -> int:
+    """Bytes que se liberan quedándose con un solo archivo: el marcado para conservar o, si no hay, el mayor."""
+    sizes = [f.size for f in group.files]
+    kept = next((f.size for f in group.files if f.recommendation in ('KEEP', 'SUGGESTED')), max(sizes, default=0))
+    return sum(sizes) - kept
+
+class ResultsIndex:
+    """
+    Índice de los resultados para buscar y ordenar sin recorrer los nodos.
+    Cada grupo tiene un id consecutivo y cada cabecera (una serie o la
+    sección de películas) otro; las claves de orden son columnas NumPy por
+    grupo (tamaño total, recuperable, número de archivos, tipo) que se
+    calculan al añadir el grupo. El texto (título y rutas, en minúsculas) se
+    busca en una sola cadena con todos los grupos, así que cada búsqueda es
+    un str.find por grupo coincidente.
+
+    Los grupos quitados (ignorados o sustituidos) se marcan como muertos; sus
+    ids no se reutilizan.
+    """
+    def __init__(self):
+        self._top_titles: List[str] = []
+        self._top_kinds: List[int] = []
+        self._top_groups: List[List[int]] = []
+        self._parent: List[int] = []
+        self._kind: List[int] = []
+        self._total_size: List[int] = []
+        self._reclaimable: List[int] = []
+        self._file_count: List[int] = []
+        self._order_keys: List[Tuple] = [] # Orden por título dentro de la cabecera
+        self._texts: List[str] = []
+        self._alive: List[bool] = []
+        self._columns: Optional[dict] = None
+        self._haystack: Optional[Tuple[str, List[int]]] = None
+        self._last_search: Tuple[str, Optional[np.ndarray]] = ("", None)
+
+    # --- Altas y bajas ---
+    def add_top(self, title: str, kind: int) -> int:
+        self._top_titles.append(title)
+        self._top_kinds.append(kind)
+        self._top_groups.append([])
+        self._columns = None
+        return len(self._top_titles) - 1
+
+    def add_group(self, top_id: int, group: DuplicateGroup, kind: int) -> int:
+        files = group.files
+        self._top_groups[top_id].append(len(self._parent))
+        self._parent.append(top_id)
+        self._kind.append(kind)
+        self._total_size.append(sum(f.size for f in files))
+        self._reclaimable.append(reclaimable_bytes(group))
+        self._file_count.append(len(files))
+        if kind == KIND_SERIES:
+            first = files[0] if files else None
+            season = first.season if first is not None and first.season is not None else -1
+            episode = first.episode if first is not None and first.episode is not None else -1
+            self._order_keys.append((season, episode, group.group_id))
+        else:
+            self._order_keys.append((-1, -1, group.display_title.lower()))
+        self._texts.append(_FIELD_SEPARATOR.join([group.display_title, *(f.path_str for f in files)]).lower())
+        self._alive.append(True)
+        self._invalidate()
+        return len(self._parent) - 1
+
+    def update_group(self, group_id: int, group: DuplicateGroup):
+        """Recalcula lo que depende de las decisiones (el espacio recuperable)."""
+        self._reclaimable[group_id] = reclaimable_bytes(group)
+        self._columns = None
+
+    def remove_group(self, group_id: int):
+        self._alive[group_id] = False
+        self._invalidate()
+
+    def groups_of(self, top_id: int) -> List[int]:
+        """Ids de los grupos vivos de una cabecera, estén o no visibles."""
+        return [g for g in self._top_groups[top_id] if self._alive[g]]
+
+    def _invalidate(self):
+        self._columns = None
+        self._haystack = None
+        self._last_search = ("", None)
+
+    def _finalize(self) -> dict:
+        """Convierte las listas en columnas NumPy (una vez por cada tanda de cambios)."""
+        if self._columns is not None: return self._columns
+        group_count = len(self._parent)
+        title_rank = np.empty(group_count, dtype=np.int64)
+        title_rank[sorted(range(group_count), key=self._order_keys.__getitem__)] = np.arange(group_count)
+        top_count = len(self._top_titles)
+        top_rank = np.empty(top_count, dtype=np.int64)
+        top_rank[sorted(range(top_count), key=lambda t: self._top_titles[t].lower())] = np.arange(top_count)
+        self._columns = {
+            "parent": np.array(self._parent, dtype=np.int64),
+            "kind": np.array(self._kind, dtype=np.int8),
+            "total_size": np.array(self._total_size, dtype=np.int64),
+            "reclaimable": np.array(self._reclaimable, dtype=np.int64),
+            "file_count": np.array(self._file_count, dtype=np.int64),
+            "alive": np.array(self._alive, dtype=bool),
+            "title_rank": title_rank,
+            "top_rank": top_rank,
+            "top_kind": np.array(self._top_kinds, dtype=np.int8),
+        }
+        return self._columns
+
+    # --- Búsqueda ---
+    def search(self, query: str) -> np.ndarray:
+        """Máscara por grupo: el texto está en su título o sus rutas, o en el título de su cabecera."""
+        query = query.strip().lower()
+        columns = self._finalize()
+        if not query: return columns["alive"].copy()
+        matches = np.zeros(len(self._parent), dtype=bool)
+        previous_query, previous_hits = self._last_search
+        if previous_hits is not None and previous_query and query.startswith(previous_query):
+            # Al seguir escribiendo solo pueden coincidir los que ya coincidían
+            texts = self._texts
+            hits = [g for g in previous_hits.tolist() if query in texts[g]]
+        else:
+            hits = self._find(query)
+        hits_array = np.array(hits, dtype=np.int64)
+        self._last_search = (query, hits_array)
+        matches[hits_array] = True
+        top_hits = np.fromiter((query in title.lower() for title in self._top_titles), bool, len(self._top_titles))
+        if len(matches): matches |= top_hits[columns["parent"]]
+        return matches & columns["alive"]
+
+    def _find(self, query: str) -> List[int]:
+        if self._haystack is None:
+            starts, position = [], 0
+            for text in self._texts:
+                starts.append(position)
+                position += len(text) + 1
+            self._haystack = (_GROUP_SEPARATOR.join(self._texts), starts)
+        haystack, starts = self._haystack
+        hits = []
+        position = haystack.find(query)
+        while position >= 0:
+            group_id = bisect_right(starts, position) - 1
+            hits.append(group_id)
+            # Basta una coincidencia por grupo: se salta al siguiente
+            next_start = starts[group_id + 1] if group_id + 1 < len(starts) else len(haystack)
+            position = haystack.find(query, next_start)
+        return hits
+
+    # --- Orden ---
+    def arrange(self, query: str, sort_key: str, descending: bool) -> Tuple[List[int], List[np.ndarray]]:
+        """
+        Cabeceras visibles en orden y, para cada una, los ids de sus grupos
+        visibles en orden. Las cabeceras se ordenan por el agregado de sus
+        grupos (todos, no solo los visibles, para que filtrar no las mueva);
+        la sección de películas va al final salvo al ordenar por tipo. Los
+        empates se resuelven por título.
+        """
+        columns = self._finalize()
+        parent = columns["parent"]
+        visible = np.flatnonzero(self.search(query))
+        sign = -1 if descending else 1
+
+        top_count = len(self._top_titles)
+        top_rank = columns["top_rank"]
+        if sort_key == SORT_TYPE:
+            top_primary = sign * columns["top_kind"].astype(np.int64)
+        else:
+            top_primary = columns["top_kind"].astype(np.int64) # Series primero, películas al final
+        if sort_key in _SORT_COLUMNS:
+            alive = columns["alive"]
+            totals = np.bincount(parent[alive], weights=columns[_SORT_COLUMNS[sort_key]][alive], minlength=top_count)
+            top_order = np.lexsort((top_rank, sign * totals, top_primary))
+        elif sort_key == SORT_TITLE:
+            top_order = np.lexsort((sign * top_rank, top_primary))
+        else:
+            top_order = np.lexsort((top_rank, top_primary))
+        top_position = np.empty(top_count, dtype=np.int64)
+        top_position[top_order] = np.arange(top_count)
+
+        title_rank = columns["title_rank"][visible]
+        if sort_key in _SORT_COLUMNS:
+            group_key = sign * columns[_SORT_COLUMNS[sort_key]][visible]
+            order = visible[np.lexsort((title_rank, group_key, top_position[parent[visible]]))]
+        else:
+            group_key = sign * title_rank if sort_key == SORT_TITLE else title_rank
+            order = visible[np.lexsort((group_key, top_position[parent[visible]]))]
+        if not len(order): return [], []
+        parents = parent[order]
+        boundaries = np.flatnonzero(np.diff(parents)) + 1
+        return parents[np.concatenate(([0], boundaries))].tolist(), np.split(order, boundaries)
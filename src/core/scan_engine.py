@@ -0,0 +1,501 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from src.modules.base import ScannerBase, MatcherBase
+from src.core.models import MediaFile, directories
+from src.core.cache_manager import (CacheManager, SESSION_RUNNING, SESSION_COMPLETED, SESSION_CANCELLED,
+                                     SESSION_FAILED)
+from src.core.progress import ProgressAggregator, STAGE_DISCOVER, STAGE_PROBE, STAGE_WRITE
+from src.core.recommender import Recommender
+from src.core.decision_store import DecisionStore, keyed_groups
+from src.core.resource_governor import ResourceGovernor
+from src.utils.metadata_extractor import MetadataExtractor, PROBE_VERSION
+from src.utils.tracing import tracer
+from src.utils.text_parser import robust_parse_episode, standardize_text
+
+# Tamaño de las colas entre etapas: limita la memoria y aplica contrapresión
+STAGE_QUEUE_SIZE = 512
+# Sondas ffprobe simultáneas (son subprocesos, así que los hilos no compiten por el GIL)
+PROBE_WORKERS = max(2, min(4, os.cpu_count() or 1))
+# La etapa de escritura agrupa archivos y los guarda cada N archivos o cada N segundos
+WRITE_BATCH_SIZE = 200
+WRITE_BATCH_SECONDS = 2.0
+# Los grupos de duplicados se entregan a la interfaz cada N grupos o cada N segundos
+GROUP_BATCH_SIZE = 500
+GROUP_BATCH_SECONDS = 0.25
+_POLL_SECONDS = 0.1
+
+_DONE = object()
+
+def _ignore(*args):
+    pass
+
+class _Cancelled(Exception):
+    pass
+
+class ScanEngine:
+    """
+    Motor de escaneo sin dependencias de Qt: Fase 1 (recorrido y
+    reconciliación con la caché) y Fase 2 (parseo y extracción de metadatos
+    de los archivos nuevos o modificados). Informa del avance mediante
+    callbacks, de modo que lo pueden usar tanto el proceso de escaneo como el agente
+    headless o la línea de comandos.
+
+    Las fases se ejecutan como un pipeline de etapas concurrentes unidas por
+    colas acotadas: recorrido -> reconciliación -> parseo -> sondeo (varios
+    hilos) -> escritura en caché. Así el sondeo de la primera ruta empieza
+    mientras las demás aún se listan y los resultados se guardan en la caché
+    según llegan. Las etapas que leen o escriben la caché abren su propia
+    conexión a la misma base de datos que `cache`.
+
+    Cada escaneo es una sesión con diario en la caché: los archivos que
+    entran en cola y los ya guardados se anotan en cada punto de control, de
+    modo que un escaneo cancelado o interrumpido se puede reanudar
+    (`resume_session`) procesando solo lo que faltaba.
+
+    `governor` limita los sondeos (simultáneos y ancho de banda por disco,
+    pausa si otro programa usa el disco); sin él no hay límites.
+    """
+    def __init__(self, paths: List, scanner: ScannerBase, cache: CacheManager,
+                 on_status: Optional[Callable[[str], None]] = None,
+                 progress: Optional[ProgressAggregator] = None,
+                 probe_workers: int = PROBE_WORKERS, resume_session: Optional[int] = None,
+                 governor: Optional[ResourceGovernor] = None):
+        self.paths_to_scan = [Path(p) for p in paths]
+        self.scanner = scanner
+        self.cache = cache
+        self.on_status = on_status or _ignore
+        self.progress = progress or ProgressAggregator(_ignore)
+        self.governor = governor or ResourceGovernor()
+        self.probe_workers = self.governor.settings.max_probes or probe_workers
+        self.session_id = resume_session
+        self._resuming = resume_session is not None
+        self._stop_event = threading.Event()
+        self._errors: List[BaseException] = []
+        self._counter_lock = threading.Lock()
+        self._to_process = 0
+
+    @property
+    def is_running(self) -> bool:
+        return not self._stop_event.is_set()
+
+    def stop(self):
+        self._stop_event.set()
+
+    # --- Utilidades de colas con cancelación ---
+    def _put(self, q: queue.Queue, item):
+        while True:
+            if self._stop_event.is_set(): raise _Cancelled()
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue, timeout: float = _POLL_SECONDS):
+        while True:
+            if self._stop_event.is_set(): raise _Cancelled()
+            try:
+                return q.get(timeout=timeout)
+            except queue.Empty:
+                if timeout != _POLL_SECONDS: return None
+                continue
+
+    def _stage(self, target, *args):
+        def run():
+            try:
+                with tracer.span(f"stage.{target.__name__.strip('_').replace('_stage', '')}", "scan"):
+                    target(*args)
+            except _Cancelled:
+                pass
+            except BaseException as e:
+                import traceback
+                traceback.print_exc()
+                self._errors.append(e)
+                self._stop_event.set()
+            finally:
+                # El último avance de la etapa pudo caer dentro del límite de emisiones: se entrega ya
+                self.progress.flush()
+        thread = threading.Thread(target=run, name=f"scan-{target.__name__.strip('_')}", daemon=True)
+        thread.start()
+        return thread
+
+    def scan(self) -> Optional[List[MediaFile]]:
+        """
+        Ejecuta las fases 1 y 2 y deja la caché al día. Devuelve todos los
+        archivos de las rutas (sin cambios + procesados), o None si se canceló.
+        Al reanudar una sesión cuyo recorrido había terminado, solo se procesan
+        los archivos pendientes de su diario, sin volver a recorrer los discos.
+        """
+        roots = [str(p) for p in self.paths_to_scan]
+        # Las carpetas del escaneo anterior ya no se comparten: la tabla empieza vacía
+        directories.clear()
+        from_journal = False
+        if self._resuming:
+            session = self.cache.get_resumable_session(roots)
+            if session is None or session["id"] != self.session_id:
+                raise ValueError(f"La sesión de escaneo {self.session_id} no se puede reanudar para estas rutas.")
+            from_journal = session["walk_complete"]
+            self.cache.set_session_status(self.session_id, SESSION_RUNNING)
+        else:
+            self.session_id = self.cache.start_scan_session(roots)
+        self._deferred = 0
+
+        self.on_status("Fase 1: Recolectando y comparando archivos con la caché..." if not from_journal
+                       else "Reanudando el escaneo interrumpido...")
+        # El total de las etapas posteriores crece a medida que la reconciliación encuentra cambios
+        self.progress.start_stage(STAGE_DISCOVER)
+        self.progress.start_stage(STAGE_PROBE, total=0)
+        self.progress.start_stage(STAGE_WRITE, total=0)
+
+        walk_q = queue.Queue(STAGE_QUEUE_SIZE)
+        parse_q = queue.Queue(STAGE_QUEUE_SIZE)
+        probe_q = queue.Queue(STAGE_QUEUE_SIZE)
+        write_q = queue.Queue(STAGE_QUEUE_SIZE)
+        self._unchanged_files: List[MediaFile] = []
+        self._processed_files: List[Tuple[int, MediaFile]] = []
+        self._probes_alive = self.probe_workers
+
+        if from_journal:
+            sources = [self._stage(self._journal_stage, parse_q, write_q)]
+        else:
+            sources = [self._stage(self._walk_stage, walk_q), self._stage(self._reconcile_stage, walk_q, parse_q, write_q)]
+        threads = [
+            *sources,
+            self._stage(self._parse_stage, parse_q, probe_q, write_q),
+            *[self._stage(self._probe_stage, probe_q, write_q) for _ in range(self.probe_workers)],
+            self._stage(self._write_stage, write_q),
+        ]
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            # Ctrl+C en la línea de comandos: se deja que la escritura guarde lo ya procesado
+            self.stop()
+            for thread in threads:
+                thread.join()
+            self.cache.set_session_status(self.session_id, SESSION_CANCELLED)
+            raise
+
+        if self._errors:
+            self.cache.set_session_status(self.session_id, SESSION_FAILED)
+            raise self._errors[0]
+        if self._stop_event.is_set():
+            self.cache.set_session_status(self.session_id, SESSION_CANCELLED)
+            return None
+        # Si al reanudar faltaba alguna unidad, sus pendientes siguen en el diario para otra vez
+        self.cache.set_session_status(self.session_id, SESSION_CANCELLED if self._deferred else SESSION_COMPLETED)
+        self.progress.finish_stage(STAGE_PROBE)
+        self.progress.finish_stage(STAGE_WRITE)
+        if from_journal:
+            return [f for root in roots for f in self.cache.iter_files_for_path(root)]
+        # El sondeo es concurrente: se restaura el orden del recorrido para que el resultado sea estable
+        self._processed_files.sort(key=lambda item: item[0])
+        return self._unchanged_files + [media_file for _, media_file in self._processed_files]
+
+    # --- Etapas ---
+    def _walk_stage(self, walk_q: queue.Queue):
+        """Lista las rutas en disco. Solo toca el sistema de archivos."""
+        for i, scan_path in enumerate(self.paths_to_scan):
+            self.on_status(f"Verificando ruta ({i+1}/{len(self.paths_to_scan)}): {scan_path}...")
+            online = scan_path.exists() and scan_path.is_dir()
+            self._put(walk_q, ("root_start", scan_path, online))
+            if online:
+                with tracer.span("walk.root", "scan", root=str(scan_path)):
+                    for path in self.scanner.scan(scan_path):
+                        self._put(walk_q, ("file", scan_path, path))
+            self._put(walk_q, ("root_end", scan_path, online))
+        self._put(walk_q, _DONE)
+
+    def _reconcile_stage(self, walk_q: queue.Queue, parse_q: queue.Queue, write_q: queue.Queue):
+        """
+        Compara cada archivo listado con la caché: los nuevos o modificados
+        pasan al parseo; los que no han cambiado se cargan (de forma perezosa)
+        desde la caché al terminar su ruta, y los que ya no existen se borran.
+        """
+        cache = CacheManager(self.cache.db_path)
+        try:
+            cached_stats: Dict[Path, Tuple] = {}
+            seen: Set[Path] = set()
+            unchanged_paths: Set[str] = set()
+            while True:
+                item = self._get(walk_q)
+                if item is _DONE: break
+                kind, scan_path, payload = item
+                root = str(scan_path)
+
+                if kind == "root_start":
+                    if payload:
+                        # Sincronizar caché con el disco
+                        volume_name = scan_path.drive if scan_path.drive else str(scan_path.parts[0])
+                        self._put(write_q, ("root", root, volume_name))
+                        # Para comparar basta con (ruta, tamaño, mtime, versión de sondeo); no se decodifica ningún JSON aquí
+                        with tracer.span("reconcile.load_cache", "scan", root=root):
+                            cached_stats = {Path(file_path): (size, mtime, version) for file_path, size, mtime, version
+                                            in cache.iter_file_rows(root, ("file_path", "size", "mtime", "probe_version"))}
+                    seen, unchanged_paths = set(), set()
+                elif kind == "file":
+                    path = payload
+                    seen.add(path)
+                    cached_stat = cached_stats.get(path)
+                    try:
+                        stats = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    self.progress.advance(STAGE_DISCOVER, bytes_done=stats.st_size, current=path.name)
+                    if cached_stat and (stats.st_size, stats.st_mtime) == cached_stat[:2] and cached_stat[2] >= PROBE_VERSION:
+                        unchanged_paths.add(str(path)) # Sin cambios
+                        tracer.count("scan.cache_hits")
+                    else:
+                        # Nuevo, modificado o sondeado con una versión anterior de la tabla de flujos
+                        tracer.count("scan.cache_misses")
+                        order = self._to_process
+                        self._to_process += 1
+                        self.progress.add_total(STAGE_PROBE)
+                        self.progress.add_total(STAGE_WRITE)
+                        self._put(write_q, ("queued", root, str(path)))
+                        self._put(parse_q, (order, root, path)) # Nuevo o modificado
+                elif kind == "root_end":
+                    if not payload:
+                        # Ruta desconectada o inexistente: se usa lo que haya en la caché
+                        offline_files = list(cache.iter_files_for_path(root))
+                        self._unchanged_files.extend(offline_files)
+                        self.progress.advance(STAGE_DISCOVER, len(offline_files))
+                        continue
+                    # Eliminar de la caché archivos que ya no existen en el disco
+                    removed = [str(p) for p in (cached_stats.keys() - seen)]
+                    if removed:
+                        self._put(write_q, ("remove", root, removed))
+                    # Solo los archivos sin cambios se materializan (de forma perezosa) desde la caché
+                    if unchanged_paths:
+                        with tracer.span("reconcile.load_unchanged", "scan", root=root):
+                            self._unchanged_files.extend(f for f in cache.iter_files_for_path(root) if f.path_str in unchanged_paths)
+                    cached_stats = {}
+            self.progress.finish_stage(STAGE_DISCOVER)
+            self.on_status(f"Fase 2: Procesando {self._to_process} archivos nuevos/modificados...")
+            self._put(write_q, ("walk_complete", None, None))
+            self._put(parse_q, _DONE)
+        finally:
+            cache.close()
+
+    def _journal_stage(self, parse_q: queue.Queue, write_q: queue.Queue):
+        """Sustituye a recorrido y reconciliación al reanudar: lee los pendientes del diario."""
+        cache = CacheManager(self.cache.db_path)
+        try:
+            online = {}
+            for root in self.paths_to_scan:
+                online[str(root)] = root.is_dir()
+                if online[str(root)]:
+                    volume_name = root.drive if root.drive else str(root.parts[0])
+                    self._put(write_q, ("root", str(root), volume_name))
+            for file_path, root in cache.iter_session_pending(self.session_id):
+                if not online.get(root):
+                    self._deferred += 1
+                    continue
+                order = self._to_process
+                self._to_process += 1
+                self.progress.add_total(STAGE_PROBE)
+                self.progress.add_total(STAGE_WRITE)
+                self.progress.advance(STAGE_DISCOVER, current=Path(file_path).name)
+                self._put(parse_q, (order, root, Path(file_path)))
+            self.progress.finish_stage(STAGE_DISCOVER)
+            self.on_status(f"Fase 2: Procesando {self._to_process} archivos pendientes...")
+            self._put(parse_q, _DONE)
+        finally:
+            cache.close()
+
+    def _parse_stage(self, parse_q: queue.Queue, probe_q: queue.Queue, write_q: queue.Queue):
+        """Lee tamaño/mtime y extrae temporada y episodio del nombre."""
+        while True:
+            item = self._get(parse_q)
+            if item is _DONE: break
+            order, root, path = item
+            try:
+                stats = path.stat()
+            except FileNotFoundError:
+                self.progress.add_total(STAGE_PROBE, -1)
+                self.progress.add_total(STAGE_WRITE, -1)
+                self._put(write_q, ("skip", root, str(path)))
+                continue
+            ep_info = robust_parse_episode(path.name)
+            parsed_info = {'season': ep_info[0], 'episode': ep_info[1]} if ep_info else {}
+            self._put(probe_q, (order, root, path, stats.st_size, stats.st_mtime, stats.st_dev, parsed_info))
+        self._put(probe_q, _DONE)
+
+    def _probe_stage(self, probe_q: queue.Queue, write_q: queue.Queue):
+        """Extrae los metadatos con ffprobe. Varios hilos comparten la cola."""
+        try:
+            while True:
+                item = self._get(probe_q)
+                if item is _DONE:
+                    self._put(probe_q, _DONE) # Para los demás hilos de sondeo
+                    break
+                order, root, path, size, mtime, device, parsed_info = item
+                with self.governor.probe_slot(device, size, self._stop_event):
+                    if self._stop_event.is_set(): raise _Cancelled()
+                    metadata = MetadataExtractor.get_media_info(path)
+                media_file = MediaFile(path=path, size=size, mtime=mtime, parsed_info=parsed_info, metadata_info=metadata)
+                self.progress.advance(STAGE_PROBE, bytes_done=size, current=path.name)
+                self._put(write_q, ("file", root, (order, media_file)))
+        finally:
+            with self._counter_lock:
+                self._probes_alive -= 1
+                last = self._probes_alive == 0
+            if last and not self._stop_event.is_set():
+                self._put(write_q, _DONE)
+
+    def _write_stage(self, write_q: queue.Queue):
+        """
+        Guarda en la caché por lotes, en el orden en que llegan las operaciones.
+        Cada lote es un punto de control: archivos procesados y diario de la
+        sesión se actualizan en la misma transacción.
+        """
+        cache = CacheManager(self.cache.db_path)
+        pending: Dict[str, List[MediaFile]] = defaultdict(list)
+        queued: List[Tuple[str, str]] = []
+        done: List[str] = []
+        pending_count = 0
+        last_flush = time.monotonic()
+
+        def flush():
+            nonlocal pending_count, last_flush
+            if pending or queued or done:
+                cache.write_scan_checkpoint(self.session_id, pending, queued, done)
+            if pending_count: self.progress.advance(STAGE_WRITE, pending_count)
+            pending.clear(); queued.clear(); done.clear()
+            pending_count = 0
+            last_flush = time.monotonic()
+
+        def handle(item):
+            nonlocal pending_count
+            kind, root, payload = item
+            if kind == "root":
+                flush()
+                cache.update_scan_path(root, payload)
+            elif kind == "remove":
+                flush()
+                cache.remove_files_batch(payload)
+            elif kind == "walk_complete":
+                flush()
+                cache.set_session_walk_complete(self.session_id)
+            elif kind == "queued":
+                queued.append((payload, root))
+            elif kind == "skip":
+                done.append(payload)
+            elif kind == "file":
+                order, media_file = payload
+                pending[root].append(media_file)
+                done.append(media_file.path_str)
+                self._processed_files.append(payload)
+                pending_count += 1
+
+        try:
+            while True:
+                try:
+                    item = self._get(write_q)
+                except _Cancelled:
+                    break
+                if item is _DONE: break
+                handle(item)
+                if pending_count >= WRITE_BATCH_SIZE or time.monotonic() - last_flush >= WRITE_BATCH_SECONDS:
+                    flush()
+        finally:
+            # Lo ya procesado se guarda también si se cancela, incluido lo que quedaba en la cola
+            while True:
+                try:
+                    item = write_q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _DONE: handle(item)
+            flush()
+            cache.close()
+
+def _filter_ignored(duplicate_structure: Dict, ignore_list: Set[str]) -> Dict:
+    filtered_series = {}
+    for series_title, episodes in duplicate_structure.get("series", {}).items():
+        series_id = standardize_text(series_title)
+        if series_id in ignore_list: continue
+        valid_episodes = [group for group in episodes if f"{series_id}/{group.group_id}" not in ignore_list]
+        if valid_episodes: filtered_series[series_title] = valid_episodes
+    filtered_movies = [group for group in duplicate_structure.get("movies", []) if standardize_text(group.display_title) not in ignore_list]
+    return {"series": filtered_series, "movies": filtered_movies}
+
+def _all_groups(duplicate_structure: Dict) -> List:
+    return [group for groups in duplicate_structure["series"].values() for group in groups] + duplicate_structure["movies"]
+
+def find_and_process_duplicates(all_files: List[MediaFile], matcher: MatcherBase, recommender: Recommender,
+                                ignore_list: Set[str], on_status: Callable[[str], None] = _ignore,
+                                on_groups: Optional[Callable[[Dict], None]] = None,
+                                decisions: Optional[DecisionStore] = None) -> Dict:
+    """
+    Ejecuta el matcher, filtra los duplicados según la lista de ignorados
+    y aplica las recomendaciones de prioridad. Con `decisions`, las
+    decisiones que el usuario tomó en revisiones anteriores se reaplican
+    encima de las recomendaciones.
+
+    Con `on_groups`, los grupos se entregan ya filtrados y recomendados
+    mientras el matcher sigue trabajando, en lotes de GROUP_BATCH_SIZE grupos
+    o cada GROUP_BATCH_SECONDS. Una serie o película que vuelve a llegar
+    sustituye a la anterior, y las que otra absorbe llegan en "retracted"
+    (ver MatcherBase.find_duplicates): quien recibe los lotes las quita antes
+    de añadir los grupos del lote.
+    """
+    if on_groups is None:
+        duplicate_structure = _filter_ignored(matcher.find_duplicates(all_files), ignore_list)
+        on_status("Aplicando recomendaciones...")
+        with tracer.span("recommender.rank", "match"):
+            recommender.rank_groups(_all_groups(duplicate_structure))
+        if decisions is not None:
+            restored = decisions.apply(keyed_groups(duplicate_structure))
+            if restored: on_status(f"Decisiones restauradas en {restored} grupos.")
+        return duplicate_structure
+
+    pending_series: Dict[str, list] = {}
+    pending_movies: Dict[str, object] = {} # Por identidad: una entrega repetida sustituye a la anterior
+    retracted_series: Set[str] = set()
+    retracted_movies: Set[str] = set()
+    pending_count = restored = 0
+    last_flush = 0.0 # El primer lote sale en cuanto aparece el primer duplicado
+
+    def flush():
+        nonlocal pending_count, last_flush, restored
+        batch = _filter_ignored({"series": dict(pending_series), "movies": list(pending_movies.values())}, ignore_list)
+        retracted = {"series": sorted(retracted_series), "movies": sorted(retracted_movies)}
+        pending_series.clear(); pending_movies.clear(); retracted_series.clear(); retracted_movies.clear()
+        pending_count, last_flush = 0, time.monotonic()
+        groups = _all_groups(batch)
+        if not groups and not retracted["series"] and not retracted["movies"]: return
+        if groups:
+            with tracer.span("recommender.rank", "match", groups=len(groups)):
+                recommender.rank_groups(groups)
+            if decisions is not None: restored += decisions.apply(keyed_groups(batch))
+        batch["retracted"] = retracted
+        on_groups(batch)
+
+    def collect(partial: Dict):
+        nonlocal pending_count
+        retracted = partial.get("retracted", {})
+        for series_title in retracted.get("series", []):
+            pending_series.pop(series_title, None)
+            retracted_series.add(series_title)
+        for identity in retracted.get("movies", []):
+            pending_movies.pop(identity, None)
+            retracted_movies.add(identity)
+        for series_title, groups in partial.get("series", {}).items():
+            pending_series[series_title] = groups
+            pending_count += len(groups)
+        for group in partial.get("movies", []):
+            pending_movies[group.identity] = group
+            pending_count += 1
+        if pending_count >= GROUP_BATCH_SIZE or time.monotonic() - last_flush >= GROUP_BATCH_SECONDS:
+            flush()
+
+    duplicate_structure = _filter_ignored(matcher.find_duplicates(all_files, on_groups=collect), ignore_list)
+    flush()
+    if restored: on_status(f"Decisiones restauradas en {restored} grupos.")
+    # Los archivos de la estructura final ya llevan la recomendación de su lote
+    return duplicate_structure
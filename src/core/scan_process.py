@@ -0,0 +1,143 @@
+"""
+Proceso de escaneo separado de la interfaz.
+
+La ventana lanza `python -m src.core.scan_process` y le pasa la
+configuración por stdin (un objeto pickle). El proceso ejecuta las fases 1 y
+2 (ScanEngine) y la fase 3 (matcher + recomendaciones) sin importar PyQt, y
+devuelve por su stdout una secuencia de mensajes pickle:
+
+    ("status", texto)            avisos de fase
+    ("progress", [StageProgress]) progreso ya limitado por ProgressAggregator
+    ("session", id)              sesión de escaneo en la caché
+    ("groups", {"series": ..., "movies": ..., "retracted": ...})
+                                 grupos de duplicados, por lotes mientras el
+                                 matcher trabaja, y los que otro ha absorbido
+                                 (ver scan_engine.find_and_process_duplicates)
+    ("done", None) / ("cancelled", None) / ("error", texto)
+
+La configuración incluye los límites de recursos (`governor`, ver
+resource_governor.GovernorSettings), que se aplican a todo el proceso.
+
+Se cancela con SIGTERM (CTRL_BREAK_EVENT en Windows), que se trata como un
+Ctrl+C: el motor deja de sondear y guarda lo ya procesado antes de salir.
+"""
+import os
+import pickle
+import signal
+import sys
+import threading
+from typing import Dict, List
+
+# El progreso llega desde los hilos del pipeline: los mensajes no se pueden intercalar
+_send_lock = threading.Lock()
+
+def _send(stream, kind: str, payload=None):
+    data = pickle.dumps((kind, payload), protocol=pickle.HIGHEST_PROTOCOL)
+    with _send_lock:
+        stream.write(data)
+        stream.flush()
+
+_engine = None
+_cancel_requested = False
+
+def _interrupt(signum, frame):
+    # Durante las fases 1 y 2 se para el motor con calma (guarda lo procesado); después se aborta
+    global _cancel_requested
+    _cancel_requested = True
+    if _engine is not None:
+        _engine.stop()
+    else:
+        raise KeyboardInterrupt()
+
+def run(config: Dict, stream) -> int:
+    global _engine
+    from src.core.cache_manager import CacheManager
+    from src.core.decision_store import DecisionStore
+    from src.core.library_snapshot import LibrarySnapshot
+    from src.core.progress import ProgressAggregator, STAGE_MATCH
+    from src.core.recommender import Recommender
+    from src.core.resource_governor import GovernorSettings, ResourceGovernor
+    from src.core.scan_engine import ScanEngine, find_and_process_duplicates
+    from src.core.space_planner import store_groups
+    from src.modules.scanners.default_scanner import DefaultScanner
+    from src.modules.matchers.media_name_matcher import MediaNameMatcher
+    from src.utils.metadata_extractor import MetadataExtractor
+    from src.utils.tracing import tracer, TRACE_DIR
+
+    MetadataExtractor.set_ffmpeg_path(config.get("ffmpeg_path", ""))
+    tracer.enabled = tracer.enabled or config.get("tracing", False)
+    paths: List[str] = config["paths"]
+    cache = CacheManager(config["db_path"])
+    on_status = lambda text: _send(stream, "status", text)
+    progress = ProgressAggregator(lambda stages: _send(stream, "progress", stages))
+    # Todo el proceso (hilos del motor e hijos ffprobe) hereda la prioridad de CPU y E/S
+    governor = ResourceGovernor(GovernorSettings(**config.get("governor", {})), on_status=on_status)
+    governor.apply_priority()
+    engine = None
+    try:
+        engine = _engine = ScanEngine(paths, DefaultScanner(), cache, on_status=on_status, progress=progress,
+                                      resume_session=config.get("resume_session"), governor=governor)
+        with tracer.span("phase.scan", "scan"):
+            all_files = engine.scan()
+        _engine = None
+        _send(stream, "session", engine.session_id)
+        if all_files is None or _cancel_requested:
+            _send(stream, "cancelled")
+            return 130
+
+        with tracer.span("phase.snapshot", "match"):
+            snapshot = LibrarySnapshot.from_cache(cache, paths)
+        recommender = Recommender(config.get("priority_order") or [], snapshot=snapshot)
+        on_status(f"Fase final: Identificando duplicados en {len(all_files)} archivos...")
+        progress.start_stage(STAGE_MATCH)
+        # Los grupos viajan por lotes mientras el matcher sigue; la estructura final no se reenvía
+        with tracer.span("phase.match", "match"):
+            duplicate_structure = find_and_process_duplicates(
+                all_files, MediaNameMatcher(snapshot), recommender, cache.get_ignore_list(), on_status,
+                on_groups=lambda batch: _send(stream, "groups", batch), decisions=DecisionStore(cache)
+            )
+            store_groups(cache, duplicate_structure)
+        progress.finish_stage(STAGE_MATCH)
+        _send(stream, "done")
+        return 0
+    except KeyboardInterrupt:
+        if engine is not None and engine.session_id is not None:
+            _send(stream, "session", engine.session_id)
+        _send(stream, "cancelled")
+        return 130
+    finally:
+        if tracer.enabled and engine is not None and engine.session_id is not None:
+            try:
+                tracer.export_chrome_trace(os.path.join(TRACE_DIR, f"scan-{engine.session_id}.json"),
+                                           {"session_id": engine.session_id, "process": "scan"})
+                cache.save_perf_summary(engine.session_id, tracer.summary())
+            except OSError as e:
+                print(f"No se pudo guardar la traza de rendimiento: {e}", file=sys.stderr)
+        cache.close()
+
+def main() -> int:
+    # El canal de mensajes es el stdout original; cualquier print del proceso va a stderr
+    stream = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    signal.signal(signal.SIGTERM, _interrupt)
+    if hasattr(signal, "SIGBREAK"):
+        signal.signal(signal.SIGBREAK, _interrupt)
+
+    config = pickle.load(sys.stdin.buffer)
+    try:
+        return run(config, stream)
+    except BrokenPipeError:
+        return 1 # La ventana se cerró
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        _send(stream, "error", f"Ha ocurrido un error inesperado en el proceso de escaneo: {e}")
+        return 1
+    finally:
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,193 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from src.core.decision_store import keyed_groups
+from src.core.recommender import get_quality_score
+
+STRATEGY_CURRENT = "current"
+STRATEGY_BEST_QUALITY = "best_quality"
+STRATEGY_KEEP_ON = "keep_on"
+STRATEGY_HARDLINK = "hardlink"
+STRATEGIES = {
+    STRATEGY_CURRENT: "Sugerencias actuales",
+    STRATEGY_BEST_QUALITY: "Conservar la mejor calidad",
+    STRATEGY_KEEP_ON: "Conservar lo que está en",
+    STRATEGY_HARDLINK: "Enlazar copias exactas",
+}
+MOVIES_LABEL = "(Películas)"
+# Columnas guardadas en la caché, una fila por archivo y en orden de grupo
+_COLUMNS = {"group_no": np.int64, "series_no": np.int32, "root_no": np.int32, "size": np.int64,
+            "quality": np.int8, "suggested": np.bool_}
+_OFFLINE_DEVICE = -1
+
+def store_groups(cache, duplicate_structure: Dict):
+    """
+    Guarda en la caché los grupos de un análisis, con la recomendación y las
+    decisiones que ya llevan sus archivos, para que SpacePlanner los evalúe
+    después sin el matcher ni los discos. Cada archivo se asigna a la ruta
+    escaneada más larga que lo contiene.
+    """
+    roots = sorted((path_data["path"] for path_data in cache.get_scanned_paths()), key=len, reverse=True)
+    root_numbers: Dict[str, int] = {}
+    root_by_folder: Dict[str, int] = {}
+    series_numbers: Dict[str, int] = {MOVIES_LABEL: 0}
+    series_labels: Dict[int, str] = {0: MOVIES_LABEL}
+
+    def root_of(media_file) -> int:
+        number = root_by_folder.get(media_file.directory)
+        if number is None:
+            folder = os.path.join(media_file.directory, "")
+            root = next((root for root in roots if folder.startswith(os.path.join(root, ""))), "")
+            number = root_by_folder[media_file.directory] = root_numbers.setdefault(root, len(root_numbers))
+        return number
+
+    # keyed_groups recorre primero las series y después las películas, en el orden de la estructura
+    group_series = [title for title, groups in duplicate_structure.get("series", {}).items() for _ in groups]
+    members, columns = [], {name: [] for name in _COLUMNS}
+    for group_no, (group_key, group) in enumerate(keyed_groups(duplicate_structure)):
+        series_title = group_series[group_no] if group_no < len(group_series) else MOVIES_LABEL
+        series_no = series_numbers.get(series_title)
+        if series_no is None:
+            series_no = series_numbers[series_title] = len(series_numbers)
+            series_labels[series_no] = series_title
+        for media_file in group.files:
+            decision = media_file.recommendation if media_file.recommendation in ("KEEP", "DELETE") else ""
+            members.append((group_key, media_file.path_str, len(members), decision))
+            for name, value in zip(_COLUMNS, (group_no, series_no, root_of(media_file), media_file.size,
+                                              get_quality_score(media_file), media_file.recommendation == "SUGGESTED")):
+                columns[name].append(value)
+    labels = [("series", number, label, None) for number, label in series_labels.items()]
+    for root, number in root_numbers.items():
+        try: device = os.stat(root).st_dev if root else _OFFLINE_DEVICE
+        except OSError: device = _OFFLINE_DEVICE
+        labels.append(("root", number, root, device))
+    packed = {}
+    for name, values in columns.items():
+        array = np.array(values, dtype=_COLUMNS[name])
+        packed[name] = (array.dtype.str, array.tobytes())
+    cache.replace_duplicate_groups(members, packed, labels)
+
+@dataclass
+class SpaceReport:
+    """Bytes (y archivos) que libera una estrategia: en total, por ruta escaneada y por serie."""
+    strategy: str
+    label: str
+    total: int
+    by_root: Dict[str, int]
+    by_series: Dict[str, int]
+    files: int
+    files_by_root: Dict[str, int]
+    files_by_series: Dict[str, int]
+
+class SpacePlanner:
+    """
+    Evalúa estrategias de limpieza sobre los grupos guardados por
+    `store_groups` sin tocar los discos. Las columnas se leen de la caché de
+    una vez (un BLOB por columna, ya en orden de grupo) y las decisiones del
+    usuario, por un índice que solo contiene los archivos decididos. Cada
+    estrategia es una máscara de archivos liberados calculada por tramos de
+    grupo (reduceat), y los totales por ruta y por serie salen de un bincount.
+    """
+    def __init__(self, columns: Dict[str, np.ndarray], decisions: Sequence, labels: Sequence):
+        count = len(columns["group_no"])
+        self.group_no, self.series_no, self.root_no = columns["group_no"], columns["series_no"], columns["root_no"]
+        self.size, self.quality, self.suggested = columns["size"], columns["quality"], columns["suggested"]
+        self.decided = np.zeros(count, dtype=bool)
+        self.delete = np.zeros(count, dtype=bool)
+        if decisions:
+            decided = np.array(decisions, dtype=np.int64)
+            self.decided[decided[:, 0]] = True
+            self.delete[decided[:, 0]] = decided[:, 1] == 1
+        self.series_labels = [label for kind, _, label, _ in labels if kind == "series"]
+        self.roots = [label for kind, _, label, _ in labels if kind == "root"]
+        devices = [device for kind, _, _, device in labels if kind == "root"]
+        # Una ruta sin conexión es su propio dispositivo: nunca se enlaza con otra
+        self.root_devices = np.array([device if device != _OFFLINE_DEVICE else -(number + 2)
+                                      for number, device in enumerate(devices)], dtype=np.int64)
+        boundaries = np.flatnonzero(np.diff(self.group_no)) + 1 if len(self.group_no) else np.zeros(0, dtype=np.int64)
+        self._starts = np.concatenate(([0], boundaries)).astype(np.int64) if len(self.group_no) else boundaries
+        self._lengths = np.diff(np.append(self._starts, len(self.group_no)))
+
+    @classmethod
+    def from_cache(cls, cache) -> "SpacePlanner":
+        stored = cache.get_duplicate_columns()
+        columns = {name: np.frombuffer(stored[name][1], dtype=np.dtype(stored[name][0])) if name in stored
+                   else np.zeros(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        return cls(columns, cache.get_duplicate_decisions(), cache.get_duplicate_labels())
+
+    def __len__(self) -> int:
+        return len(self.group_no)
+
+    # --- Por grupo ---
+    def _group_any(self, flags: np.ndarray) -> np.ndarray:
+        """Para cada archivo, si algún archivo de su grupo cumple `flags`."""
+        if not len(flags): return flags
+        return np.repeat(np.maximum.reduceat(flags.astype(np.int8), self._starts) > 0, self._lengths)
+
+    def _first_in_group(self, keys: Sequence[np.ndarray]) -> np.ndarray:
+        """Máscara del primer archivo de cada grupo según `keys` (lexicográfico, menor es mejor)."""
+        keep = np.zeros(len(self.group_no), dtype=bool)
+        if not len(keep): return keep
+        order = np.lexsort((*reversed(keys), self.group_no))
+        first = np.concatenate(([True], self.group_no[order][1:] != self.group_no[order][:-1]))
+        keep[order[first]] = True
+        return keep
+
+    # --- Estrategias: máscara de los archivos que se liberan ---
+    def _reclaim_current(self) -> np.ndarray:
+        # Con decisiones del usuario cuentan ellas; si no, se conserva el sugerido (como accept_suggestion)
+        decided_group = self._group_any(self.decided)
+        suggested_group = self._group_any(self.suggested)
+        return np.where(decided_group, self.delete, suggested_group & ~self.suggested)
+
+    def _reclaim_best_quality(self) -> np.ndarray:
+        return ~self._first_in_group((-self.quality, -self.size))
+
+    def _reclaim_keep_on(self, root: str) -> np.ndarray:
+        if root not in self.roots: raise ValueError(f"La ruta {root} no tiene archivos en los grupos guardados.")
+        on_root = self.root_no == self.roots.index(root)
+        return self._group_any(on_root) & ~on_root
+
+    def _reclaim_hardlink(self) -> np.ndarray:
+        # Copias exactas: mismo grupo y mismo tamaño. Solo se enlazan en el mismo dispositivo y
+        # se libera todo menos una por (grupo, tamaño, dispositivo)
+        device = self.root_devices[self.root_no] if len(self.root_no) else self.root_no
+        order = np.lexsort((device, self.size, self.group_no))
+        same = np.zeros(len(order), dtype=bool)
+        if len(order) > 1:
+            same[1:] = ((self.group_no[order][1:] == self.group_no[order][:-1])
+                        & (self.size[order][1:] == self.size[order][:-1])
+                        & (device[order][1:] == device[order][:-1]))
+        reclaim = np.zeros(len(order), dtype=bool)
+        reclaim[order] = same
+        return reclaim
+
+    def reclaimable(self, strategy: str, root: Optional[str] = None) -> np.ndarray:
+        if strategy == STRATEGY_CURRENT: return self._reclaim_current()
+        if strategy == STRATEGY_BEST_QUALITY: return self._reclaim_best_quality()
+        if strategy == STRATEGY_KEEP_ON: return self._reclaim_keep_on(root)
+        if strategy == STRATEGY_HARDLINK: return self._reclaim_hardlink()
+        raise ValueError(f"Estrategia desconocida: {strategy}")
+
+    # --- Informes ---
+    def evaluate(self, strategy: str, root: Optional[str] = None) -> SpaceReport:
+        reclaim = self.reclaimable(strategy, root)
+        freed = np.where(reclaim, self.size, 0)
+        by_root = np.bincount(self.root_no, weights=freed, minlength=len(self.roots))
+        by_series = np.bincount(self.series_no, weights=freed, minlength=len(self.series_labels))
+        files_by_root = np.bincount(self.root_no[reclaim], minlength=len(self.roots))
+        files_by_series = np.bincount(self.series_no[reclaim], minlength=len(self.series_labels))
+        label = STRATEGIES[strategy] + (f" {root}" if strategy == STRATEGY_KEEP_ON else "")
+        return SpaceReport(
+            strategy, label, int(freed.sum()),
+            {self.roots[number]: int(value) for number, value in enumerate(by_root) if value},
+            {self.series_labels[number]: int(value) for number, value in enumerate(by_series) if value},
+            int(reclaim.sum()),
+            {self.roots[number]: int(count) for number, count in enumerate(files_by_root) if count},
+            {self.series_labels[number]: int(count) for number, count in enumerate(files_by_series) if count},
+        )
+
+    def compare(self, strategies: Sequence[str], root: Optional[str] = None) -> List[SpaceReport]:
+        """Informes de varias estrategias para verlos lado a lado."""
+        return [self.evaluate(strategy, root) for strategy in strategies]
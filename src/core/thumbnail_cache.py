@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+THUMBNAIL_DIR = "thumbnails"
+# Límite del directorio de miniaturas; al superarlo se borran las menos usadas
+THUMBNAIL_CACHE_BYTES = 200 * 1024 * 1024
+_EXTENSION = ".jpg"
+
+class ThumbnailCache:
+    """
+    Caché en disco de miniaturas (JPEG), una por archivo y clave
+    (ruta, tamaño, mtime): si el archivo cambia, su clave también y la
+    miniatura vieja acaba expulsada. Es un LRU acotado en bytes; el orden de
+    uso es el mtime de cada miniatura, que se actualiza al leerla, así que se
+    conserva entre sesiones. Se puede usar desde varios hilos.
+    """
+    def __init__(self, directory: str = THUMBNAIL_DIR, max_bytes: int = THUMBNAIL_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict() # clave -> bytes, de menos a más reciente
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(_EXTENSION):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-len(_EXTENSION)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+
+    @staticmethod
+    def key(path: str, size: int, mtime: float) -> str:
+        return hashlib.sha1(f"{path}\0{size}\0{mtime!r}".encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _EXTENSION)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._entries: return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as thumbnail:
+                data = thumbnail.read()
+            os.utime(path)
+            return data
+        except OSError:
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None: self._total -= size
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        # Se escribe aparte y se renombra: otro hilo nunca lee una miniatura a medias
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as thumbnail:
+                thumbnail.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"No se pudo guardar la miniatura {path}: {e}")
+            return
+        evicted = []
+        with self._lock:
+            self._total += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                self._total -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try: os.remove(self._path(old_key))
+            except OSError: pass
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
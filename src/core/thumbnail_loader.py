@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Iterable, Optional, Set, Tuple
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImage
+from src.core.models import MediaFile
+from src.core.thumbnail_cache import ThumbnailCache
+from src.utils.metadata_extractor import MetadataExtractor
+
+# Extracciones ffmpeg simultáneas: cada una es un subproceso, así que los hilos no compiten por el GIL
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_WIDTH = 160
+# Punto del vídeo del que se toma el fotograma (fracción de la duración); evita cabeceras en negro
+THUMBNAIL_POSITION = 0.2
+# Miniaturas decodificadas que se guardan en memoria para pintar
+MEMORY_THUMBNAILS = 500
+
+class ThumbnailLoader(QObject):
+    """
+    Genera miniaturas en segundo plano. `request` recibe los archivos que
+    interesan ahora, en orden de prioridad (primero los visibles y después
+    los vecinos), y sustituye a la petición anterior: al desplazarse rápido,
+    lo que ya no se ve se descarta en vez de acumularse. Cada miniatura se
+    busca en la caché de disco y, si no está, se extrae con ffmpeg.
+
+    `thumbnail_ready` se emite desde los hilos de trabajo; conectado a un
+    objeto del hilo de la interfaz, Qt lo entrega en ese hilo.
+    """
+    thumbnail_ready = pyqtSignal(str)
+
+    def __init__(self, cache: ThumbnailCache, workers: int = THUMBNAIL_WORKERS, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.worker_count = workers
+        self._condition = threading.Condition()
+        self._wanted: Deque[Tuple[str, str, float]] = deque()
+        self._in_progress: Set[str] = set()
+        self._failed: Set[str] = set()
+        self._images: "OrderedDict[str, QImage]" = OrderedDict()
+        self._threads = []
+        self._stopped = False
+
+    @staticmethod
+    def key_of(media_file: MediaFile) -> str:
+        return ThumbnailCache.key(media_file.path_str, media_file.size, media_file.mtime)
+
+    def image(self, media_file: MediaFile) -> Optional[QImage]:
+        """Miniatura ya cargada en memoria, o None si aún no está (o no se puede extraer)."""
+        key = self.key_of(media_file)
+        with self._condition:
+            image = self._images.get(key)
+            if image is not None: self._images.move_to_end(key)
+            return image
+
+    def request(self, files: Iterable[MediaFile]):
+        wanted = deque()
+        with self._condition:
+            for media_file in files:
+                key = self.key_of(media_file)
+                if key in self._images or key in self._in_progress or key in self._failed: continue
+                wanted.append((key, media_file.path_str, media_file.duration * THUMBNAIL_POSITION))
+            self._wanted = wanted
+            if wanted and not self._threads: self._start()
+            self._condition.notify_all()
+
+    def _start(self):
+        for number in range(self.worker_count):
+            thread = threading.Thread(target=self._run, name=f"thumbnails-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._wanted and not self._stopped:
+                    self._condition.wait()
+                if self._stopped: return
+                key, path, at_seconds = self._wanted.popleft()
+                self._in_progress.add(key)
+            data = self.cache.get(key)
+            if data is None:
+                data = MetadataExtractor.extract_frame(path, at_seconds, THUMBNAIL_WIDTH)
+                if data: self.cache.put(key, data)
+            image = QImage.fromData(data) if data else QImage()
+            with self._condition:
+                self._in_progress.discard(key)
+                if image.isNull():
+                    self._failed.add(key)
+                    continue
+                self._images[key] = image
+                while len(self._images) > MEMORY_THUMBNAILS:
+                    self._images.popitem(last=False)
+            self.thumbnail_ready.emit(key)
+
+    def shutdown(self):
+        """Detiene los hilos; una extracción en curso termina, pero no se empieza ninguna más."""
+        with self._condition:
+            self._stopped = True
+            self._wanted.clear()
+            self._condition.notify_all()
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+# pip install send2trash
+import send2trash
+
+TRASH_PREFIX = ".mediaforge-trash-"
+_TRASH_NAME = f"{TRASH_PREFIX}{os.getuid() if hasattr(os, 'getuid') else 'user'}"
+_FILES_DIR = "files"
+_PURGING_PREFIX = "purging-"
+
+class SystemTrash:
+    """
+    Papelera del sistema (send2trash). En volúmenes sin papelera propia
+    puede acabar copiando el archivo a la del usuario, en otro disco, y no
+    dice dónde lo deja: lo enviado aquí no se puede deshacer.
+    """
+    def trash(self, path: str) -> Optional[str]:
+        send2trash.send2trash(path)
+        return None
+
+    def locate(self, path: str, since: Optional[float] = None) -> Optional[str]:
+        return None
+
+    def check(self, path: str) -> Optional[str]:
+        return None
+
+    def record(self, entries: List[Tuple[str, str]]):
+        pass
+
+    def forget(self, trash_paths: List[str]):
+        pass
+
+def is_trash_dir(name: str) -> bool:
+    """Carpeta de una papelera de MediaForge (de cualquier usuario); sus purging-* cuelgan de ella."""
+    return name.startswith(TRASH_PREFIX)
+
+def _mount_point(path: str) -> str:
+    """Carpeta más alta del mismo dispositivo que `path` (la raíz del volumen)."""
+    path = os.path.abspath(path)
+    device = os.lstat(path).st_dev
+    while True:
+        parent = os.path.dirname(path)
+        if parent == path or os.lstat(parent).st_dev != device: return path
+        path = parent
+
+class VolumeTrash:
+    """
+    Papelera propia en cada volumen, siempre en el mismo sistema de
+    archivos que lo que se borra: enviar a la papelera es un os.rename
+    atómico, sin copiar datos entre discos. La papelera de un volumen es
+    `.mediaforge-trash-<uid>` en su raíz o, si ahí no se puede escribir, en
+    la carpeta más alta del mismo volumen en la que sí se pueda.
+
+    Dentro, cada archivo va a files/<sha1 de la ruta original>/<n>-<nombre>,
+    así que al reanudar una ejecución se puede encontrar dónde quedó un
+    archivo aunque su resultado no llegara al diario (`locate`). El índice
+    para restaurar está en la caché (tabla trash_entries); lo escriben
+    `record` y `forget` desde el hilo que escribe el diario del motor de
+    acciones, nunca desde los hilos que mueven archivos.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self._roots: Dict[Tuple[int, str], str] = {} # (dispositivo, carpeta de partida) -> papelera
+        self._lock = threading.Lock()
+
+    # --- Ubicación ---
+    @staticmethod
+    def _candidates(directory: str) -> List[str]:
+        """Carpetas donde puede ir la papelera, de la raíz del volumen hacia `directory`, todas en el mismo dispositivo."""
+        mount = _mount_point(directory)
+        candidates, current = [], directory
+        while True:
+            candidates.append(current)
+            if current == mount: break
+            current = os.path.dirname(current)
+        return candidates[::-1]
+
+    def _cached_root(self, directory: str, device: int) -> Optional[str]:
+        with self._lock:
+            return self._roots.get((device, directory))
+
+    def root_for(self, path: str) -> str:
+        """Papelera del volumen de `path` (la crea si hace falta). Lanza OSError si no hay dónde crearla."""
+        directory = os.path.dirname(os.path.abspath(path))
+        device = os.lstat(directory).st_dev
+        cached = self._cached_root(directory, device)
+        if cached is not None: return cached
+        for candidate in self._candidates(directory):
+            root = os.path.join(candidate, _TRASH_NAME)
+            try:
+                os.makedirs(os.path.join(root, _FILES_DIR), exist_ok=True)
+            except OSError:
+                continue
+            if os.lstat(root).st_dev != device: continue # Un montaje encima: no sirve
+            with self._lock:
+                self._roots[(device, directory)] = root
+            return root
+        raise PermissionError(f"No se puede crear una papelera en el volumen de {path}")
+
+    @staticmethod
+    def _entry_dir(root: str, original: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(original).encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(root, _FILES_DIR, digest)
+
+    # --- Interfaz del motor de acciones ---
+    def check(self, path: str) -> Optional[str]:
+        """
+        Motivo por el que no se puede enviar `path` a la papelera de su
+        volumen, o None. Solo comprueba permisos: planificar no crea
+        papeleras, eso lo hace `trash`.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            device = os.lstat(directory).st_dev
+            if self._cached_root(directory, device) is not None: return None
+            for candidate in self._candidates(directory):
+                root = os.path.join(candidate, _TRASH_NAME)
+                if os.path.isdir(root):
+                    if os.lstat(root).st_dev == device and os.access(root, os.W_OK | os.X_OK): return None
+                elif os.access(candidate, os.W_OK | os.X_OK):
+                    return None
+        except OSError as e:
+            return str(e)
+        return f"No se puede crear una papelera en el volumen de {path}"
+
+    def trash(self, path: str) -> str:
+        entry_dir = self._entry_dir(self.root_for(path), path)
+        os.makedirs(entry_dir, exist_ok=True)
+        name = os.path.basename(path)
+        number = 0
+        while True:
+            location = os.path.join(entry_dir, f"{number}-{name}")
+            if not os.path.lexists(location): break
+            number += 1
+        # Mismo sistema de archivos: os.rename no copia datos (y falla en vez de copiar si no lo fuera)
+        os.rename(path, location)
+        return location
+
+    def locate(self, path: str, since: Optional[float] = None) -> Optional[str]:
+        """
+        Dónde quedó el último envío a la papelera de `path`, si está. Con
+        `since`, solo cuentan los envíos a partir de ese instante: el rename
+        conserva el mtime del archivo pero actualiza su ctime, que marca
+        cuándo llegó a la papelera. En Windows st_ctime es la fecha de
+        creación, así que ahí `since` descarta cualquier envío.
+        """
+        try:
+            entry_dir = self._entry_dir(self.root_for(path), path)
+            names = os.listdir(entry_dir)
+        except OSError:
+            return None
+        if since is not None:
+            arrived = []
+            for name in names:
+                try:
+                    if os.lstat(os.path.join(entry_dir, name)).st_ctime >= since: arrived.append(name)
+                except OSError:
+                    continue
+            names = arrived
+        if not names: return None
+        newest = max(names, key=lambda name: int(name.split("-", 1)[0]) if name.split("-", 1)[0].isdigit() else -1)
+        return os.path.join(entry_dir, newest)
+
+    def record(self, entries: List[Tuple[str, str]]):
+        """Añade al índice los archivos enviados a la papelera: (ruta original, ruta en la papelera)."""
+        rows = []
+        for original, location in entries:
+            try: size = os.lstat(location).st_size
+            except OSError: continue
+            root = location[:location.index(_TRASH_NAME) + len(_TRASH_NAME)]
+            rows.append((location, original, root, size))
+        if rows: self.cache.add_trash_entries(rows)
+
+    def forget(self, trash_paths: List[str]):
+        """Quita del índice los archivos que ya han salido de la papelera (restaurados)."""
+        if trash_paths: self.cache.remove_trash_entries(trash_paths)
+
+    # --- Vaciado ---
+    def purge(self, older_than_days: Optional[float] = None) -> Dict:
+        """
+        Vacía las papeleras de todos los volúmenes del índice. Sin
+        `older_than_days`, cada carpeta files se renombra primero (desaparece
+        de golpe y una papelera nueva empieza vacía) y después se borra. Con
+        `older_than_days`, solo se borran los archivos más antiguos.
+        Devuelve cuántos archivos y bytes se han liberado.
+        """
+        entries = self.cache.get_trash_entries()
+        if older_than_days is not None:
+            cutoff = time.time() - older_than_days * 86400
+            entries = [entry for entry in entries if entry[4] < cutoff]
+        removed, freed = [], 0
+        if older_than_days is None:
+            for root in sorted({entry[2] for entry in entries}):
+                files_dir = os.path.join(root, _FILES_DIR)
+                purging = os.path.join(root, f"{_PURGING_PREFIX}{time.time_ns()}")
+                try:
+                    os.rename(files_dir, purging)
+                except OSError as e:
+                    print(f"No se pudo vaciar la papelera {root}: {e}")
+                    continue
+                shutil.rmtree(purging, ignore_errors=True)
+                for entry in entries:
+                    if entry[2] == root:
+                        removed.append(entry[0]); freed += entry[3]
+        else:
+            for trash_path, _, _, size, _ in entries:
+                try:
+                    os.remove(trash_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"No se pudo borrar {trash_path}: {e}")
+                    continue
+                try: os.rmdir(os.path.dirname(trash_path))
+                except OSError: pass # Quedan otros envíos de la misma ruta
+                removed.append(trash_path); freed += size
+        self.cache.remove_trash_entries(removed)
+        return {"files": len(removed), "bytes": freed}
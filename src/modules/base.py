@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Generator
+from typing import Callable, Dict, Generator, List, Optional
 from src.core.models import MediaFile, DuplicateGroup
 
 class ScannerBase(ABC):
@@ -23,6 +23,16 @@ class MatcherBase(ABC):
         pass
     
     @abstractmethod
-    def find_duplicates(self, files: List[MediaFile]) -> List[DuplicateGroup]:
-        """Procesa la lista de archivos y devuelve los grupos de duplicados."""
+    def find_duplicates(self, files: List[MediaFile],
+                        on_groups: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Procesa la lista de archivos y devuelve los grupos de duplicados
+        ({"series": {título: [DuplicateGroup]}, "movies": [DuplicateGroup]}).
+        Si se pasa `on_groups`, se le entregan con esa misma forma los grupos
+        de cada serie o película en cuanto están completos, antes de terminar.
+        Una misma serie o película puede entregarse otra vez si después absorbe
+        más carpetas: la nueva entrega (mismo título) sustituye a la anterior.
+        Si es otra la que la absorbe, llega {"retracted": {"series": [título],
+        "movies": [identidad]}} y sus grupos anteriores dejan de valer.
+        """
         pass
\ No newline at end of file
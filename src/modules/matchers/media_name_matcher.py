@@ -1,20 +1,29 @@
 import re
-from typing import List, Dict, Optional, Set, Tuple
-from collections import defaultdict
+from typing import Callable, Deque, List, Dict, Optional, Tuple
+from collections import defaultdict, deque
+import numpy as np
 from thefuzz import fuzz # type: ignore
 from pathlib import Path
 from src.modules.base import MatcherBase
+from src.core.library_snapshot import LibrarySnapshot
 from src.core.models import MediaFile, DuplicateGroup
 from src.utils.text_parser import robust_parse_episode, standardize_text
+from src.utils.tracing import tracer
+
+# Clave numérica de un episodio: temporada * _EPISODE_SPAN + episodio (admite episodios como 1.5)
+_EPISODE_SPAN = 100000.0
 
 # --- Lógica de la Entidad Canónica (una por carpeta) ---
 class MediaEntity:
-    def __init__(self, folder_path: Path, files: List[MediaFile]):
+    def __init__(self, folder_path: Path, files: List[MediaFile], snapshot: Optional[LibrarySnapshot] = None):
         self.folder_path = folder_path
         self.files = files
+        self.snapshot = snapshot
+        self._durations: Optional[Tuple[np.ndarray, np.ndarray]] = None
         self.standardized_folder_name = standardize_text(folder_path.name)
-        self.standardized_titles = {standardize_text(f.path.name) for f in files}
+        self.standardized_titles = {standardize_text(f.name) for f in files}
         self.episodes: Dict[Tuple[int, float], List[MediaFile]] = defaultdict(list)
+        self.delivered = False # Ya se entregaron sus grupos (find_duplicates con on_groups)
         for f in files:
             if f.is_series_episode:
                 self.episodes[(f.season, f.episode)].append(f)
@@ -27,8 +36,32 @@ class MediaEntity:
         self.standardized_titles.update(other_entity.standardized_titles)
         for key, files in other_entity.episodes.items():
             self.episodes[key].extend(files)
+        if self._durations is not None and other_entity._durations is not None:
+            self._durations = tuple(np.concatenate(pair) for pair in zip(self._durations, other_entity._durations))
+        else:
+            self._durations = None
 
     @property
+    def episode_durations(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (clave de episodio, duración) de los episodios con duración conocida
+        (> 1 s). Con instantánea, las duraciones salen de su columna sin
+        decodificar los metadatos de cada archivo.
+        """
+        if self._durations is None:
+            episodes = [f for file_list in self.episodes.values() for f in file_list]
+            keys = np.fromiter((f.season * _EPISODE_SPAN + f.episode for f in episodes), np.float64, len(episodes))
+            if self.snapshot is not None:
+                rows = self.snapshot.rows_of(episodes)
+                durations = np.where(rows >= 0, self.snapshot.duration[rows], 0.0)
+                for i in np.flatnonzero(rows < 0):
+                    durations[i] = episodes[i].duration
+            else:
+                durations = np.fromiter((f.duration for f in episodes), np.float64, len(episodes))
+            known = durations > 1
+            self._durations = (keys[known], durations[known])
+        return self._durations
+    @property
     def canonical_title(self) -> str:
         # Intenta usar el nombre de la carpeta original como título
         return self.folder_path.name
@@ -54,20 +87,8 @@ def get_similarity_score(entity_a: MediaEntity, entity_b: MediaEntity) -> float:
         structure_score = intersection / union
 
     # 4. FÍSICA (DURACIÓN) - Peso: 0.15
-    metadata_scores = []
-    for ep_key in eps_a.intersection(eps_b):
-        # ... (lógica interna de comparación de duración se mantiene)
-        files_a, files_b = entity_a.episodes[ep_key], entity_b.episodes[ep_key]
-        for fa in files_a:
-            for fb in files_b:
-                if fa.metadata_info and fb.metadata_info:
-                    dur_a, dur_b = fa.metadata_info.get('duration', 0), fb.metadata_info.get('duration', 0)
-                    if dur_a > 1 and dur_b > 1:
-                        diff = abs(dur_a - dur_b) / max(dur_a, dur_b)
-                        if diff > 0.10: return 0.0 # Veto suave si la duración es muy diferente
-                        score = max(0, 1 - (diff / 0.05))
-                        metadata_scores.append(score)
-    avg_duration_score = sum(metadata_scores) / len(metadata_scores) if metadata_scores else 0.5
+    avg_duration_score = duration_score(entity_a, entity_b)
+    if avg_duration_score is None: return 0.0 # Veto suave si la duración es muy diferente
     
     # PUNTUACIÓN FINAL PONDERADA (de 0 a 100)
     final_score = (
@@ -79,74 +100,156 @@ def get_similarity_score(entity_a: MediaEntity, entity_b: MediaEntity) -> float:
 
     return final_score
 
+def duration_score(entity_a: MediaEntity, entity_b: MediaEntity) -> Optional[float]:
+    """
+    Parecido medio de duración entre todas las copias de los episodios
+    comunes, con arrays: se cruzan las claves de episodio de las dos
+    entidades (searchsorted sobre las de b ordenadas) y se comparan todos
+    los pares a la vez. None si algún par difiere más de un 10 %; 0.5 si no
+    hay pares con duración conocida.
+    """
+    keys_a, durations_a = entity_a.episode_durations
+    keys_b, durations_b = entity_b.episode_durations
+    order = np.argsort(keys_b, kind='stable')
+    sorted_keys = keys_b[order]
+    first = np.searchsorted(sorted_keys, keys_a, side='left')
+    counts = np.searchsorted(sorted_keys, keys_a, side='right') - first
+    total = int(counts.sum())
+    if total == 0: return 0.5
+    left = np.repeat(np.arange(len(keys_a)), counts)
+    right = order[np.repeat(first, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)]
+    a, b = durations_a[left], durations_b[right]
+    diff = np.abs(a - b) / np.maximum(a, b)
+    if (diff > 0.10).any(): return None
+    return float(np.maximum(0, 1 - diff / 0.05).mean())
+
 # --- El Matcher Principal (v6) ---
 class MediaNameMatcher(MatcherBase):
     SIMILARITY_THRESHOLD = 65.0
 
+    def __init__(self, snapshot: Optional[LibrarySnapshot] = None):
+        # Instantánea columnar del escaneo (solo lectura); si está, las duraciones se leen de ella
+        self.snapshot = snapshot
+
     def get_name(self) -> str:
         return "Matcher por Entidades Canónicas (v6)"
 
     def get_id(self) -> str:
         return "canonical_entity_matcher_v6"
 
-    def find_duplicates(self, files: List[MediaFile]) -> Dict[str, List[DuplicateGroup]]:
+    def find_duplicates(self, files: List[MediaFile],
+                        on_groups: Optional[Callable[[Dict], None]] = None) -> Dict:
+        on_entity = on_absorbed = None
+        if on_groups is not None:
+            def on_entity(entity: MediaEntity):
+                partial = self._entity_results(entity)
+                if partial: on_groups(partial)
+            def on_absorbed(entity: MediaEntity):
+                on_groups({"retracted": self._entity_keys(entity)})
+        settled = self.merge_entities(files, on_entity, on_absorbed)
+
+        # 4. Generar resultados finales
+        results = {"movies": [], "series": {}}
+        for entity in settled:
+            partial = self._entity_results(entity)
+            if partial is None: continue
+            results["series"].update(partial.get("series", {}))
+            results["movies"].extend(partial.get("movies", []))
+        return results
+
+    def merge_entities(self, files: List[MediaFile],
+                       on_entity: Optional[Callable[[MediaEntity], None]] = None,
+                       on_absorbed: Optional[Callable[[MediaEntity], None]] = None) -> List[MediaEntity]:
+        """
+        Entidades canónicas ya fusionadas: cada una reúne todas las carpetas
+        (de cualquier ruta) de una misma serie o película, tengan duplicados
+        o no. `on_entity` recibe cada entidad en cuanto queda asentada y
+        `on_absorbed` cada entidad ya entregada que otra absorbe después (sus
+        grupos dejan de existir por separado).
+        """
         # 1. Parsear todos los archivos
         for file in files:
-            file.parsed_info = {}
-            ep_info = robust_parse_episode(file.path.name)
-            if ep_info:
-                file.parsed_info['season'], file.parsed_info['episode'] = ep_info
+            ep_info = robust_parse_episode(file.name)
+            file.parsed_info = {'season': ep_info[0], 'episode': ep_info[1]} if ep_info else {}
 
         # 2. Crear Entidades Canónicas por carpeta
         files_by_folder = defaultdict(list)
         for file in files:
-            files_by_folder[file.path.parent].append(file)
+            files_by_folder[file.directory].append(file)
         
-        entities = [MediaEntity(path, folder_files) for path, folder_files in files_by_folder.items()]
-        
-        # 3. Fusión iterativa de entidades
-        merged_in_pass = True
-        while merged_in_pass:
-            merged_in_pass = False
-            i = 0
-            while i < len(entities):
-                j = i + 1
-                while j < len(entities):
-                    score = get_similarity_score(entities[i], entities[j])
-                    if score >= self.SIMILARITY_THRESHOLD:
-                        entities[i].merge(entities.pop(j))
-                        merged_in_pass = True
-                    else:
-                        j += 1
-                i += 1
+        pending = deque(MediaEntity(folder_files[0].parent, folder_files, self.snapshot)
+                        for folder_files in files_by_folder.values())
+
+        def absorbed(entity: MediaEntity):
+            if entity.delivered and on_absorbed is not None: on_absorbed(entity)
         
-        # 4. Generar resultados finales
-        results = {"movies": [], "series": {}}
-        for entity in entities:
-            # ... (la lógica de generación de resultados se mantiene igual que la v5)
-            has_duplicates = False
-            if not entity.episodes and len(entity.files) > 1: has_duplicates = True
+        # 3. Fusión de entidades, una a una hasta que no cambia (queda "asentada").
+        # Una entidad que ha crecido puede parecerse ahora a otra ya asentada: esa la
+        # absorbe y vuelve a la cola, y se entrega de nuevo con sus grupos completos.
+        settled: List[MediaEntity] = []
+        comparisons = 0
+        with tracer.span("matcher.merge", "match", entities=len(pending)):
+            while pending:
+                entity = pending.popleft()
+                grew, compared = self._absorb_matches(entity, pending, absorbed)
+                comparisons += compared
+                if grew:
+                    comparisons += len(settled)
+                    target = next((s for s in settled if get_similarity_score(s, entity) >= self.SIMILARITY_THRESHOLD), None)
+                    if target is not None:
+                        settled.remove(target)
+                        target.merge(entity)
+                        absorbed(entity)
+                        pending.appendleft(target)
+                        continue
+                settled.append(entity)
+                if on_entity is not None:
+                    on_entity(entity)
+                    entity.delivered = True
+        tracer.count("matcher.comparisons", comparisons)
+        return settled
+
+    def _absorb_matches(self, entity: MediaEntity, pending: Deque[MediaEntity],
+                        absorbed: Callable[[MediaEntity], None]) -> Tuple[bool, int]:
+        """
+        Fusiona en `entity` las pendientes que se le parecen. Recorre la cola
+        en círculo y para tras una vuelta entera sin fusiones: así cada
+        pendiente se compara una vez con la forma final de la entidad.
+        """
+        grew, comparisons = False, 0
+        j = since_growth = 0
+        while since_growth < len(pending):
+            if j >= len(pending): j = 0
+            comparisons += 1
+            if get_similarity_score(entity, pending[j]) >= self.SIMILARITY_THRESHOLD:
+                entity.merge(pending[j])
+                absorbed(pending[j])
+                del pending[j]
+                grew, since_growth = True, 0
             else:
-                for file_list in entity.episodes.values():
-                    if len(file_list) > 1:
-                        has_duplicates = True
-                        break
-            if not has_duplicates: continue
-
-            if entity.episodes:
-                duplicate_episodes = []
-                sorted_episodes = sorted(entity.episodes.items(), key=lambda item: item[0])
-                for ep_key, file_list in sorted_episodes:
-                    if len(file_list) > 1:
-                        season, episode_num = ep_key
-                        episode_str = f"{episode_num:.1f}".replace('.0', '') if episode_num % 1 else f"{int(episode_num):02d}"
-                        display_title = f"S{season:02d}E{episode_str}"
-                        group = DuplicateGroup(group_id=f"{season}-{episode_num}", files=file_list, display_title=display_title)
-                        duplicate_episodes.append(group)
-                if duplicate_episodes:
-                    results["series"][entity.canonical_title] = duplicate_episodes
-            elif len(entity.files) > 1:
-                group = DuplicateGroup(group_id=entity.canonical_title, files=entity.files, display_title=entity.canonical_title)
-                results["movies"].append(group)
-        
-        return results
\ No newline at end of file
+                j += 1
+                since_growth += 1
+        return grew, comparisons
+
+    @staticmethod
+    def _entity_keys(entity: MediaEntity) -> Dict:
+        """Con qué claves llegaron los grupos de una entidad: título de la serie o identidad de la película."""
+        if entity.episodes: return {"series": [entity.canonical_title], "movies": []}
+        return {"series": [], "movies": [entity.files[0].path_str]}
+
+    @staticmethod
+    def _entity_results(entity: MediaEntity) -> Optional[Dict]:
+        """Grupos de duplicados de una entidad, con la forma de los resultados; None si no tiene."""
+        if entity.episodes:
+            duplicate_episodes = []
+            for ep_key, file_list in sorted(entity.episodes.items(), key=lambda item: item[0]):
+                if len(file_list) > 1:
+                    season, episode_num = ep_key
+                    episode_str = f"{episode_num:.1f}".replace('.0', '') if episode_num % 1 else f"{int(episode_num):02d}"
+                    display_title = f"S{season:02d}E{episode_str}"
+                    duplicate_episodes.append(DuplicateGroup(group_id=f"{season}-{episode_num}", files=file_list, display_title=display_title))
+            return {"series": {entity.canonical_title: duplicate_episodes}} if duplicate_episodes else None
+        if len(entity.files) > 1:
+            group = DuplicateGroup(group_id=entity.canonical_title, files=entity.files, display_title=entity.canonical_title)
+            return {"movies": [group]}
+        return None
@@ -1,16 +1,22 @@
+import os
 from pathlib import Path
 from typing import Generator
 from src.modules.base import ScannerBase
+from src.core.volume_trash import is_trash_dir
 
 class DefaultScanner(ScannerBase):
     """Un escáner simple que busca archivos de video comunes."""
-    
+
     VIDEO_EXTENSIONS = {'.mkv', '.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm'}
 
     def scan(self, path: Path) -> Generator[Path, None, None]:
         if not path.is_dir():
             return
-        
-        for file_path in path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in self.VIDEO_EXTENSIONS:
-                yield file_path
\ No newline at end of file
+
+        for directory, subdirectories, names in os.walk(path):
+            # Las papeleras de MediaForge suelen quedar dentro de la biblioteca: no se recorren
+            subdirectories[:] = [name for name in subdirectories if not is_trash_dir(name)]
+            for name in names:
+                file_path = Path(directory, name)
+                if file_path.suffix.lower() in self.VIDEO_EXTENSIONS and file_path.is_file():
+                    yield file_path
@@ -0,0 +1,94 @@
+import os
+from typing import List
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTreeWidget,
+                             QTreeWidgetItem, QDialogButtonBox, QFileDialog, QAbstractItemView)
+from PyQt6.QtCore import Qt
+from src.core.library_organizer import ScatteredSeries, target_under
+from src.ui.widgets.duplicate_widgets import format_size
+
+class OrganizerDialog(QDialog):
+    """
+    Lista las series repartidas en varias carpetas y deja elegir, para cada
+    una, la carpeta donde se reunirán. Debajo de cada serie se ven sus
+    carpetas con lo que ocupan; solo se organizan las series marcadas.
+    """
+    COLUMNS = ["Serie", "Carpetas", "A mover", "Destino"]
+
+    def __init__(self, series: List[ScatteredSeries], parent=None):
+        super().__init__(parent)
+        self.series = series
+        self.setWindowTitle("Organizar Biblioteca")
+        self.setMinimumSize(800, 450)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"{len(series)} series tienen episodios en varias carpetas. "
+                                "Los archivos se moverán a la carpeta destino de cada serie."))
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(self.COLUMNS)
+        self.tree.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        for series_item in series:
+            item = QTreeWidgetItem([series_item.title, str(len(series_item.bytes_by_folder)), "", ""])
+            item.setCheckState(0, Qt.CheckState.Checked)
+            for folder in series_item.folders:
+                item.addChild(QTreeWidgetItem(["", folder, format_size(series_item.bytes_by_folder[folder]), ""]))
+            self.tree.addTopLevelItem(item)
+            self._refresh(item)
+        self.tree.resizeColumnToContents(0)
+        layout.addWidget(self.tree)
+
+        buttons_layout = QHBoxLayout()
+        change_button = QPushButton("Cambiar destino...")
+        change_button.setToolTip("Elegir la carpeta destino de las series seleccionadas.")
+        change_button.clicked.connect(self._change_target)
+        common_button = QPushButton("Destino común...")
+        common_button.setToolTip("Reunir cada serie marcada en <carpeta elegida>/<título de la serie>.")
+        common_button.clicked.connect(self._common_target)
+        buttons_layout.addWidget(change_button)
+        buttons_layout.addWidget(common_button)
+        buttons_layout.addStretch()
+        layout.addLayout(buttons_layout)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def _series_of(self, item: QTreeWidgetItem) -> ScatteredSeries:
+        return self.series[self.tree.indexOfTopLevelItem(item)]
+
+    def _refresh(self, item: QTreeWidgetItem):
+        series_item = self._series_of(item)
+        item.setText(2, format_size(series_item.bytes_to_move))
+        item.setText(3, series_item.target)
+
+    def _selected_items(self) -> List[QTreeWidgetItem]:
+        # Una carpeta seleccionada cuenta como su serie
+        items = []
+        for item in self.tree.selectedItems():
+            top = item.parent() or item
+            if top not in items: items.append(top)
+        return items
+
+    def _change_target(self):
+        items = self._selected_items()
+        if not items: return
+        start = self._series_of(items[0]).target
+        folder = QFileDialog.getExistingDirectory(self, "Carpeta destino", start)
+        if not folder: return
+        for item in items:
+            self._series_of(item).target = os.path.normpath(folder)
+            self._refresh(item)
+
+    def _common_target(self):
+        root = QFileDialog.getExistingDirectory(self, "Carpeta común de las series")
+        if not root: return
+        for index in range(self.tree.topLevelItemCount()):
+            item = self.tree.topLevelItem(index)
+            if item.checkState(0) != Qt.CheckState.Checked: continue
+            series_item = self._series_of(item)
+            series_item.target = target_under(root, series_item)
+            self._refresh(item)
+
+    def selected_series(self) -> List[ScatteredSeries]:
+        return [self.series[index] for index in range(self.tree.topLevelItemCount())
+                if self.tree.topLevelItem(index).checkState(0) == Qt.CheckState.Checked]
@@ -1,25 +1,33 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QTabWidget, QWidget, QFormLayout, 
                              QComboBox, QDialogButtonBox, QLabel, QMessageBox, 
                              QLineEdit, QPushButton, QHBoxLayout, QFileDialog, 
-                             QListWidget, QAbstractItemView, QListWidgetItem)
+                             QListWidget, QAbstractItemView, QListWidgetItem, QCheckBox, QSpinBox)
 from PyQt6.QtCore import Qt
 from src.utils.translator import ts
 from src.core.cache_manager import CacheManager
+from src.core.cache_maintenance import CacheMaintenance
+from src.core.workers import MaintenanceWorker
+from src.core.recommender import RULES
+from src.ui.widgets.duplicate_widgets import format_size
+from src.core.resource_governor import (GovernorSettings, PROFILES, PROFILE_NORMAL, PROFILE_BACKGROUND,
+                                        PROFILE_CUSTOM, IO_CLASS_BEST_EFFORT, IO_CLASS_IDLE)
+from src.utils.tracing import tracer, TRACE_ENV_VAR, TRACE_DIR
 import os
 
 class SettingsDialog(QDialog):
-    RECOMMENDATION_CRITERIA = {
-        "quality_desc": "Mejor Calidad (Resolución)",
-        "size_desc": "Mayor Tamaño (Más Bitrate)",
-        "size_asc": "Menor Tamaño (Ahorrar Espacio)",
-        "mtime_desc": "Archivo Más Reciente",
-        "mtime_asc": "Archivo Más Antiguo",
+    RECOMMENDATION_CRITERIA = {key: rule.label for key, rule in RULES.items()}
+    SCAN_PROFILES = {
+        PROFILE_NORMAL: "Normal (máxima velocidad)",
+        PROFILE_BACKGROUND: "Segundo plano (no molestar a la reproducción)",
+        PROFILE_CUSTOM: "Personalizado",
     }
 
     def __init__(self, config_manager, parent=None):
         super().__init__(parent)
         self.config = config_manager
         self.cache = CacheManager()
+        self.maintenance_worker = None
+        self._updating_scan_fields = False
         
         self.setWindowTitle(ts.t('settings_title', 'Settings'))
         self.setMinimumWidth(500)
@@ -44,6 +52,12 @@ class SettingsDialog(QDialog):
         ffmpeg_layout.addWidget(self.ffmpeg_path_button)
         self.general_layout.addRow(ts.t('label_ffmpeg_path', 'Ruta FFmpeg:'), ffmpeg_layout)
         self.ffmpeg_path_button.clicked.connect(self._select_ffmpeg_path)
+        self.developer_mode_check = QCheckBox("Trazas de rendimiento")
+        self.developer_mode_check.setToolTip(
+            f"Mide cada fase del escaneo y guarda una traza de Chrome en '{TRACE_DIR}' y un resumen en la caché. "
+            f"También se activa con la variable de entorno {TRACE_ENV_VAR}=1."
+        )
+        self.general_layout.addRow("Modo desarrollador:", self.developer_mode_check)
         self.tabs.addTab(self.general_tab, ts.t('tab_general', 'General'))
 
         # Pestaña de Recomendaciones
@@ -58,6 +72,38 @@ class SettingsDialog(QDialog):
         reco_layout.addWidget(self.reco_list_widget)
         self.tabs.addTab(self.reco_tab, "Recomendaciones")
 
+        # Pestaña de recursos del escaneo
+        self.scan_tab = QWidget()
+        scan_layout = QFormLayout(self.scan_tab)
+        self.scan_profile_combo = QComboBox()
+        for key, text in self.SCAN_PROFILES.items():
+            self.scan_profile_combo.addItem(text, key)
+        scan_layout.addRow("Perfil:", self.scan_profile_combo)
+        self.scan_nice_spin = QSpinBox(); self.scan_nice_spin.setRange(0, 19)
+        self.scan_nice_spin.setToolTip("Cuánto baja la prioridad de CPU del escaneo (0 = normal, 19 = mínima).")
+        scan_layout.addRow("Prioridad de CPU (nice):", self.scan_nice_spin)
+        self.scan_io_combo = QComboBox()
+        self.scan_io_combo.addItem("Normal", IO_CLASS_BEST_EFFORT)
+        self.scan_io_combo.addItem("Inactiva (solo con el disco libre)", IO_CLASS_IDLE)
+        scan_layout.addRow("Prioridad de disco:", self.scan_io_combo)
+        self.scan_probes_spin = QSpinBox(); self.scan_probes_spin.setRange(0, 32)
+        self.scan_probes_spin.setSpecialValueText("Automático")
+        scan_layout.addRow("Sondeos simultáneos:", self.scan_probes_spin)
+        self.scan_device_probes_spin = QSpinBox(); self.scan_device_probes_spin.setRange(0, 32)
+        self.scan_device_probes_spin.setSpecialValueText("Sin límite")
+        scan_layout.addRow("Sondeos por disco:", self.scan_device_probes_spin)
+        self.scan_bandwidth_spin = QSpinBox(); self.scan_bandwidth_spin.setRange(0, 10000)
+        self.scan_bandwidth_spin.setSuffix(" MB/s"); self.scan_bandwidth_spin.setSpecialValueText("Sin límite")
+        scan_layout.addRow("Lectura máxima por disco:", self.scan_bandwidth_spin)
+        self.scan_yield_check = QCheckBox("Pausar mientras otro programa usa el disco")
+        scan_layout.addRow("Ceder el disco:", self.scan_yield_check)
+        self.scan_profile_combo.currentIndexChanged.connect(self._scan_profile_changed)
+        for spin in (self.scan_nice_spin, self.scan_probes_spin, self.scan_device_probes_spin, self.scan_bandwidth_spin):
+            spin.valueChanged.connect(self._scan_limits_edited)
+        self.scan_io_combo.currentIndexChanged.connect(self._scan_limits_edited)
+        self.scan_yield_check.toggled.connect(self._scan_limits_edited)
+        self.tabs.addTab(self.scan_tab, "Escaneo")
+
         # Botones
         self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         self.button_box.accepted.connect(self.accept)
@@ -80,6 +126,20 @@ class SettingsDialog(QDialog):
 
         self.tabs.addTab(self.ignore_tab, "Lista de Ignorados")
 
+        # Sección de caché
+        self.cache_tab = QWidget()
+        cache_layout = QVBoxLayout(self.cache_tab)
+        self.cache_total_label = QLabel()
+        self.cache_roots_list = QListWidget()
+        self.cache_roots_list.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.run_maintenance_button = QPushButton("Ejecutar Mantenimiento Ahora")
+        self.run_maintenance_button.setToolTip("Elimina datos huérfanos, actualiza estadísticas y compacta la base de datos")
+        self.run_maintenance_button.clicked.connect(self._run_maintenance)
+        cache_layout.addWidget(self.cache_total_label)
+        cache_layout.addWidget(self.cache_roots_list)
+        cache_layout.addWidget(self.run_maintenance_button)
+        self.tabs.addTab(self.cache_tab, "Caché")
+
         self.load_settings() # Llamar a load_settings DESPUÉS de crear los widgets
 
     # ... (el resto de la clase se mantiene sin cambios)
@@ -88,6 +148,9 @@ class SettingsDialog(QDialog):
         self.lang_combo.setCurrentText(current_lang)
         current_ffmpeg_path = self.config.get("general/ffmpeg_path", "")
         self.ffmpeg_path_input.setText(current_ffmpeg_path)
+        self.developer_mode_check.setChecked(self.config.get("developer/tracing", "false") in (True, "true"))
+        profile = self.config.get("scan/profile", PROFILE_NORMAL)
+        self._show_scan_settings(GovernorSettings.from_config(self.config), profile if profile in self.SCAN_PROFILES else PROFILE_NORMAL)
         self.reco_list_widget.clear()
         saved_order = self.config.get("recommendation/priority_order", list(self.RECOMMENDATION_CRITERIA.keys()))
         for key in saved_order:
@@ -109,6 +172,41 @@ class SettingsDialog(QDialog):
             item.setData(Qt.ItemDataRole.UserRole, item_data['key'])
             self.ignore_list_widget.addItem(item)
 
+        self._load_cache_report()
+
+    def _load_cache_report(self):
+        report = CacheMaintenance(self.cache).size_report()
+        self.cache_total_label.setText(
+            f"Tamaño total de la caché: {format_size(report['total_bytes'])} "
+            f"({format_size(report['free_bytes'])} libres por compactar)"
+        )
+        self.cache_roots_list.clear()
+        for root in report["roots"]:
+            self.cache_roots_list.addItem(f"{root['path']} — {root['files']} archivos — {format_size(root['bytes'])}")
+
+    def _run_maintenance(self):
+        # VACUUM y ANALYZE pueden tardar en una caché grande: en segundo plano, con su propia conexión
+        if self.maintenance_worker is not None: return
+        self.run_maintenance_button.setEnabled(False)
+        self.run_maintenance_button.setText("Mantenimiento en curso...")
+        self.maintenance_worker = MaintenanceWorker(force=True)
+        self.maintenance_worker.maintenance_done.connect(self._maintenance_done)
+        self.maintenance_worker.finished.connect(self._maintenance_finished)
+        self.maintenance_worker.start()
+
+    def _maintenance_done(self, summary: dict):
+        self._load_cache_report()
+        if summary.get("error"):
+            QMessageBox.warning(self, "Mantenimiento", f"No se pudo completar el mantenimiento: {summary['error']}")
+        else:
+            QMessageBox.information(self, "Mantenimiento Completado",
+                                    f"Se eliminaron {summary['orphans_removed']} entradas huérfanas en {summary['seconds']} s.")
+
+    def _maintenance_finished(self):
+        self.maintenance_worker = None
+        self.run_maintenance_button.setEnabled(True)
+        self.run_maintenance_button.setText("Ejecutar Mantenimiento Ahora")
+
     def _remove_from_ignore_list(self):
         selected_items = self.ignore_list_widget.selectedItems()
         if not selected_items:
@@ -127,15 +225,28 @@ class SettingsDialog(QDialog):
 
     def closeEvent(self, event):
         # Asegurarse de cerrar la conexión a la base de datos
+        self._wait_for_maintenance()
         self.cache.close()
         super().closeEvent(event)
 
+    def done(self, result):
+        self._wait_for_maintenance()
+        super().done(result)
+
+    def _wait_for_maintenance(self):
+        # El hilo no puede destruirse en marcha junto con el diálogo
+        if self.maintenance_worker is not None:
+            self.maintenance_worker.requestInterruption()
+            self.maintenance_worker.wait()
+
     def accept(self):
         previous_lang = self.config.get("general/language", "es_ES")
         new_lang = self.lang_combo.currentText()
         self.config.set("general/language", new_lang)
         new_ffmpeg_path = self.ffmpeg_path_input.text()
         self.config.set("general/ffmpeg_path", new_ffmpeg_path)
+        self.config.set("developer/tracing", self.developer_mode_check.isChecked())
+        tracer.enabled = self.developer_mode_check.isChecked() or os.environ.get(TRACE_ENV_VAR, "") not in ("", "0")
         if previous_lang != new_lang:
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Icon.Information)
@@ -147,8 +258,40 @@ class SettingsDialog(QDialog):
             item = self.reco_list_widget.item(i)
             new_order.append(item.data(Qt.ItemDataRole.UserRole))
         self.config.set("recommendation/priority_order", new_order)
+        self._scan_settings().save(self.config, self.scan_profile_combo.currentData())
         super().accept()
 
+    def _show_scan_settings(self, settings: GovernorSettings, profile: str):
+        self._updating_scan_fields = True
+        self.scan_profile_combo.setCurrentIndex(self.scan_profile_combo.findData(profile))
+        self.scan_nice_spin.setValue(settings.nice)
+        self.scan_io_combo.setCurrentIndex(max(0, self.scan_io_combo.findData(settings.io_class)))
+        self.scan_probes_spin.setValue(settings.max_probes)
+        self.scan_device_probes_spin.setValue(settings.probes_per_device)
+        self.scan_bandwidth_spin.setValue(settings.read_bandwidth // (1024 * 1024))
+        self.scan_yield_check.setChecked(settings.auto_yield)
+        self._updating_scan_fields = False
+
+    def _scan_settings(self) -> GovernorSettings:
+        io_class = self.scan_io_combo.currentData()
+        return GovernorSettings(
+            nice=self.scan_nice_spin.value(), io_class=io_class, io_level=7 if io_class == IO_CLASS_IDLE else 4,
+            max_probes=self.scan_probes_spin.value(), probes_per_device=self.scan_device_probes_spin.value(),
+            read_bandwidth=self.scan_bandwidth_spin.value() * 1024 * 1024, auto_yield=self.scan_yield_check.isChecked(),
+        )
+
+    def _scan_profile_changed(self):
+        profile = self.scan_profile_combo.currentData()
+        if profile in PROFILES and not self._updating_scan_fields:
+            self._show_scan_settings(PROFILES[profile], profile)
+
+    def _scan_limits_edited(self):
+        # Tocar cualquier límite convierte el perfil en personalizado
+        if self._updating_scan_fields: return
+        self._updating_scan_fields = True
+        self.scan_profile_combo.setCurrentIndex(self.scan_profile_combo.findData(PROFILE_CUSTOM))
+        self._updating_scan_fields = False
+
     def _select_ffmpeg_path(self):
         current_path = self.ffmpeg_path_input.text() if self.ffmpeg_path_input.text() else os.path.expanduser("~")
         directory = QFileDialog.getExistingDirectory(self, ts.t('select_ffmpeg_folder', "Seleccionar Carpeta de FFmpeg Binarios"), current_path)
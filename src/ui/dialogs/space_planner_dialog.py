@@ -0,0 +1,85 @@
+from typing import List
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QComboBox, QTreeWidget,
+                             QTreeWidgetItem, QDialogButtonBox)
+from PyQt6.QtCore import Qt
+from src.core.space_planner import SpacePlanner, SpaceReport, STRATEGIES, STRATEGY_KEEP_ON
+from src.ui.widgets.duplicate_widgets import format_size
+
+# Series que se listan por estrategia; el resto se suma en una fila
+MAX_SERIES_ROWS = 200
+OUTSIDE_ROOTS_LABEL = "(fuera de las rutas escaneadas)"
+
+class SpacePlannerDialog(QDialog):
+    """
+    Compara, una columna por estrategia, el espacio que liberaría cada una
+    en total, por ruta escaneada y por serie. Todo sale de los grupos
+    guardados en la caché: no se toca ningún disco y cambiar de estrategia
+    recalcula al momento.
+    """
+    def __init__(self, planner: SpacePlanner, parent=None):
+        super().__init__(parent)
+        self.planner = planner
+        self.setWindowTitle("Planificador de Espacio")
+        self.setMinimumSize(750, 500)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Estimación sobre {len(planner)} archivos en grupos de duplicados del último análisis."))
+        options = QHBoxLayout()
+        roots = [root for root in planner.roots if root]
+        self.strategy_checks = {}
+        for strategy, label in STRATEGIES.items():
+            check = QCheckBox(label)
+            check.setChecked(strategy != STRATEGY_KEEP_ON or bool(roots))
+            check.setEnabled(strategy != STRATEGY_KEEP_ON or bool(roots))
+            check.toggled.connect(self._refresh)
+            self.strategy_checks[strategy] = check
+            options.addWidget(check)
+        self.root_combo = QComboBox()
+        self.root_combo.addItems(roots)
+        self.root_combo.currentIndexChanged.connect(self._refresh)
+        options.addWidget(self.root_combo)
+        options.addStretch()
+        layout.addLayout(options)
+
+        self.tree = QTreeWidget()
+        layout.addWidget(self.tree)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self._refresh()
+
+    def _reports(self) -> List[SpaceReport]:
+        strategies = [strategy for strategy, check in self.strategy_checks.items() if check.isChecked()]
+        return self.planner.compare(strategies, self.root_combo.currentText() or None)
+
+    def _refresh(self, *args):
+        reports = self._reports()
+        self.tree.clear()
+        self.tree.setColumnCount(1 + len(reports))
+        self.tree.setHeaderLabels(["Ámbito"] + [report.label for report in reports])
+        self.tree.addTopLevelItem(self._row("Total", [report.total for report in reports], bold=True))
+        for title, attribute in (("Por ruta", "by_root"), ("Por serie", "by_series")):
+            names = set()
+            for report in reports: names.update(getattr(report, attribute))
+            # De más a menos espacio en la estrategia que más libera para cada nombre
+            ordered = sorted(names, key=lambda name: -max(getattr(report, attribute).get(name, 0) for report in reports))
+            parent = self._row(f"{title} ({len(ordered)})", [None] * len(reports), bold=True)
+            for name in ordered[:MAX_SERIES_ROWS]:
+                parent.addChild(self._row(name or OUTSIDE_ROOTS_LABEL, [getattr(report, attribute).get(name, 0) for report in reports]))
+            if len(ordered) > MAX_SERIES_ROWS:
+                rest = [sum(getattr(report, attribute).get(name, 0) for name in ordered[MAX_SERIES_ROWS:]) for report in reports]
+                parent.addChild(self._row(f"Otras {len(ordered) - MAX_SERIES_ROWS}", rest))
+            self.tree.addTopLevelItem(parent)
+            parent.setExpanded(attribute == "by_root")
+        self.tree.resizeColumnToContents(0)
+
+    @staticmethod
+    def _row(name: str, values: list, bold: bool = False) -> QTreeWidgetItem:
+        item = QTreeWidgetItem([name] + ["" if value is None else format_size(value) for value in values])
+        for column in range(1, len(values) + 1):
+            item.setTextAlignment(column, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        if bold:
+            font = item.font(0)
+            font.setBold(True)
+            item.setFont(0, font)
+        return item
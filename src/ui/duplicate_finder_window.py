@@ -1,20 +1,33 @@
+import os
+import time
 from PyQt6.QtWidgets import (QMainWindow, QVBoxLayout, QWidget, QPushButton, QProgressBar,
-                             QStatusBar, QHBoxLayout, QFileDialog, QMessageBox, QScrollArea,
-                             QFrame, QToolBar, QLabel)
+                             QStatusBar, QHBoxLayout, QFileDialog, QMessageBox,
+                             QToolBar, QLabel, QInputDialog, QMenu)
 from PyQt6.QtGui import QAction, QIcon
 from PyQt6.QtCore import Qt, pyqtSignal
 
 from src.utils.translator import ts
-from src.utils.text_parser import standardize_text
-from src.core.workers import ScanWorker
+from src.core.workers import (ScanProcessWorker, AgentSyncWorker, TrashPurgeWorker, OrganizerPlanWorker,
+                              SnapshotImportWorker)
+from src.core.progress import STAGE_DISCOVER, STAGE_PROBE, STAGE_MATCH
+from src.utils.tracing import tracer, traced, TRACE_DIR
 from src.ui.dialogs.settings_dialog import SettingsDialog
-from src.modules.scanners.default_scanner import DefaultScanner
-from src.modules.matchers.media_name_matcher import MediaNameMatcher
 from src.ui.widgets.path_widgets import SidePanel, PathEntryWidget
-from src.ui.widgets.duplicate_widgets import (SeriesGroupWidget, DuplicateGroupWidget, 
-                                              FileEntryWidget)
+from src.ui.widgets.results_view import DuplicateResultsView, ResultsFilterBar
 from src.ui.dialogs.action_confirm_dialog import ActionConfirmDialog, ConfirmDialog
 from src.core.action_worker import ActionWorker
+from src.core.action_engine import ActionEngine, FileAction, OP_TRASH
+from src.core.library_organizer import plan_moves
+from src.ui.dialogs.organizer_dialog import OrganizerDialog
+from src.ui.dialogs.space_planner_dialog import SpacePlannerDialog
+from src.core.space_planner import SpacePlanner
+from src.core.cache_manager import SESSION_ABANDONED
+from src.core.models import directories
+from src.core.thumbnail_cache import ThumbnailCache
+from src.core.thumbnail_loader import ThumbnailLoader
+from src.core.decision_store import DecisionStore, accept_suggestion, delete_lower_resolution, keep_on_volume
+from src.core.cache_snapshot import (export_snapshot, read_snapshot_header,
+                                     SNAPSHOT_EXTENSION)
 
 class DuplicateFinderWindow(QMainWindow):
     closing = pyqtSignal()
@@ -23,9 +36,15 @@ class DuplicateFinderWindow(QMainWindow):
         super().__init__()
         self.config = config_manager
         self.cache = cache_manager
+        # Decisiones de revisión guardadas en la caché: sobreviven a un nuevo escaneo
+        self.decisions = DecisionStore(cache_manager)
         self.worker = None
         self.action_worker = None
-        self.result_widgets = {}
+        self._action_failures = []
+        self.agent_sync_worker = None
+        self.snapshot_import_worker = None
+        self.trash_purge_worker = None
+        self.organizer_worker = None
 
         self.setWindowTitle(ts.t('app_title', 'MediaForge'))
         self.setWindowIcon(QIcon("assets/images/logo_transparent.png"))
@@ -52,22 +71,34 @@ class DuplicateFinderWindow(QMainWindow):
         self.scan_button.clicked.connect(self._toggle_scan)
         results_main_layout.addWidget(self.scan_button)
 
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setFrameShape(QFrame.Shape.NoFrame)
-        
-        self.results_container = QWidget()
-        self.results_layout = QVBoxLayout(self.results_container)
-        self.results_layout.setContentsMargins(10, 10, 10, 10)
-        self.results_layout.setSpacing(15)
-        self.results_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.scroll_area.setWidget(self.results_container)
-        
-        results_main_layout.addWidget(self.scroll_area)
+        # Vista virtualizada: solo se crean y pintan las filas visibles, sea cual sea el número de grupos
+        self.results_view = DuplicateResultsView()
+        self.results_view.ignore_requested.connect(self._handle_ignore_request)
+        self.results_view.results_model.decisions_changed.connect(self.decisions.record)
+        self.thumbnail_loader = ThumbnailLoader(ThumbnailCache(), parent=self)
+        self.results_view.set_thumbnail_loader(self.thumbnail_loader)
+        self.filter_bar = ResultsFilterBar()
+        self.filter_bar.view_changed.connect(self.results_view.results_model.set_view)
+        results_main_layout.addWidget(self.filter_bar)
+        results_main_layout.addWidget(self.results_view)
+
+        self.no_results_label = QLabel(ts.t('no_duplicates_found', 'No se encontraron duplicados.'))
+        self.no_results_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.no_results_label.setVisible(False)
+        results_main_layout.addWidget(self.no_results_label, stretch=1)
         
+        actions_layout = QHBoxLayout()
+        self.bulk_button = QPushButton("Decisiones en Bloque")
+        bulk_menu = QMenu(self.bulk_button)
+        bulk_menu.addAction("Aceptar todas las sugerencias", lambda: self._apply_bulk(accept_suggestion))
+        bulk_menu.addAction("Eliminar las copias de menor resolución", lambda: self._apply_bulk(delete_lower_resolution))
+        bulk_menu.addAction("Conservar todo lo que está en...", self._keep_on_volume)
+        self.bulk_button.setMenu(bulk_menu)
+        actions_layout.addWidget(self.bulk_button)
         self.apply_actions_button = QPushButton("Aplicar Acciones Seleccionadas")
         self.apply_actions_button.clicked.connect(self._confirm_and_apply_actions)
-        results_main_layout.addWidget(self.apply_actions_button)
+        actions_layout.addWidget(self.apply_actions_button, stretch=1)
+        results_main_layout.addLayout(actions_layout)
         
         main_layout.addWidget(results_widget, stretch=1)
         
@@ -93,6 +124,24 @@ class DuplicateFinderWindow(QMainWindow):
         settings_action = QAction(ts.t('menu_settings', '&Configuración...'), self)
         settings_action.triggered.connect(self._open_settings)
         file_menu.addAction(settings_action)
+        import_snapshot_action = QAction(ts.t('menu_import_snapshot', 'Importar Instantánea de Caché...'), self)
+        import_snapshot_action.triggered.connect(self._import_cache_snapshot)
+        file_menu.addAction(import_snapshot_action)
+        agent_sync_action = QAction(ts.t('menu_agent_sync', 'Sincronizar con Agente de Escaneo...'), self)
+        agent_sync_action.triggered.connect(self._sync_with_agent)
+        file_menu.addAction(agent_sync_action)
+        undo_actions_action = QAction(ts.t('menu_undo_actions', 'Deshacer Últimas Acciones...'), self)
+        undo_actions_action.triggered.connect(self._undo_last_actions)
+        file_menu.addAction(undo_actions_action)
+        organize_action = QAction(ts.t('menu_organize_library', 'Organizar Biblioteca...'), self)
+        organize_action.triggered.connect(self._organize_library)
+        file_menu.addAction(organize_action)
+        space_planner_action = QAction(ts.t('menu_space_planner', 'Planificar Espacio Recuperable...'), self)
+        space_planner_action.triggered.connect(self._open_space_planner)
+        file_menu.addAction(space_planner_action)
+        empty_trash_action = QAction(ts.t('menu_empty_trash', 'Vaciar Papelera de MediaForge...'), self)
+        empty_trash_action.triggered.connect(self._empty_trash)
+        file_menu.addAction(empty_trash_action)
         exit_action = QAction(ts.t('menu_exit', '&Salir'), self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
@@ -114,6 +163,7 @@ class DuplicateFinderWindow(QMainWindow):
             widget.add_requested.connect(self.move_path_to_active)
             widget.double_clicked.connect(self.move_path_to_active)
             widget.delete_from_history_requested.connect(self._handle_delete_from_history)
+            widget.export_snapshot_requested.connect(self._export_cache_snapshot)
             self.side_panel.history_layout.addWidget(widget)
     
     def _handle_delete_from_history(self, path: str):
@@ -132,6 +182,87 @@ class DuplicateFinderWindow(QMainWindow):
             
             self.status_bar.showMessage(f"'{path}' eliminado del historial.")
 
+    def _export_cache_snapshot(self, path: str):
+        base_name = os.path.basename(path.rstrip('/\\')) or 'cache'
+        default_name = f"{base_name}{SNAPSHOT_EXTENSION}"
+        destination, _ = QFileDialog.getSaveFileName(
+            self, "Exportar Instantánea de Caché", default_name, f"Instantánea de MediaForge (*{SNAPSHOT_EXTENSION})"
+        )
+        if not destination: return
+        try:
+            count = export_snapshot(self.cache, path, destination)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, ts.t('error_title', 'Error'), f"No se pudo exportar la instantánea: {e}")
+            return
+        self.status_bar.showMessage(f"Instantánea de '{path}' exportada ({count} archivos).")
+
+    def _import_cache_snapshot(self):
+        if self.snapshot_import_worker: return
+        source, _ = QFileDialog.getOpenFileName(
+            self, "Importar Instantánea de Caché", "", f"Instantánea de MediaForge (*{SNAPSHOT_EXTENSION})"
+        )
+        if not source: return
+        try:
+            header = read_snapshot_header(source)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, ts.t('error_title', 'Error'), f"No se pudo leer la instantánea: {e}")
+            return
+        # La unidad puede estar montada en otro punto en esta máquina
+        target_root, accepted = QInputDialog.getText(
+            self, "Ruta de Montaje",
+            "Ruta donde está (o estará) montada esta unidad en este equipo:", text=header["root"]
+        )
+        if not accepted or not target_root: return
+        self.status_bar.showMessage("Importando la instantánea...")
+        self.snapshot_import_worker = SnapshotImportWorker(source, target_root)
+        self.snapshot_import_worker.import_done.connect(self._snapshot_imported)
+        self.snapshot_import_worker.error.connect(
+            lambda message: QMessageBox.critical(self, ts.t('error_title', 'Error'), message))
+        self.snapshot_import_worker.finished.connect(self._snapshot_import_finished)
+        self.snapshot_import_worker.start()
+
+    def _snapshot_imported(self, result: dict):
+        self.load_paths_from_cache()
+        self.status_bar.showMessage(f"Instantánea importada en '{result['root']}' ({result['files']} archivos).")
+
+    def _snapshot_import_finished(self):
+        self.snapshot_import_worker = None
+
+    def _sync_with_agent(self):
+        if self.agent_sync_worker and self.agent_sync_worker.isRunning(): return
+        url, accepted = QInputDialog.getText(
+            self, "Agente de Escaneo", "URL del agente (p. ej. http://nas:8765):",
+            text=self.config.get("agent/url", "http://127.0.0.1:8765")
+        )
+        if not accepted or not url: return
+        saved_map = self.config.get("agent/root_map", "")
+        # Una línea por raíz: 'ruta en el agente => ruta en este equipo'
+        map_text, accepted = QInputDialog.getMultiLineText(
+            self, "Rutas del Agente",
+            "Traducción de rutas, una por línea ('ruta en el agente => ruta en este equipo'):", saved_map
+        )
+        if not accepted: return
+        self.config.set("agent/url", url)
+        self.config.set("agent/root_map", map_text)
+        root_map = {}
+        for line in map_text.splitlines():
+            if "=>" in line:
+                agent_root, local_root = (part.strip() for part in line.split("=>", 1))
+                if agent_root and local_root: root_map[agent_root] = local_root
+
+        self.status_bar.showMessage("Sincronizando con el agente...")
+        self.agent_sync_worker = AgentSyncWorker(url, root_map)
+        self.agent_sync_worker.sync_done.connect(self._agent_sync_done)
+        self.agent_sync_worker.error.connect(self._scan_error)
+        self.agent_sync_worker.start()
+
+    def _agent_sync_done(self, summary: dict):
+        self.load_paths_from_cache()
+        resync = " (resincronización completa)" if summary.get("full_resync") else ""
+        self.status_bar.showMessage(
+            f"Agente sincronizado{resync}: {summary['upserts']} archivos actualizados, {summary['deletes']} eliminados."
+        )
+
     def move_path_to_active(self, path: str):
         for i in range(self.side_panel.active_layout.count()):
             widget = self.side_panel.active_layout.itemAt(i).widget()
@@ -167,23 +298,56 @@ class DuplicateFinderWindow(QMainWindow):
             return
         self.scan_button.setText(ts.t('cancel_button', 'Cancelar Escaneo')); self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 100); self.progress_bar.setValue(0); self._clear_results()
-        scanner = DefaultScanner(); matcher = MediaNameMatcher()
-        self.worker = ScanWorker(paths, scanner, matcher)
+        # Los resultados anteriores se descartan: sus carpetas ya no se comparten con los nuevos
+        directories.clear()
+        resume_session = self._ask_resume_session(paths)
+        if tracer.enabled: tracer.reset()
+        # El escaneo corre en otro proceso; esta ventana solo recibe progreso y resultados
+        self.worker = ScanProcessWorker(paths, resume_session=resume_session)
         self.worker.signals.status_update.connect(self._update_status)
-        self.worker.signals.progress.connect(self.progress_bar.setValue)
-        self.worker.signals.set_progress_bar_indeterminate.connect(self._set_progress_bar_indeterminate)
+        self.worker.signals.progress.connect(self._update_progress)
         self.worker.signals.finished.connect(self._scan_finished)
-        self.worker.signals.results_ready.connect(self._populate_results_area)
+        self.worker.signals.groups_ready.connect(self._append_results)
+        self.worker.signals.results_ready.connect(self._results_finished)
         self.worker.signals.error.connect(self._scan_error)
         self.worker.start()
 
-    def _set_progress_bar_indeterminate(self, is_indeterminate: bool):
-        """Cambia el modo de la barra de progreso."""
-        if is_indeterminate:
+    def _ask_resume_session(self, paths: list):
+        """Si hay un escaneo interrumpido de estas mismas rutas, ofrece reanudarlo."""
+        session = self.cache.get_resumable_session([os.path.normpath(p) for p in paths])
+        if session is None or (session["walk_complete"] and not session["pending"]):
+            return None
+        started = time.strftime('%Y-%m-%d %H:%M', time.localtime(session["started"]))
+        detail = f"{session['pending']} archivos pendientes." if session["walk_complete"] else "Se omitirán los archivos ya procesados."
+        reply = QMessageBox.question(
+            self, ts.t('resume_scan_title', 'Reanudar escaneo'),
+            f"Hay un escaneo interrumpido de estas rutas (iniciado el {started}). ¿Reanudarlo?\n{detail}",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.Yes
+        )
+        return session["id"] if reply == QMessageBox.StandardButton.Yes else None
+
+    def _update_progress(self, stages: list):
+        """
+        Refleja el estado de las etapas del escaneo. La barra sigue al sondeo
+        cuando ya se conoce su total y queda indeterminada mientras se
+        recolectan archivos o se buscan duplicados.
+        """
+        by_stage = {p.stage: p for p in stages}
+        discover, probe, match = by_stage.get(STAGE_DISCOVER), by_stage.get(STAGE_PROBE), by_stage.get(STAGE_MATCH)
+        if match:
+            # Los mensajes de esta fase llegan por status_update
+            current = []
+            percent = 100 if match.finished else None
+        else:
+            current = [p for p in (discover, probe) if p and not p.finished and not (p is probe and not p.total)]
+            percent = probe.percent if probe and discover and discover.finished else None
+        if percent is None:
             self.progress_bar.setRange(0, 0)
         else:
             self.progress_bar.setRange(0, 100)
-            self.progress_bar.setValue(0)
+            self.progress_bar.setValue(percent)
+        if current:
+            self.status_bar.showMessage("  |  ".join(p.describe() for p in current))
 
     def _cancel_scan(self):
         if self.worker: self.worker.stop()
@@ -194,51 +358,45 @@ class DuplicateFinderWindow(QMainWindow):
     def _scan_finished(self):
         self.status_bar.showMessage(ts.t('status_scan_finished', 'Escaneo finalizado.'))
         self.scan_button.setText(ts.t('scan_selected_paths', 'Escanear Rutas Seleccionadas'))
+        if tracer.enabled and self.worker.session_id:
+            self._save_scan_trace(self.worker.session_id)
         self.progress_bar.setVisible(False); self.worker = None
         self.load_paths_from_cache()
 
+    def _save_scan_trace(self, session_id: int):
+        """
+        Exporta la traza de Chrome de la parte de interfaz del escaneo (modo
+        desarrollador). El proceso de escaneo guarda la suya y el resumen.
+        """
+        try:
+            destination = tracer.export_chrome_trace(os.path.join(TRACE_DIR, f"scan-{session_id}-ui.json"),
+                                                     {"session_id": session_id, "process": "ui"})
+            print(f"Traza de rendimiento guardada en {destination}")
+        except OSError as e:
+            print(f"No se pudo guardar la traza de rendimiento: {e}")
+
     def _scan_error(self, error_message):
         QMessageBox.critical(self, ts.t('error_title', 'Error'), error_message)
 
     def _clear_results(self):
-        while self.results_layout.count():
-            child = self.results_layout.takeAt(0)
-            if child.widget(): child.widget().deleteLater()
-        self.result_widgets.clear()
-
-    def _populate_results_area(self, duplicate_structure: dict):
-        self._clear_results()
-        series_found = duplicate_structure.get("series", {}); movies_found = duplicate_structure.get("movies", [])
-        
-        if not series_found and not movies_found:
-            no_results_label = QLabel(ts.t('no_duplicates_found', 'No se encontraron duplicados.'))
-            no_results_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.results_layout.addWidget(no_results_label)
-            return
+        self.results_view.clear()
+        self.results_view.setVisible(True)
+        self.no_results_label.setVisible(False)
 
-        for series_title, duplicate_episodes in sorted(series_found.items()):
-            series_widget = SeriesGroupWidget(series_title, duplicate_episodes)
-            series_widget.ignore_series_requested.connect(self._handle_ignore_request)
-            self.result_widgets[series_widget.series_id] = series_widget
-            for ep_widget in series_widget.findChildren(DuplicateGroupWidget):
-                ep_widget.ignore_episode_requested.connect(self._handle_ignore_request)
-                self.result_widgets[ep_widget.episode_id] = ep_widget
-            self.results_layout.addWidget(series_widget)
-        
-        if movies_found:
-            movies_label = QLabel(ts.t('duplicate_movies_header', "Películas Duplicadas"))
-            font = movies_label.font(); font.setPointSize(16); movies_label.setFont(font)
-            movies_label.setStyleSheet("padding: 10px; background-color: #2c2c2c; margin-top: 15px;")
-            self.results_layout.addWidget(movies_label)
-            for movie_group in sorted(movies_found, key=lambda g: g.display_title):
-                movie_id = standardize_text(movie_group.display_title)
-                movie_widget = DuplicateGroupWidget(movie_group, series_id=movie_id, is_movie=True)
-                movie_widget.ignore_movie_requested.connect(self._handle_ignore_request)
-                self.result_widgets[movie_widget.movie_id] = movie_widget
-                self.results_layout.addWidget(movie_widget)
-        
-        total_groups = len(movies_found) + sum(len(v) for v in series_found.values())
-        self.status_bar.showMessage(f"Análisis completo. Se encontraron {total_groups} grupos de duplicados.")
+    @traced("ui.append_results", "ui")
+    def _append_results(self, duplicate_batch: dict):
+        """Lote de grupos llegado mientras el matcher sigue trabajando."""
+        self.results_view.append_results(duplicate_batch)
+
+    @traced("ui.populate_results", "ui")
+    def _results_finished(self, duplicate_structure: dict):
+        # Los grupos ya están en la vista (llegaron por lotes); solo falta aplicar el orden elegido
+        self.results_view.results_model.relayout()
+        total_groups = self.results_view.results_model.group_count()
+        self.results_view.setVisible(total_groups > 0)
+        self.no_results_label.setVisible(total_groups == 0)
+        if total_groups:
+            self.status_bar.showMessage(f"Análisis completo. Se encontraron {total_groups} grupos de duplicados.")
 
     def _handle_ignore_request(self, ignore_key: str, level: str):
         dialog = ConfirmDialog(
@@ -248,18 +406,25 @@ class DuplicateFinderWindow(QMainWindow):
         )
         if dialog.exec():
             self.cache.add_to_ignore_list(key=ignore_key, level=level)
-            widget_to_remove = self.result_widgets.pop(ignore_key, None)
-            if widget_to_remove:
-                widget_to_remove.deleteLater()
+            self.results_view.results_model.remove_ignored(ignore_key)
             self.status_bar.showMessage(f"'{ignore_key}' ha sido añadido a la lista de ignorados.")
     
+    def _apply_bulk(self, operation):
+        changed = self.results_view.results_model.apply_bulk(operation)
+        self.status_bar.showMessage(f"Decisión aplicada a {changed} grupos.")
+
+    def _keep_on_volume(self):
+        roots = [path_data['path'] for path_data in self.cache.get_scanned_paths()]
+        if not roots: return
+        root, accepted = QInputDialog.getItem(self, "Conservar por ubicación",
+                                              "Conservar los archivos que están en:", roots, 0, False)
+        if accepted: self._apply_bulk(lambda group: keep_on_volume(group, root))
+
     def _confirm_and_apply_actions(self):
-        files_to_delete = []
-        for series_widget in self.results_container.findChildren(SeriesGroupWidget):
-            for group_widget in series_widget.findChildren(DuplicateGroupWidget):
-                for file_widget in group_widget.findChildren(FileEntryWidget):
-                    if file_widget.media_file.recommendation == 'DELETE':
-                        files_to_delete.append(file_widget.media_file)
+        if self.action_worker and self.action_worker.isRunning(): return
+        if self._ask_resume_actions(): return
+        # Las rutas marcadas salen del almacén de decisiones; el modelo las busca por clave de grupo
+        files_to_delete = self.results_view.results_model.files_marked(self.decisions.marked_for_deletion())
 
         if not files_to_delete:
             QMessageBox.information(self, "Sin acciones", "No se ha marcado ningún archivo para eliminar.")
@@ -268,15 +433,145 @@ class DuplicateFinderWindow(QMainWindow):
         dialog = ActionConfirmDialog(files_to_delete, self)
         if dialog.exec():
             self.status_bar.showMessage("Iniciando acciones en segundo plano...")
-            self.action_worker = ActionWorker(files_to_delete)
-            # Conectar señales del worker de acciones en el futuro
-            self.action_worker.finished.connect(self._action_worker_finished)
-            self.action_worker.start()
+            self._start_action_worker(ActionWorker([FileAction(OP_TRASH, f.path_str) for f in files_to_delete]))
+
+    def _ask_resume_actions(self) -> bool:
+        """Si una ejecución de acciones se cortó a medias, ofrece reanudarla. Devuelve True si se reanuda."""
+        run = self.cache.get_interrupted_action_run()
+        if run is None: return False
+        if not run["pending"]:
+            self.cache.set_action_run_status(run["id"], SESSION_ABANDONED)
+            return False
+        started = time.strftime('%Y-%m-%d %H:%M', time.localtime(run["created"]))
+        reply = QMessageBox.question(
+            self, "Reanudar acciones",
+            f"Hay acciones interrumpidas (iniciadas el {started}) con {run['pending']} archivos pendientes. ¿Reanudarlas?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.Yes
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            ActionEngine(self.cache).abandon(run["id"])
+            return False
+        self._start_action_worker(ActionWorker(resume_run=run["id"]))
+        return True
+
+    def _undo_last_actions(self):
+        if self.action_worker and self.action_worker.isRunning(): return
+        run = self.cache.get_last_undoable_action_run()
+        if run is None:
+            QMessageBox.information(self, "Deshacer", "No hay acciones que deshacer.")
+            return
+        done = time.strftime('%Y-%m-%d %H:%M', time.localtime(run["created"]))
+        dialog = ConfirmDialog(parent=self, title="Deshacer acciones",
+                               message=f"¿Devolver a su sitio los archivos movidos o enviados a la papelera el {done}?")
+        if dialog.exec():
+            self._start_action_worker(ActionWorker(undo_run=run["id"]))
+
+    def _organize_library(self):
+        if (self.action_worker and self.action_worker.isRunning()) or self.organizer_worker: return
+        if self._ask_resume_actions(): return
+        paths = [self.side_panel.active_layout.itemAt(i).widget().path for i in range(self.side_panel.active_layout.count())]
+        if not paths:
+            QMessageBox.warning(self, ts.t('no_paths_title', 'Sin rutas'), "Añada las rutas de la biblioteca a organizar.")
+            return
+        self.organizer_worker = OrganizerPlanWorker(paths)
+        self.organizer_worker.series_found.connect(self._show_organizer)
+        self.organizer_worker.error.connect(lambda message: QMessageBox.critical(self, "Error", message))
+        self.organizer_worker.finished.connect(self._organizer_worker_finished)
+        self.status_bar.showMessage("Buscando series repartidas en varias carpetas...")
+        self.organizer_worker.start()
+
+    def _organizer_worker_finished(self):
+        self.organizer_worker = None
+
+    def _show_organizer(self, series: list):
+        self.status_bar.clearMessage()
+        if not series:
+            QMessageBox.information(self, "Organizar Biblioteca", "No hay series repartidas en varias carpetas.")
+            return
+        dialog = OrganizerDialog(series, self)
+        if not dialog.exec(): return
+        actions, conflicts = plan_moves(dialog.selected_series())
+        if not actions:
+            QMessageBox.information(self, "Organizar Biblioteca", "No hay archivos que mover.")
+            return
+        message = f"Se moverán {len(actions)} archivos."
+        if conflicts: message += f"\n{len(conflicts)} se quedarán donde están (nombre repetido o destino ocupado)."
+        box = QMessageBox(QMessageBox.Icon.Question, "Organizar Biblioteca", message,
+                          QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel, self)
+        if conflicts: box.setDetailedText("\n".join(f"{path}: {reason}" for path, reason in conflicts))
+        if box.exec() != QMessageBox.StandardButton.Ok: return
+        self.status_bar.showMessage("Organizando la biblioteca en segundo plano...")
+        self._start_action_worker(ActionWorker(actions, allow_cross_device=True))
+
+    def _open_space_planner(self):
+        # Lee columnas ya guardadas en la caché: bastante rápido para el hilo de la interfaz
+        planner = SpacePlanner.from_cache(self.cache)
+        if not len(planner):
+            QMessageBox.information(self, "Planificador de Espacio",
+                                    "No hay grupos de duplicados guardados. Ejecute un escaneo primero.")
+            return
+        SpacePlannerDialog(planner, self).exec()
+
+    def _empty_trash(self):
+        if (self.action_worker and self.action_worker.isRunning()) or self.trash_purge_worker: return
+        summary = self.cache.get_trash_summary()
+        if not summary:
+            QMessageBox.information(self, "Papelera", "La papelera de MediaForge está vacía.")
+            return
+        lines = [f"{root}: {count} archivos, {size / 1024**3:.2f} GB" for root, count, size in summary]
+        total = sum(size for _, _, size in summary)
+        dialog = ConfirmDialog(parent=self, title="Vaciar papelera",
+                               message="Se borrarán definitivamente (no se podrán deshacer):\n"
+                                       + "\n".join(lines) + f"\n\nTotal: {total / 1024**3:.2f} GB")
+        if not dialog.exec(): return
+        self.trash_purge_worker = TrashPurgeWorker()
+        self.trash_purge_worker.purge_done.connect(
+            lambda result: self.status_bar.showMessage(
+                f"Papelera vaciada: {result['files']} archivos, {result['bytes'] / 1024**3:.2f} GB liberados."))
+        self.trash_purge_worker.error.connect(lambda message: QMessageBox.critical(self, "Error", message))
+        self.trash_purge_worker.finished.connect(self._trash_purge_finished)
+        self.status_bar.showMessage("Vaciando la papelera...")
+        self.trash_purge_worker.start()
+
+    def _trash_purge_finished(self):
+        self.trash_purge_worker = None
+
+    def _start_action_worker(self, worker: ActionWorker):
+        self._action_failures = []
+        self.action_worker = worker
+        worker.progress.connect(self._action_progress)
+        worker.file_failed.connect(lambda path, error: self._action_failures.append(f"{path}: {error}"))
+        worker.run_finished.connect(self._action_run_finished)
+        worker.error.connect(lambda message: QMessageBox.critical(self, "Error", message))
+        worker.finished.connect(self._action_worker_finished)
+        self.apply_actions_button.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 0)
+        worker.start()
+
+    def _action_progress(self, done: int, total: int):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+        self.status_bar.showMessage(f"Aplicando acciones: {done} / {total}")
+
+    def _action_run_finished(self, summary: dict):
+        undo = summary["kind"] == "undo"
+        lines = [f"{summary['done']} archivos {'restaurados' if undo else 'procesados'} de {summary['total']}."]
+        if summary["cancelled"]: lines.append("Se ha cancelado: las acciones pendientes se pueden reanudar.")
+        if summary["failed"]: lines.append(f"{summary['failed']} han fallado.")
+        if summary["lost"]: lines.append(f"{len(summary['lost'])} no se pueden recuperar (borrados o en la papelera del sistema).")
+        box = QMessageBox(QMessageBox.Icon.Warning if summary["failed"] else QMessageBox.Icon.Information,
+                          "Acciones Completadas", "\n".join(lines), parent=self)
+        if self._action_failures: box.setDetailedText("\n".join(self._action_failures))
+        box.exec()
+        if summary["done"]:
+            self.status_bar.showMessage("Acciones completadas. Refrescando...")
+            self._start_scan() # Refrescar la vista
 
     def _action_worker_finished(self):
-        QMessageBox.information(self, "Acciones Completadas", "Los archivos seleccionados han sido enviados a la papelera.")
-        self.status_bar.showMessage("Acciones completadas. Refrescando...")
-        self._start_scan() # Refrescar la vista
+        self.apply_actions_button.setEnabled(True)
+        if not (self.worker and self.worker.isRunning()): self.progress_bar.setVisible(False)
+        self.action_worker = None
 
     def closeEvent(self, event):
         """
@@ -284,4 +579,5 @@ class DuplicateFinderWindow(QMainWindow):
         antes de que la ventana se destruya.
         """
         self.closing.emit()
+        self.thumbnail_loader.shutdown()
         super().closeEvent(event)
\ No newline at end of file
@@ -31,6 +31,7 @@ class PathEntryWidget(QFrame):
     add_requested = pyqtSignal(str)
     remove_requested = pyqtSignal(str)
     delete_from_history_requested = pyqtSignal(str)
+    export_snapshot_requested = pyqtSignal(str)
     # --- INICIO DE CORRECCIÓN: NUEVA SEÑAL ---
     double_clicked = pyqtSignal(str)
     # --- FIN DE CORRECCIÓN ---
@@ -85,6 +86,9 @@ class PathEntryWidget(QFrame):
         context_menu.addAction(open_action)
         if self.is_history:
             context_menu.addSeparator()
+            export_action = QAction("Exportar Instantánea de Caché...", self)
+            export_action.triggered.connect(lambda: self.export_snapshot_requested.emit(self.path))
+            context_menu.addAction(export_action)
             delete_action = QAction("Eliminar del Historial", self)
             delete_action.triggered.connect(lambda: self.delete_from_history_requested.emit(self.path))
             context_menu.addAction(delete_action)
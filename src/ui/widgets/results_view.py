@@ -0,0 +1,769 @@
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+import numpy as np
+from PyQt6.QtWidgets import (QTreeView, QStyledItemDelegate, QStyle, QMenu, QAbstractItemView, QWidget, QHBoxLayout,
+                             QLineEdit, QComboBox, QToolButton)
+from PyQt6.QtGui import QAction, QColor, QDesktopServices, QFont, QPen
+from PyQt6.QtCore import (Qt, QAbstractItemModel, QModelIndex, QPoint, QRect, QSize, QTimer, QUrl, QEvent, pyqtSignal)
+from src.core.results_index import (ResultsIndex, KIND_SERIES, KIND_MOVIE, SORT_OPTIONS, SORT_TITLE, SORT_TYPE,
+                                     SORT_RECLAIMABLE)
+from src.core.decision_store import DECISIONS, accept_suggestion, delete_lower_resolution
+from src.core.thumbnail_loader import ThumbnailLoader
+from src.utils.text_parser import standardize_text
+from src.utils.translator import ts
+from src.ui.widgets.duplicate_widgets import format_size, series_ignore_key, show_metadata_dialog
+
+NODE_ROOT = "root"
+NODE_SERIES = "series"
+NODE_SECTION = "section" # Cabecera de las películas
+NODE_GROUP = "group"
+NODE_FILE = "file"
+
+# Todas las filas miden lo mismo: QTreeView no tiene que medir cada una (setUniformRowHeights)
+ROW_HEIGHT = 46
+ACTION_BUTTON_WIDTH = 90
+SMALL_BUTTON_SIZE = 25
+THUMBNAIL_SIZE = QSize(64, 36) # 16:9, cabe en ROW_HEIGHT
+# Filas por encima y por debajo de las visibles cuyas miniaturas se piden por adelantado
+THUMBNAIL_PREFETCH_ROWS = 40
+
+# Estilo compartido por todas las filas: (texto del botón, fondo, borde)
+STATE_STYLES = {
+    'KEEP': ("Mantener", "#6a9c6a", "#8ac88a"),
+    'DELETE': ("Eliminar", "#9c6a6a", "#c88a8a"),
+    'SUGGESTED': ("Confirmar?", "#a19c48", "#c8c25a"),
+    'REVIEW': ("Decidir", "#555", "#777"),
+}
+ROW_BACKGROUNDS = {NODE_SERIES: "#2c2c2c", NODE_SECTION: "#2c2c2c", NODE_GROUP: "#3a3a3a"}
+KEEP_BACKGROUND, KEEP_BORDER = "#384838", "#5a785a"
+HOVER_BACKGROUND = "#4a4a4a"
+FILE_BORDER = "#2c2c2c"
+DIMMED_TEXT = "#888"
+PATH_TEXT = "#aaa"
+
+class ResultNode:
+    """Nodo del árbol de resultados. El modelo guarda nodos, no widgets."""
+    __slots__ = ('kind', 'title', 'parent', 'row', 'children', 'group', 'media_file',
+                 'ignore_key', 'ignore_level', 'first_selection_done', 'index_id')
+
+    def __init__(self, kind: str, title: str = "", parent: Optional["ResultNode"] = None):
+        self.kind = kind
+        self.title = title
+        self.parent = parent
+        self.row = len(parent.children) if parent is not None else 0
+        self.children: List["ResultNode"] = []
+        self.group = self.media_file = None
+        self.ignore_key = self.ignore_level = None
+        self.first_selection_done = False
+        self.index_id = -1 # Id en ResultsIndex (cabeceras y grupos)
+        if parent is not None: parent.children.append(self)
+
+class DuplicateResultsModel(QAbstractItemModel):
+    """
+    Modelo de los grupos de duplicados: series -> episodios -> archivos y
+    una sección de películas -> películas -> archivos. Los datos viven en
+    nodos ligeros; la vista solo pide (y pinta) las filas visibles.
+
+    Los hijos de las cabeceras son solo los grupos visibles, en el orden
+    actual; la lista completa está en ResultsIndex, que calcula búsqueda y
+    orden (`set_view`) sin recorrer los nodos.
+
+    Cada cambio de decisión emite `decisions_changed` con los pares (clave,
+    grupo) afectados; la clave de un grupo es su clave de ignorado.
+    """
+    NodeRole = Qt.ItemDataRole.UserRole + 1
+    decisions_changed = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._query = ""
+        self._sort_key = SORT_TITLE
+        self._descending = False
+        self._reset_data()
+
+    def _reset_data(self):
+        self._root = ResultNode(NODE_ROOT)
+        self._section: Optional[ResultNode] = None
+        self._results_index = ResultsIndex()
+        self._top_nodes: List[ResultNode] = []
+        self._group_nodes: List[Optional[ResultNode]] = [] # Por id de grupo; None si se quitó
+        self._series_by_title: Dict[str, ResultNode] = {}
+        self._movies_by_identity: Dict[str, ResultNode] = {} # DuplicateGroup.identity -> nodo
+        self._by_ignore_key: Dict[str, ResultNode] = {}
+        self._ignored: Set[str] = set() # Ignorados durante el escaneo: no vuelven con lotes posteriores
+
+    # --- Construcción ---
+    def clear(self):
+        self.beginResetModel()
+        self._reset_data()
+        self.endResetModel()
+
+    def set_results(self, duplicate_structure: dict):
+        self.clear()
+        self.append_results(duplicate_structure)
+        self.relayout()
+
+    def append_results(self, duplicate_structure: dict):
+        """
+        Añade un lote de resultados con inserciones por bloques. Las series
+        nuevas van detrás de las existentes (antes de las películas) en orden
+        de llegada; una serie o película que ya estaba se sustituye, y las de
+        "retracted" (absorbidas por otra) se quitan antes. Con una búsqueda
+        activa se vuelve a filtrar; el orden elegido se aplica con `relayout`.
+
+        Las decisiones (KEEP / DELETE) tomadas sobre los grupos que se quitan
+        o sustituyen pasan, por ruta, a los grupos que llegan en su lugar, y
+        se emiten con `decisions_changed` bajo su nueva clave.
+        """
+        carried: Dict[str, str] = {} # Ruta -> decisión de los grupos que desaparecen
+        changed = []
+        retracted = duplicate_structure.get("retracted", {})
+        for series_title in retracted.get("series", []):
+            series = self._series_by_title.get(series_title)
+            if series is not None:
+                carried.update(self._decided_files(series))
+                self._remove(series)
+        for identity in retracted.get("movies", []):
+            movie = self._movies_by_identity.get(identity)
+            if movie is not None:
+                carried.update(self._decided_files(movie))
+                self._remove(movie)
+        new_series = []
+        for series_title, duplicate_groups in duplicate_structure.get("series", {}).items():
+            series_key = series_ignore_key(series_title)
+            if series_key in self._ignored: continue
+            groups = sorted((g for g in duplicate_groups if f"{series_key}/{g.group_id}" not in self._ignored), key=lambda g: g.group_id)
+            if not groups: continue
+            series = self._series_by_title.get(series_title)
+            if series is not None: carried.update(self._decided_files(series))
+            changed.extend((f"{series_key}/{g.group_id}", g) for g in groups if self._carry_decisions(g, carried))
+            if series is None:
+                new_series.append((series_title, groups))
+            else:
+                self._replace_episodes(series, groups)
+        if new_series:
+            section_attached = self._section is not None and self._attached(self._section)
+            row = self._section.row if section_attached else len(self._root.children)
+            self.beginInsertRows(QModelIndex(), row, row + len(new_series) - 1)
+            nodes = []
+            for series_title, groups in new_series:
+                series = self._add(NODE_SERIES, series_title, None, series_ignore_key(series_title), 'SERIES')
+                series.index_id = self._results_index.add_top(series_title, KIND_SERIES)
+                self._top_nodes.append(series)
+                self._series_by_title[series_title] = series
+                self._add_episodes(series, groups)
+                nodes.append(series)
+            self._insert_children(self._root, row, nodes)
+            self.endInsertRows()
+
+        new_movies = []
+        for group in duplicate_structure.get("movies", []):
+            movie_key = standardize_text(group.display_title)
+            if movie_key in self._ignored: continue
+            movie = self._movies_by_identity.get(group.identity)
+            if movie is not None: carried.update(self._decided_files(movie))
+            if self._carry_decisions(group, carried): changed.append((movie_key, group))
+            if movie is None:
+                new_movies.append(group)
+            else:
+                self._replace_movie(movie, group)
+        if new_movies:
+            if self._section is None:
+                title = ts.t('duplicate_movies_header', "Películas Duplicadas")
+                self.beginInsertRows(QModelIndex(), len(self._root.children), len(self._root.children))
+                self._section = ResultNode(NODE_SECTION, title, self._root)
+                self._section.index_id = self._results_index.add_top(title, KIND_MOVIE)
+                self._top_nodes.append(self._section)
+                self.endInsertRows()
+            section = self._section
+            first = len(section.children)
+            with self._inserting(section, first, first + len(new_movies) - 1):
+                for group in new_movies:
+                    movie = self._add_group(group, section, standardize_text(group.display_title), 'MOVIE', KIND_MOVIE)
+                    self._movies_by_identity[group.identity] = movie
+        if self._query: self.relayout()
+        if changed: self.decisions_changed.emit(changed)
+
+    def _decided_files(self, node: ResultNode) -> Dict[str, str]:
+        """Ruta -> decisión de los archivos ya decididos de una serie o un grupo, también los ocultos por la búsqueda."""
+        if node.kind == NODE_SERIES:
+            groups = [self._group_nodes[group_id].group for group_id in self._results_index.groups_of(node.index_id)]
+        else:
+            groups = [node.group]
+        return {f.path_str: f.recommendation for group in groups for f in group.files if f.recommendation in DECISIONS}
+
+    @staticmethod
+    def _carry_decisions(group, carried: Dict[str, str]) -> bool:
+        """Como DecisionStore.apply: los archivos sin decisión de un grupo decidido quedan en REVIEW."""
+        if not carried or not any(f.path_str in carried for f in group.files): return False
+        for media_file in group.files:
+            media_file.recommendation = carried.get(media_file.path_str, media_file.recommendation)
+            if media_file.recommendation not in DECISIONS: media_file.recommendation = 'REVIEW'
+        return True
+
+    def _add(self, kind: str, title: str, parent: Optional[ResultNode], ignore_key: str, ignore_level: str) -> ResultNode:
+        node = ResultNode(kind, title, parent)
+        node.ignore_key, node.ignore_level = ignore_key, ignore_level
+        self._by_ignore_key[ignore_key] = node
+        return node
+
+    def _add_group(self, group, parent: ResultNode, ignore_key: str, ignore_level: str, kind: int) -> ResultNode:
+        node = self._add(NODE_GROUP, group.display_title, parent, ignore_key, ignore_level)
+        self._index_group(node, group, parent, kind)
+        self._add_files(node, group.files)
+        return node
+
+    def _index_group(self, node: ResultNode, group, parent: ResultNode, kind: int):
+        node.group = group
+        # Un grupo con decisiones restauradas de una revisión anterior ya tuvo su primera elección
+        node.first_selection_done = any(f.recommendation in DECISIONS for f in group.files)
+        node.index_id = self._results_index.add_group(parent.index_id, group, kind)
+        self._group_nodes.append(node)
+
+    def _unindex_group(self, node: ResultNode):
+        self._results_index.remove_group(node.index_id)
+        self._group_nodes[node.index_id] = None
+        if node.ignore_key: self._by_ignore_key.pop(node.ignore_key, None)
+
+    def _add_episodes(self, series: ResultNode, groups: list):
+        for group in groups:
+            self._add_group(group, series, f"{series.ignore_key}/{group.group_id}", 'EPISODE', KIND_SERIES)
+
+    @staticmethod
+    def _add_files(group_node: ResultNode, files: list):
+        for media_file in files:
+            ResultNode(NODE_FILE, media_file.name, group_node).media_file = media_file
+
+    @staticmethod
+    def _insert_children(parent: ResultNode, row: int, nodes: List[ResultNode]):
+        for node in nodes: node.parent = parent
+        parent.children[row:row] = nodes
+        for i in range(row, len(parent.children)):
+            parent.children[i].row = i
+
+    def _replace_episodes(self, series: ResultNode, groups: list):
+        for group_id in self._results_index.groups_of(series.index_id):
+            self._unindex_group(self._group_nodes[group_id])
+        self._clear_children(series)
+        with self._inserting(series, 0, len(groups) - 1):
+            self._add_episodes(series, groups)
+
+    def _replace_movie(self, movie: ResultNode, group):
+        self._unindex_group(movie)
+        self._by_ignore_key[movie.ignore_key] = movie
+        self._index_group(movie, group, movie.parent, KIND_MOVIE)
+        self._clear_children(movie)
+        with self._inserting(movie, 0, len(group.files) - 1):
+            self._add_files(movie, group.files)
+
+    def _clear_children(self, node: ResultNode):
+        if not node.children: return
+        attached = self._attached(node)
+        if attached: self.beginRemoveRows(self.index_of(node), 0, len(node.children) - 1)
+        node.children = []
+        if attached: self.endRemoveRows()
+
+    @contextmanager
+    def _inserting(self, parent: ResultNode, first: int, last: int):
+        # Un padre oculto por la búsqueda no está en la vista: se modifica sin avisar
+        attached = self._attached(parent)
+        if attached: self.beginInsertRows(self.index_of(parent), first, last)
+        yield
+        if attached: self.endInsertRows()
+
+    def _attached(self, node: ResultNode) -> bool:
+        """El nodo cuelga de la raíz por filas visibles (no lo ha ocultado la búsqueda)."""
+        while node is not self._root:
+            parent = node.parent
+            if parent is None or node.row >= len(parent.children) or parent.children[node.row] is not node:
+                return False
+            node = parent
+        return True
+
+    # --- Búsqueda y orden ---
+    def set_view(self, query: str, sort_key: str, descending: bool):
+        self._query, self._sort_key, self._descending = query.strip(), sort_key, descending
+        self.relayout()
+
+    def relayout(self):
+        """
+        Reconstruye los hijos visibles de cada cabecera según la búsqueda y el
+        orden actuales, con un solo layoutChanged: lo desplegado se conserva.
+        """
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        persistent_nodes = [index.internalPointer() for index in persistent]
+        top_ids, group_ids = self._results_index.arrange(self._query, self._sort_key, self._descending)
+        group_nodes = np.empty(len(self._group_nodes), dtype=object)
+        group_nodes[:] = self._group_nodes
+        self._root.children = [self._top_nodes[top_id] for top_id in top_ids]
+        for row, (top, ids) in enumerate(zip(self._root.children, group_ids)):
+            top.row = row
+            top.children = group_nodes[ids].tolist()
+            for child_row, child in enumerate(top.children):
+                child.row = child_row
+        self.changePersistentIndexList(persistent, [self.createIndex(n.row, 0, n) if self._attached(n) else QModelIndex()
+                                                    for n in persistent_nodes])
+        self.layoutChanged.emit()
+
+    # --- Interfaz de QAbstractItemModel ---
+    def node(self, index: QModelIndex) -> ResultNode:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        # Lo llama la vista por cada fila desplegada: sin hasIndex, que vuelve a pasar por rowCount
+        children = parent.internalPointer().children if parent.isValid() else self._root.children
+        if column != 0 or not 0 <= row < len(children): return QModelIndex()
+        return self.createIndex(row, 0, children[row])
+
+    def parent(self, index: QModelIndex = None):
+        if index is None: return super().parent() # QObject.parent()
+        if not index.isValid(): return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root: return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid(): return len(self._root.children)
+        return 0 if parent.column() else len(parent.internalPointer().children)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole: return node.title
+        if role == Qt.ItemDataRole.ToolTipRole and node.media_file is not None: return node.media_file.path_str
+        if role == self.NodeRole: return node
+        return None
+
+    def flags(self, index: QModelIndex):
+        return Qt.ItemFlag.ItemIsEnabled if index.isValid() else Qt.ItemFlag.NoItemFlags
+
+    def index_of(self, node: ResultNode) -> QModelIndex:
+        return QModelIndex() if node is self._root else self.createIndex(node.row, 0, node)
+
+    # --- Acciones ---
+    def cycle_file(self, index: QModelIndex):
+        """
+        Botón de acción de un archivo: la primera elección de un grupo marca
+        ese archivo como KEEP y el resto como DELETE; después cada archivo
+        alterna entre KEEP y DELETE por su cuenta.
+        """
+        node = self.node(index)
+        if node.kind != NODE_FILE: return
+        media_file, group = node.media_file, node.parent
+        media_file.recommendation = 'KEEP' if media_file.recommendation in ('REVIEW', 'SUGGESTED', 'DELETE') else 'DELETE'
+        if not group.first_selection_done:
+            group.first_selection_done = True
+            for sibling in group.children:
+                if sibling is not node: sibling.media_file.recommendation = 'DELETE'
+            self.dataChanged.emit(self.index_of(group.children[0]), self.index_of(group.children[-1]))
+        else:
+            self.dataChanged.emit(index, index)
+        self._results_index.update_group(group.index_id, group.group)
+        self.decisions_changed.emit([(group.ignore_key, group.group)])
+
+    def apply_bulk(self, operation: Callable, header: Optional[ResultNode] = None) -> int:
+        """
+        Aplica una operación en bloque de decision_store (una función que
+        decide un grupo y dice si lo ha cambiado) a todos los grupos, también
+        los ocultos por la búsqueda, o solo a los de `header`. Devuelve
+        cuántos grupos han cambiado.
+        """
+        if header is None:
+            nodes = self.iter_groups()
+        else:
+            nodes = (self._group_nodes[group_id] for group_id in self._results_index.groups_of(header.index_id))
+        changed = []
+        for node in nodes:
+            if not operation(node.group): continue
+            node.first_selection_done = True
+            self._results_index.update_group(node.index_id, node.group)
+            changed.append((node.ignore_key, node.group))
+            if node.children and self._attached(node):
+                self.dataChanged.emit(self.index_of(node.children[0]), self.index_of(node.children[-1]))
+        if changed:
+            if self._sort_key == SORT_RECLAIMABLE: self.relayout()
+            self.decisions_changed.emit(changed)
+        return len(changed)
+
+    def files_marked(self, marked: Dict[str, Set[str]]) -> List:
+        """Archivos de los resultados que siguen marcados como DELETE, a partir de {clave de grupo: rutas}."""
+        files = []
+        for group_key, paths in marked.items():
+            node = self._by_ignore_key.get(group_key)
+            if node is None or node.kind != NODE_GROUP: continue
+            files.extend(child.media_file for child in node.children
+                         if child.media_file.recommendation == 'DELETE' and child.media_file.path_str in paths)
+        return files
+
+    def remove_ignored(self, ignore_key: str) -> bool:
+        node = self._by_ignore_key.get(ignore_key)
+        if node is None: return False
+        self._ignored.add(ignore_key)
+        self._remove(node)
+        return True
+
+    def _remove(self, node: ResultNode):
+        """Quita una serie o un grupo con todo lo que cuelga de él."""
+        if node.ignore_key: self._by_ignore_key.pop(node.ignore_key, None)
+        if self._series_by_title.get(node.title) is node: del self._series_by_title[node.title]
+        for identity in [identity for identity, movie in self._movies_by_identity.items() if movie is node]:
+            del self._movies_by_identity[identity]
+        if node.kind == NODE_SERIES:
+            for group_id in self._results_index.groups_of(node.index_id):
+                self._unindex_group(self._group_nodes[group_id])
+        else:
+            self._unindex_group(node)
+        if self._attached(node):
+            parent = node.parent
+            self.beginRemoveRows(self.index_of(parent), node.row, node.row)
+            del parent.children[node.row]
+            for row in range(node.row, len(parent.children)):
+                parent.children[row].row = row
+            self.endRemoveRows()
+
+    def iter_groups(self) -> Iterator[ResultNode]:
+        """Todos los grupos, también los que oculta la búsqueda."""
+        return (node for node in self._group_nodes if node is not None)
+
+    def iter_files(self) -> Iterator:
+        for group in self.iter_groups():
+            for child in group.children:
+                yield child.media_file
+
+    def group_count(self) -> int:
+        return sum(1 for node in self._group_nodes if node is not None)
+
+    def visible_group_count(self) -> int:
+        return sum(len(top.children) for top in self._root.children)
+
+class ResultsDelegate(QStyledItemDelegate):
+    """
+    Pinta las filas de resultados con un único estilo compartido y trata
+    como botones unas zonas de la fila (acción, información, ignorar), sin
+    crear widgets por fila.
+    """
+    action_clicked = pyqtSignal(QModelIndex)
+    info_clicked = pyqtSignal(QModelIndex)
+    ignore_clicked = pyqtSignal(QModelIndex)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._fonts = {}
+        self.thumbnails: Optional[ThumbnailLoader] = None # Sin cargador no se pintan miniaturas
+
+    def _font(self, base: QFont, point_size: int = 0, bold: bool = False) -> QFont:
+        key = (point_size, bold)
+        font = self._fonts.get(key)
+        if font is None:
+            font = QFont(base)
+            if point_size: font.setPointSize(point_size)
+            font.setBold(bold)
+            self._fonts[key] = font
+        return font
+
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(option.rect.width(), ROW_HEIGHT)
+
+    @staticmethod
+    def button_rects(node: ResultNode, rect: QRect) -> Dict[str, QRect]:
+        """Zonas clicables de la fila, de derecha a izquierda."""
+        middle = rect.center().y()
+        if node.kind == NODE_FILE:
+            info = QRect(rect.right() - 10 - SMALL_BUTTON_SIZE, middle - SMALL_BUTTON_SIZE // 2, SMALL_BUTTON_SIZE, SMALL_BUTTON_SIZE)
+            action = QRect(info.left() - 10 - ACTION_BUTTON_WIDTH, middle - 14, ACTION_BUTTON_WIDTH, 28)
+            return {"info": info, "action": action}
+        if node.ignore_key:
+            return {"ignore": QRect(rect.right() - 8 - SMALL_BUTTON_SIZE, middle - SMALL_BUTTON_SIZE // 2, SMALL_BUTTON_SIZE, SMALL_BUTTON_SIZE)}
+        return {}
+
+    def hit(self, node: ResultNode, rect: QRect, pos) -> Optional[str]:
+        return next((name for name, area in self.button_rects(node, rect).items() if area.contains(pos)), None)
+
+    def paint(self, painter, option, index):
+        node: ResultNode = index.data(DuplicateResultsModel.NodeRole)
+        rect = option.rect.adjusted(0, 1, 0, -1)
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        buttons = self.button_rects(node, rect)
+        if node.kind == NODE_FILE:
+            self._paint_file(painter, option, node, rect, buttons, hovered)
+        else:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(HOVER_BACKGROUND if hovered and node.kind == NODE_GROUP else ROW_BACKGROUNDS[node.kind]))
+            painter.drawRoundedRect(rect, 3, 3)
+            font = self._font(option.font, 16 if node.kind in (NODE_SERIES, NODE_SECTION) else 12, bold=node.kind == NODE_GROUP)
+            painter.setFont(font)
+            painter.setPen(option.palette.color(option.palette.ColorRole.Text))
+            text_rect = rect.adjusted(8, 0, -(SMALL_BUTTON_SIZE + 16), 0)
+            text = painter.fontMetrics().elidedText(node.title, Qt.TextElideMode.ElideRight, text_rect.width())
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+            if "ignore" in buttons:
+                painter.setFont(self._font(option.font, 14))
+                painter.drawText(buttons["ignore"], Qt.AlignmentFlag.AlignCenter, "👁")
+        painter.restore()
+
+    def _paint_file(self, painter, option, node: ResultNode, rect: QRect, buttons: Dict[str, QRect], hovered: bool):
+        media_file = node.media_file
+        state = media_file.recommendation if media_file.recommendation in STATE_STYLES else 'REVIEW'
+        text_color = option.palette.color(option.palette.ColorRole.Text)
+        if state == 'KEEP':
+            painter.setPen(QPen(QColor(KEEP_BORDER)))
+            painter.setBrush(QColor(HOVER_BACKGROUND if hovered else KEEP_BACKGROUND))
+        else:
+            painter.setPen(QPen(QColor(FILE_BORDER)))
+            painter.setBrush(QColor(HOVER_BACKGROUND) if hovered else Qt.BrushStyle.NoBrush)
+        painter.drawRoundedRect(rect, 3, 3)
+
+        text_left = rect.left() + 10
+        if self.thumbnails is not None:
+            area = QRect(QPoint(rect.left() + 6, rect.center().y() - THUMBNAIL_SIZE.height() // 2), THUMBNAIL_SIZE)
+            image = self.thumbnails.image(media_file)
+            if image is None:
+                painter.fillRect(area, QColor(ROW_BACKGROUNDS[NODE_SERIES]))
+            else:
+                target = QRect(QPoint(0, 0), image.size().scaled(THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio))
+                target.moveCenter(area.center())
+                painter.drawImage(target, image)
+            text_left = area.right() + 10
+
+        # Metadatos alineados a la derecha, antes de los botones
+        parsed = media_file.parsed_info
+        metadata_text = f"{parsed.get('resolution', 'N/A')} | {parsed.get('codec', '')} | {format_size(media_file.size)}"
+        painter.setFont(option.font)
+        metadata_width = painter.fontMetrics().horizontalAdvance(metadata_text)
+        metadata_rect = QRect(buttons["action"].left() - 15 - metadata_width, rect.top(), metadata_width, rect.height())
+        painter.setPen(QColor(DIMMED_TEXT) if state == 'DELETE' else text_color)
+        painter.drawText(metadata_rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight, metadata_text)
+
+        # Nombre en negrita y carpeta debajo
+        text_width = max(0, metadata_rect.left() - text_left - 10)
+        half = rect.height() // 2
+        painter.setFont(self._font(option.font, bold=True))
+        name = painter.fontMetrics().elidedText(media_file.name, Qt.TextElideMode.ElideMiddle, text_width)
+        painter.drawText(QRect(text_left, rect.top() + 2, text_width, half), Qt.AlignmentFlag.AlignBottom, name)
+        painter.setFont(option.font)
+        painter.setPen(QColor(DIMMED_TEXT if state == 'DELETE' else PATH_TEXT))
+        folder = painter.fontMetrics().elidedText(str(media_file.parent), Qt.TextElideMode.ElideMiddle, text_width)
+        painter.drawText(QRect(text_left, rect.top() + half, text_width, half - 2), Qt.AlignmentFlag.AlignTop, folder)
+
+        label, background, border = STATE_STYLES[state]
+        painter.setPen(QPen(QColor(border)))
+        painter.setBrush(QColor(background))
+        painter.drawRoundedRect(buttons["action"], 3, 3)
+        painter.setPen(text_color)
+        painter.drawText(buttons["action"], Qt.AlignmentFlag.AlignCenter, label)
+        painter.setPen(QPen(QColor(STATE_STYLES['REVIEW'][2])))
+        painter.setBrush(QColor(STATE_STYLES['REVIEW'][1]))
+        painter.drawRoundedRect(buttons["info"], 3, 3)
+        painter.setPen(text_color)
+        painter.drawText(buttons["info"], Qt.AlignmentFlag.AlignCenter, "i")
+
+    def editorEvent(self, event, model, option, index) -> bool:
+        if event.type() not in (QEvent.Type.MouseButtonPress, QEvent.Type.MouseButtonRelease, QEvent.Type.MouseButtonDblClick):
+            return False
+        if event.button() != Qt.MouseButton.LeftButton: return False
+        button = self.hit(index.data(DuplicateResultsModel.NodeRole), option.rect.adjusted(0, 1, 0, -1), event.position().toPoint())
+        if button is None: return False
+        # Se consumen pulsación y doble clic para que no expandan la fila ni abran el archivo
+        if event.type() == QEvent.Type.MouseButtonRelease:
+            {"action": self.action_clicked, "info": self.info_clicked, "ignore": self.ignore_clicked}[button].emit(index)
+        return True
+
+class DuplicateResultsView(QTreeView):
+    """
+    Árbol virtualizado de resultados. Las series empiezan plegadas y al
+    abrirlas se despliegan sus episodios; las películas empiezan abiertas.
+    Los resultados pueden llegar por lotes durante el escaneo
+    (`append_results`) sin perder lo que el usuario ya ha desplegado.
+    Doble clic en un archivo lo abre; el menú contextual ofrece información
+    y abrir archivo o carpeta.
+
+    Con un ThumbnailLoader (`set_thumbnail_loader`), tras cada
+    desplazamiento o cambio de filas se piden las miniaturas de los archivos
+    visibles y, detrás, las de las filas vecinas.
+    """
+    ignore_requested = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results_model = DuplicateResultsModel(self)
+        self.results_delegate = ResultsDelegate(self)
+        self.setModel(self.results_model)
+        self.setItemDelegate(self.results_delegate)
+        self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+        self.setAnimated(False)
+        self.setMouseTracking(True)
+        self.viewport().setAttribute(Qt.WidgetAttribute.WA_Hover, True)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setFrameShape(self.Shape.NoFrame)
+        self._expanding = False
+
+        self.expanded.connect(self._expand_children)
+        self.results_model.rowsInserted.connect(self._expand_inserted)
+        self.results_model.layoutChanged.connect(self._expand_open_headers)
+        self.doubleClicked.connect(self._open_index)
+        self.results_delegate.action_clicked.connect(self.results_model.cycle_file)
+        self.results_delegate.info_clicked.connect(lambda index: show_metadata_dialog(self, self.results_model.node(index).media_file))
+        self.results_delegate.ignore_clicked.connect(self._request_ignore)
+
+        self._thumbnail_timer = QTimer(self)
+        self._thumbnail_timer.setSingleShot(True)
+        self._thumbnail_timer.setInterval(30)
+        self._thumbnail_timer.timeout.connect(self._request_thumbnails)
+
+    def set_thumbnail_loader(self, loader: ThumbnailLoader):
+        self.results_delegate.thumbnails = loader
+        loader.thumbnail_ready.connect(self.viewport().update)
+        # Cualquier cambio de lo que se ve vuelve a pedir las miniaturas (agrupado por el temporizador)
+        for signal in (self.verticalScrollBar().valueChanged, self.expanded, self.collapsed,
+                       self.results_model.rowsInserted, self.results_model.rowsRemoved,
+                       self.results_model.layoutChanged, self.results_model.modelReset):
+            signal.connect(self._schedule_thumbnails)
+        self._schedule_thumbnails()
+
+    def _schedule_thumbnails(self, *args):
+        # Sin argumentos: start(int) tomaría el valor de la señal como intervalo
+        self._thumbnail_timer.start()
+
+    def _request_thumbnails(self):
+        loader = self.results_delegate.thumbnails
+        first = self.indexAt(QPoint(0, 0))
+        if loader is None or not first.isValid(): return
+        visible_rows = self.viewport().height() // ROW_HEIGHT + 1
+        indexes, index = [], first
+        for _ in range(visible_rows + THUMBNAIL_PREFETCH_ROWS):
+            if not index.isValid(): break
+            indexes.append(index)
+            index = self.indexBelow(index)
+        index = self.indexAbove(first)
+        for _ in range(THUMBNAIL_PREFETCH_ROWS):
+            if not index.isValid(): break
+            indexes.append(index)
+            index = self.indexAbove(index)
+        nodes = (self.results_model.node(index) for index in indexes)
+        loader.request([node.media_file for node in nodes if node.kind == NODE_FILE])
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._schedule_thumbnails()
+
+    def set_results(self, duplicate_structure: dict):
+        self.results_model.set_results(duplicate_structure)
+
+    def append_results(self, duplicate_structure: dict):
+        self.results_model.append_results(duplicate_structure)
+
+    def clear(self):
+        self.results_model.clear()
+
+    def _expand_inserted(self, parent: QModelIndex, first: int, last: int):
+        # La sección de películas nace abierta; los grupos nuevos de una serie o sección abierta, también
+        if not parent.isValid():
+            for row in range(first, last + 1):
+                index = self.results_model.index(row, 0)
+                if self.results_model.node(index).kind == NODE_SECTION: self.expand(index)
+        elif self.results_model.node(parent).kind in (NODE_SERIES, NODE_SECTION) and self.isExpanded(parent):
+            for row in range(first, last + 1):
+                self.expand(self.results_model.index(row, 0, parent))
+
+    def _expand_children(self, index: QModelIndex):
+        # Al abrir una serie o la sección de películas se abren también sus grupos
+        if self._expanding or self.results_model.node(index).kind not in (NODE_SERIES, NODE_SECTION): return
+        self._expanding = True
+        try:
+            self.expandRecursively(index, 1)
+        finally:
+            self._expanding = False
+
+    def _expand_open_headers(self):
+        # Tras buscar u ordenar, los grupos que reaparecen en una cabecera abierta también se abren
+        for row in range(self.results_model.rowCount()):
+            index = self.results_model.index(row, 0)
+            if self.isExpanded(index): self._expand_children(index)
+
+    def _request_ignore(self, index: QModelIndex):
+        node = self.results_model.node(index)
+        if node.ignore_key: self.ignore_requested.emit(node.ignore_key, node.ignore_level)
+
+    def _open_index(self, index: QModelIndex):
+        node = self.results_model.node(index)
+        if node.kind == NODE_FILE:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(node.media_file.path_str))
+
+    def contextMenuEvent(self, event):
+        index = self.indexAt(event.pos())
+        node = self.results_model.node(index) if index.isValid() else None
+        if node is None: return
+        if node.kind in (NODE_SERIES, NODE_SECTION):
+            # Decisiones en bloque para todos los grupos de la cabecera, también los ocultos por la búsqueda
+            context_menu = QMenu(self)
+            accept_action = QAction("Aceptar las sugerencias", self)
+            accept_action.triggered.connect(lambda: self.results_model.apply_bulk(accept_suggestion, node))
+            lower_action = QAction("Eliminar las copias de menor resolución", self)
+            lower_action.triggered.connect(lambda: self.results_model.apply_bulk(delete_lower_resolution, node))
+            context_menu.addAction(accept_action); context_menu.addAction(lower_action)
+            context_menu.exec(event.globalPos())
+            return
+        if node.kind != NODE_FILE: return
+        media_file = node.media_file
+        context_menu = QMenu(self)
+        info_action = QAction("Información Detallada", self); info_action.triggered.connect(lambda: show_metadata_dialog(self, media_file))
+        open_action = QAction("Abrir Archivo", self); open_action.triggered.connect(lambda: self._open_index(index))
+        open_folder_action = QAction("Abrir Carpeta Contenedora", self)
+        open_folder_action.triggered.connect(lambda: QDesktopServices.openUrl(QUrl.fromLocalFile(str(media_file.parent))))
+        move_action = QAction("Mover a...", self); move_action.setEnabled(False)
+        delete_action = QAction("Eliminar (Enviar a Papelera)", self); delete_action.setEnabled(False)
+        context_menu.addAction(info_action); context_menu.addSeparator()
+        context_menu.addAction(open_action); context_menu.addAction(open_folder_action); context_menu.addSeparator()
+        context_menu.addAction(move_action); context_menu.addAction(delete_action)
+        context_menu.exec(event.globalPos())
+
+class ResultsFilterBar(QWidget):
+    """Búsqueda por título o ruta y orden de los resultados."""
+    view_changed = pyqtSignal(str, str, bool) # texto, clave de orden, descendente
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Buscar por título o ruta...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.sort_combo = QComboBox()
+        for key, label in SORT_OPTIONS.items():
+            self.sort_combo.addItem(label, key)
+        self.direction_button = QToolButton()
+        self.direction_button.setCheckable(True)
+        self.direction_button.setToolTip("Invertir el orden")
+        layout.addWidget(self.search_edit, stretch=1)
+        layout.addWidget(self.sort_combo)
+        layout.addWidget(self.direction_button)
+        self._update_direction_text()
+
+        self.search_edit.textChanged.connect(self._emit)
+        self.sort_combo.currentIndexChanged.connect(self._sort_changed)
+        self.direction_button.toggled.connect(self._emit)
+
+    def _sort_changed(self):
+        # Por tamaño o número de archivos interesa primero lo mayor; por título o tipo, de la A a la Z
+        descending = self.sort_combo.currentData() not in (SORT_TITLE, SORT_TYPE)
+        if self.direction_button.isChecked() != descending:
+            self.direction_button.setChecked(descending) # Emite por toggled
+        else:
+            self._emit()
+
+    def _update_direction_text(self):
+        self.direction_button.setText("↓" if self.direction_button.isChecked() else "↑")
+
+    def _emit(self):
+        self._update_direction_text()
+        self.view_changed.emit(self.search_edit.text(), self.sort_combo.currentData(), self.direction_button.isChecked())
+
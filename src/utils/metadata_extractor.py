@@ -3,6 +3,23 @@ from pathlib import Path
 from typing import Dict, Optional
 import os
 import sys
+from src.utils.tracing import traced
+
+# Versión de la tabla que devuelve get_media_info. Subirla cuando cambie su
+# contenido: los archivos de la caché con una versión menor se vuelven a sondear.
+#   1: vídeo principal (duración, tamaño, códec)
+#   2: + bitrates y flujos de audio y subtítulos
+PROBE_VERSION = 2
+
+# Códigos ISO 639-1 y bibliográficos (639-2/B) más habituales -> 639-2/T
+_LANGUAGE_ALIASES = {
+    "es": "spa", "esp": "spa", "en": "eng", "fr": "fra", "fre": "fra", "de": "deu", "ger": "deu",
+    "it": "ita", "pt": "por", "ja": "jpn", "jp": "jpn", "zh": "zho", "chi": "zho", "ru": "rus",
+    "ko": "kor", "ca": "cat", "eu": "eus", "baq": "eus", "gl": "glg", "nl": "nld", "dut": "nld",
+    "cs": "ces", "cze": "ces", "el": "ell", "gre": "ell", "fa": "fas", "per": "fas", "ro": "ron",
+    "rum": "ron", "sk": "slk", "slo": "slk", "pl": "pol", "sv": "swe", "da": "dan", "no": "nor",
+    "fi": "fin", "tr": "tur", "ar": "ara", "he": "heb", "hi": "hin",
+}
 
 class MetadataExtractor:
     _ffmpeg_exec = "ffmpeg"
@@ -24,20 +41,28 @@ class MetadataExtractor:
             if os.path.exists(ffmpeg_exe_path) and os.path.exists(ffprobe_exe_path):
                 cls._ffmpeg_exec = ffmpeg_exe_path
                 cls._ffprobe_exec = ffprobe_exe_path
-                print(f"FFprobe path set to: {cls._ffprobe_exec}")
+                print(f"FFprobe path set to: {cls._ffprobe_exec}", file=sys.stderr)
             else:
-                print(f"Warning: '{ffmpeg_exe_name}' or '{ffprobe_exe_name}' not found in '{normalized_path}'. Using system PATH.")
+                print(f"Warning: '{ffmpeg_exe_name}' or '{ffprobe_exe_name}' not found in '{normalized_path}'. Using system PATH.", file=sys.stderr)
         else:
             cls._ffmpeg_exec = "ffmpeg"
             cls._ffprobe_exec = "ffprobe"
 
     @classmethod
+    @traced("ffprobe", "probe")
     def get_media_info(cls, file_path: Path) -> Optional[Dict]:
+        """
+        Una sola llamada a ffprobe (formato + flujos) normalizada en una tabla
+        compacta: vídeo principal, bitrate total y de vídeo y las listas
+        'audio' ([idioma, códec, canales, bitrate]) y 'subtitles' ([idioma,
+        códec, forzado]). Los bitrates son bit/s y pueden ser None.
+        """
         try:
             probe = ffmpeg.probe(str(file_path), cmd=cls._ffprobe_exec)
-            
-            video_stream = next((s for s in probe['streams'] if s['codec_type'] == 'video'), None)
-            
+            streams = probe.get('streams', [])
+            video_stream = next((s for s in streams if s.get('codec_type') == 'video'
+                                 and not s.get('disposition', {}).get('attached_pic')), None)
+
             if not video_stream:
                 return None
 
@@ -45,7 +70,7 @@ class MetadataExtractor:
             if 'duration' in probe.get('format', {}):
                 try: duration = float(probe['format']['duration'])
                 except (ValueError, TypeError): pass
-            
+
             if duration == 0.0 and 'duration' in video_stream:
                 try: duration = float(video_stream['duration'])
                 except (ValueError, TypeError): pass
@@ -55,8 +80,57 @@ class MetadataExtractor:
                 'width': video_stream.get('width', 0),
                 'height': video_stream.get('height', 0),
                 'v_codec': video_stream.get('codec_name', 'unknown'),
+                'bitrate': _int_or_none(probe.get('format', {}).get('bit_rate')),
+                'v_bitrate': _stream_bitrate(video_stream),
+                'audio': [
+                    [normalize_language(s), s.get('codec_name', 'unknown'), s.get('channels') or 0, _stream_bitrate(s)]
+                    for s in streams if s.get('codec_type') == 'audio'
+                ],
+                'subtitles': [
+                    [normalize_language(s), s.get('codec_name', 'unknown'), int(bool(s.get('disposition', {}).get('forced')))]
+                    for s in streams if s.get('codec_type') == 'subtitle'
+                ],
             }
         except ffmpeg.Error as e:
             return None
         except Exception as e:
-            return None
\ No newline at end of file
+            return None
+
+    @classmethod
+    @traced("ffmpeg.thumbnail", "thumbnail")
+    def extract_frame(cls, file_path: Path, at_seconds: float, width: int) -> Optional[bytes]:
+        """
+        Un fotograma en `at_seconds` como JPEG de `width` píxeles de ancho.
+        -ss antes de la entrada busca por fotogramas clave, así que no se
+        decodifica el vídeo hasta ese punto.
+        """
+        try:
+            data, _ = (
+                ffmpeg.input(str(file_path), ss=max(0.0, at_seconds))
+                .filter('scale', width, -2)
+                .output('pipe:', vframes=1, format='image2', vcodec='mjpeg')
+                .run(cmd=cls._ffmpeg_exec, capture_stdout=True, capture_stderr=True)
+            )
+            return data or None
+        except ffmpeg.Error as e:
+            return None
+        except Exception as e:
+            return None
+
+def _int_or_none(value) -> Optional[int]:
+    try: return int(value)
+    except (ValueError, TypeError): return None
+
+def _stream_bitrate(stream: Dict) -> Optional[int]:
+    """bit_rate del flujo o, en MKV, la etiqueta de estadísticas BPS que escribe mkvmerge."""
+    bitrate = _int_or_none(stream.get('bit_rate'))
+    if bitrate is None:
+        tags = stream.get('tags', {})
+        bitrate = _int_or_none(tags.get('BPS') or tags.get('BPS-eng'))
+    return bitrate
+
+def normalize_language(stream: Dict) -> str:
+    """Idioma del flujo como código ISO 639-2/T en minúsculas ('und' si no consta)."""
+    language = (stream.get('tags', {}).get('language') or '').strip().lower()
+    if not language: return 'und'
+    return _LANGUAGE_ALIASES.get(language, language)
@@ -0,0 +1,37 @@
+import pytest
+from src.core import volume_trash
+from src.core.cache_manager import CacheManager
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CacheManager(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def library(tmp_path, cache, monkeypatch):
+    """
+    Carpeta de biblioteca registrada en la caché. La raíz del volumen se fija
+    en tmp_path para que la papelera de cada prueba quede dentro de ella y no
+    en la raíz real del disco.
+    """
+    monkeypatch.setattr(volume_trash, "_mount_point", lambda path: str(tmp_path))
+    root = tmp_path / "library"
+    root.mkdir()
+    cache.update_scan_path(str(root), "test")
+    return root
+
+def add_files(cache, root, contents):
+    """Crea los archivos {nombre relativo: bytes} bajo `root` y los registra en la caché. Devuelve sus rutas."""
+    paths = {}
+    for relative, data in contents.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        paths[relative] = str(path)
+    cache.insert_rows_batch([(path, str(root), len(contents[relative]), 0.0, "{}", "{}", 0)
+                             for relative, path in paths.items()])
+    return paths
+
+def cached_paths(cache, root):
+    return {row[0] for row in cache.iter_file_rows(str(root), ("file_path",))}
@@ -0,0 +1,102 @@
+import os
+import time
+from conftest import add_files, cached_paths
+from src.core.action_engine import ActionEngine, FileAction, OP_TRASH, OP_DELETE, OP_MOVE, OP_LINK
+from src.core.cache_manager import ACTION_DONE, ACTION_PLANNED, SESSION_COMPLETED
+
+def test_apply_then_undo_round_trip(cache, library):
+    paths = add_files(cache, library, {"a.mkv": b"a" * 100, "b.mkv": b"b" * 200, "c.mkv": b"c" * 300})
+    moved_to = str(library / "Otra" / "b.mkv")
+    engine = ActionEngine(cache)
+    run_id = engine.plan([FileAction(OP_TRASH, paths["a.mkv"]), FileAction(OP_MOVE, paths["b.mkv"], moved_to),
+                          FileAction(OP_DELETE, paths["c.mkv"])])
+    summary = engine.run(run_id)
+    assert summary["done"] == 3 and summary["failed"] == 0 and not summary["cancelled"]
+    assert not any(os.path.exists(path) for path in paths.values())
+    assert open(moved_to, "rb").read() == b"b" * 200
+    assert cached_paths(cache, library) == {moved_to}
+    trashed = [detail for _, op, _, _, state, detail in cache.get_action_items(run_id) if op == OP_TRASH]
+    assert trashed and os.path.exists(trashed[0])
+    assert [entry[0] for entry in cache.get_trash_entries()] == trashed
+
+    undo_id, lost = engine.plan_undo(run_id)
+    assert lost == [paths["c.mkv"]]
+    assert engine.run(undo_id)["done"] == 2
+    assert open(paths["a.mkv"], "rb").read() == b"a" * 100
+    assert open(paths["b.mkv"], "rb").read() == b"b" * 200
+    assert not os.path.exists(moved_to) and not os.path.exists(trashed[0])
+    # La caché sigue el movimiento de vuelta y el índice de la papelera olvida lo restaurado
+    assert paths["b.mkv"] in cached_paths(cache, library)
+    assert cache.get_trash_entries() == []
+
+def test_resume_after_partially_journaled_run(cache, library):
+    paths = add_files(cache, library, {"a.mkv": b"a", "b.mkv": b"b", "c.mkv": b"c", "d.mkv": b"d"})
+    moved_to = str(library / "Otra" / "b.mkv")
+    actions = [FileAction(OP_TRASH, paths["a.mkv"]), FileAction(OP_MOVE, paths["b.mkv"], moved_to),
+               FileAction(OP_TRASH, paths["c.mkv"]), FileAction(OP_DELETE, paths["d.mkv"])]
+    engine = ActionEngine(cache)
+    run_id = engine.plan(actions)
+
+    # Corte a medias: la primera acción llegó al diario; las dos siguientes se hicieron pero no se anotaron
+    first = engine.trash.trash(paths["a.mkv"])
+    cache.append_action_journal(run_id, [(0, OP_TRASH, paths["a.mkv"], None, ACTION_DONE, first)])
+    os.makedirs(os.path.dirname(moved_to))
+    os.rename(paths["b.mkv"], moved_to)
+    unjournaled = engine.trash.trash(paths["c.mkv"])
+
+    resumed = ActionEngine(cache)
+    summary = resumed.run(run_id)
+    assert summary["done"] == 4 and summary["failed"] == 0
+    assert cache.get_action_run(run_id)["status"] == SESSION_COMPLETED
+    items = cache.get_action_items(run_id)
+    assert all(state == ACTION_DONE for *_, state, _ in items)
+    # El envío que no llegó al diario se reconoce en la papelera y se puede deshacer
+    assert items[2][5] == unjournaled
+    assert not os.path.exists(paths["d.mkv"])
+
+    undo_id, lost = resumed.plan_undo(run_id)
+    assert lost == [paths["d.mkv"]]
+    resumed.run(undo_id)
+    assert all(os.path.exists(paths[name]) for name in ("a.mkv", "b.mkv", "c.mkv"))
+
+def test_resume_ignores_trash_entries_from_earlier_runs(cache, library):
+    paths = add_files(cache, library, {"a.mkv": b"old"})
+    engine = ActionEngine(cache)
+    older = engine.trash.trash(paths["a.mkv"])
+    with open(paths["a.mkv"], "wb") as f: f.write(b"new")
+    run_id = engine.plan([FileAction(OP_TRASH, paths["a.mkv"])])
+    # El plan es posterior al envío antiguo (created tiene resolución de segundos)
+    cache.conn.execute("UPDATE action_runs SET created = ? WHERE id = ?", (int(time.time()) + 10, run_id))
+    cache.conn.commit()
+    os.remove(paths["a.mkv"]) # Desaparece sin que esta ejecución lo haya enviado
+
+    assert cache.get_action_items(run_id)[0][4] == ACTION_PLANNED
+    ActionEngine(cache).run(run_id)
+    assert cache.get_action_items(run_id)[0][5] is None
+    assert os.path.exists(older)
+    assert ActionEngine(cache).plan_undo(run_id) == (None, [paths["a.mkv"]])
+
+def test_resumed_move_finishes_when_the_target_already_took_its_name(cache, library):
+    paths = add_files(cache, library, {"a.mkv": b"a" * 100, "b.mkv": b"b" * 100})
+    moved_a, moved_b = str(library / "Otra" / "a.mkv"), str(library / "Otra" / "b.mkv")
+    engine = ActionEngine(cache)
+    run_id = engine.plan([FileAction(OP_MOVE, paths["a.mkv"], moved_a), FileAction(OP_MOVE, paths["b.mkv"], moved_b)])
+    # Corte tras dar a la copia su nombre final y antes de borrar el origen; en b el destino es otro archivo
+    os.makedirs(os.path.dirname(moved_a))
+    with open(moved_a, "wb") as f: f.write(b"a" * 100)
+    with open(moved_b, "wb") as f: f.write(b"x" * 100)
+
+    summary = ActionEngine(cache).run(run_id)
+    assert summary["done"] == 1 and summary["failed"] == 1
+    assert not os.path.exists(paths["a.mkv"]) and open(moved_a, "rb").read() == b"a" * 100
+    # Un destino distinto no se toca ni se pierde el origen
+    assert open(paths["b.mkv"], "rb").read() == b"b" * 100 and open(moved_b, "rb").read() == b"x" * 100
+
+def test_link_replaces_a_stale_temp_link(cache, library):
+    paths = add_files(cache, library, {"a.mkv": b"same", "b.mkv": b"same"})
+    stale = f"{paths['a.mkv']}.mediaforge-link"
+    with open(stale, "wb") as f: f.write(b"corte anterior")
+    engine = ActionEngine(cache)
+    assert engine.run(engine.plan([FileAction(OP_LINK, paths["a.mkv"], paths["b.mkv"])]))["done"] == 1
+    assert os.path.samefile(paths["a.mkv"], paths["b.mkv"])
+    assert not os.path.exists(stale)
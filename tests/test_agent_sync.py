@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import pytest
+from src.agent.server import ScanAgent, create_server
+from src.core.agent_sync import AgentSyncClient
+from src.core.cache_manager import CacheManager
+from src.modules.scanners.default_scanner import DefaultScanner
+from src.utils.metadata_extractor import MetadataExtractor
+
+# Salida fija de ffprobe: un vídeo 1080p con una pista de audio
+FAKE_PROBE = {
+    "format": {"duration": "60.0", "bit_rate": "4000000"},
+    "streams": [
+        {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080},
+        {"codec_type": "audio", "codec_name": "aac", "channels": 2, "tags": {"language": "spa"}},
+    ],
+}
+
+@pytest.fixture
+def stub_ffprobe(tmp_path, monkeypatch):
+    script = tmp_path / "ffprobe"
+    script.write_text(f"#!/bin/sh\ncat <<'EOF'\n{json.dumps(FAKE_PROBE)}\nEOF\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(MetadataExtractor, "_ffprobe_exec", str(script))
+
+def write_video(path, size=1024):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+
+@pytest.fixture
+def agent_server(tmp_path, stub_ffprobe):
+    root = tmp_path / "nas"
+    write_video(root / "Serie" / "Serie S01E01.mkv")
+    write_video(root / "Serie" / "Serie S01E02.mkv")
+    agent = ScanAgent([str(root)], str(tmp_path / "agent.db"), DefaultScanner())
+    agent.scan()
+    server = create_server(agent, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, root
+    server.shutdown()
+    server.server_close()
+
+def local_paths(cache, root):
+    return {row[0] for row in cache.iter_file_rows(str(root), ("file_path",))}
+
+def test_pull_advances_token_and_applies_changes(tmp_path, agent_server):
+    server, root = agent_server
+    cache = CacheManager(str(tmp_path / "desktop.db"))
+    client = AgentSyncClient(f"http://127.0.0.1:{server.server_address[1]}", cache)
+
+    first = client.pull()
+    assert first["upserts"] == 2 and first["deletes"] == 0 and not first["full_resync"]
+    assert first["token"] > 0
+    assert len(local_paths(cache, root)) == 2
+    # Los metadatos sondeados en el agente llegan tal cual
+    metadata = [json.loads(row[0]) for row in cache.iter_file_rows(str(root), ("metadata_info_json",))]
+    assert all(item["width"] == 1920 and item["v_codec"] == "h264" for item in metadata)
+
+    # Sin cambios en el agente: el token no se mueve y no se descarga nada
+    again = client.pull()
+    assert again["token"] == first["token"] and again["upserts"] == again["deletes"] == 0
+
+    os.remove(root / "Serie" / "Serie S01E01.mkv")
+    write_video(root / "Serie" / "Serie S01E03.mkv")
+    server.RequestHandlerClass.agent.scan()
+    second = client.pull()
+    assert second["token"] > first["token"]
+    assert second["upserts"] == 1 and second["deletes"] == 1
+    assert {os.path.basename(path) for path in local_paths(cache, root)} == {"Serie S01E02.mkv", "Serie S01E03.mkv"}
+    cache.close()
+
+def test_pull_resyncs_after_epoch_reset(tmp_path, agent_server):
+    server, root = agent_server
+    cache = CacheManager(str(tmp_path / "desktop.db"))
+    client = AgentSyncClient(f"http://127.0.0.1:{server.server_address[1]}", cache)
+    client.pull()
+
+    # El agente arranca con una base de datos nueva (otra época) que solo conoce un archivo
+    os.remove(root / "Serie" / "Serie S01E01.mkv")
+    fresh = ScanAgent([str(root)], str(tmp_path / "agent-new.db"), DefaultScanner())
+    fresh.scan()
+    server.RequestHandlerClass.agent = fresh
+
+    summary = client.pull()
+    assert summary["full_resync"]
+    assert summary["upserts"] == 1
+    assert {os.path.basename(path) for path in local_paths(cache, root)} == {"Serie S01E02.mkv"}
+    assert client.pull() == {"upserts": 0, "deletes": 0, "full_resync": False, "token": summary["token"]}
+    cache.close()
+
+def test_server_refuses_remote_bind_without_opt_in(tmp_path):
+    agent = ScanAgent([str(tmp_path)], str(tmp_path / "agent.db"), DefaultScanner())
+    with pytest.raises(ValueError):
+        create_server(agent, host="0.0.0.0", port=0)
+    server = create_server(agent, host="0.0.0.0", port=0, allow_remote=True)
+    server.server_close()
@@ -0,0 +1,91 @@
+import os
+import pytest
+from conftest import add_files
+from src.core import action_engine
+from src.core.action_engine import ActionEngine, PART_SUFFIX, VERIFY_SAMPLE_BYTES, _copy_across_devices
+from src.core.library_organizer import ScatteredSeries, plan_moves, scattered_series, target_under
+from src.core.models import MediaFile
+from src.modules.matchers.media_name_matcher import MediaNameMatcher
+
+def test_plan_moves_reports_name_conflicts(cache, library):
+    paths = add_files(cache, library, {
+        "a/Dark Night/Dark.Night.S01E01.mkv": b"1" * 300,
+        "a/Dark Night/Dark.Night.S01E02.mkv": b"2" * 300,
+        "b/Dark Night/Dark.Night.S01E01.mkv": b"x" * 100, # Mismo nombre que uno que ya está en el destino
+        "b/Dark Night/Dark.Night.S01E03.mkv": b"3" * 100,
+        "b/Dark Night/Dark.Night.S01E04.mkv": b"4" * 100,
+    })
+    # Un archivo ajeno a la serie ocupa en el destino el nombre de otro episodio
+    (library / "a" / "Dark Night" / "Dark.Night.S01E04.mkv").write_bytes(b"otro")
+    files = [MediaFile(path, os.path.getsize(path), 0.0) for path in paths.values()]
+    series_list = scattered_series(MediaNameMatcher().merge_entities(files))
+    assert len(series_list) == 1
+    series = series_list[0]
+    target_dir = str(library / "a" / "Dark Night")
+    assert series.target == target_dir and series.bytes_to_move == 300
+
+    actions, conflicts = plan_moves([series])
+    assert [(action.source, action.target) for action in actions] == [
+        (paths["b/Dark Night/Dark.Night.S01E03.mkv"], os.path.join(target_dir, "Dark.Night.S01E03.mkv"))]
+    assert sorted(source for source, _ in conflicts) == sorted(
+        [paths["b/Dark Night/Dark.Night.S01E01.mkv"], paths["b/Dark Night/Dark.Night.S01E04.mkv"]])
+    reasons = dict(conflicts)
+    assert reasons[paths["b/Dark Night/Dark.Night.S01E01.mkv"]] == f"Mismo nombre que {paths['a/Dark Night/Dark.Night.S01E01.mkv']}"
+    assert reasons[paths["b/Dark Night/Dark.Night.S01E04.mkv"]].endswith("ya existe")
+
+    engine = ActionEngine(cache)
+    assert engine.run(engine.plan(actions))["done"] == 1
+    assert os.path.exists(os.path.join(target_dir, "Dark.Night.S01E03.mkv"))
+    # Los conflictos se quedan donde estaban
+    assert all(os.path.exists(source) for source, _ in conflicts)
+
+def test_common_target_uses_a_safe_folder_name(cache, library):
+    paths = add_files(cache, library, {"x/Que.Serie.S01E01.mkv": b"1", "y/Que.Serie.S01E02.mkv": b"2"})
+    files = [MediaFile(path, 1, 0.0) for path in paths.values()]
+    series = ScatteredSeries("Qué: Serie?", files, {str(library / "x"): 1, str(library / "y"): 1})
+    series.target = target_under(str(library / "Series"), series)
+    assert os.path.basename(series.target) == "Qué Serie"
+    actions, conflicts = plan_moves([series])
+    assert len(actions) == 2 and conflicts == []
+
+@pytest.fixture
+def recorded_offsets(monkeypatch):
+    """Desde dónde empieza cada copia entre dispositivos."""
+    offsets = []
+    real_stream_copy = action_engine._stream_copy
+    def stream_copy(source_fd, target_fd, offset, size):
+        offsets.append(offset)
+        real_stream_copy(source_fd, target_fd, offset, size)
+    monkeypatch.setattr(action_engine, "_stream_copy", stream_copy)
+    return offsets
+
+def test_cross_device_copy_resumes_from_part_file(tmp_path, recorded_offsets):
+    data = os.urandom(3 * VERIFY_SAMPLE_BYTES + 123)
+    source, target = tmp_path / "source.mkv", tmp_path / "dest" / "movie.mkv"
+    source.write_bytes(data)
+    target.parent.mkdir()
+    # Un corte anterior dejó copiado el primer tramo
+    part = tmp_path / "dest" / f"movie.mkv{PART_SUFFIX}"
+    part.write_bytes(data[:VERIFY_SAMPLE_BYTES])
+
+    _copy_across_devices(str(source), str(target))
+    assert recorded_offsets == [VERIFY_SAMPLE_BYTES]
+    assert target.read_bytes() == data
+    assert not part.exists() and not source.exists()
+
+def test_cross_device_copy_restarts_a_corrupt_part_file(tmp_path, recorded_offsets):
+    data = os.urandom(16 * VERIFY_SAMPLE_BYTES)
+    source, target = tmp_path / "source.mkv", tmp_path / "movie.mkv"
+    source.write_bytes(data)
+    # Escritura rota antes del corte, entre dos de las muestras que compara _verify_copy
+    torn = VERIFY_SAMPLE_BYTES + VERIFY_SAMPLE_BYTES // 2
+    prefix = bytearray(data[:4 * VERIFY_SAMPLE_BYTES])
+    prefix[torn] ^= 0xFF
+    part = tmp_path / f"movie.mkv{PART_SUFFIX}"
+    part.write_bytes(bytes(prefix))
+
+    _copy_across_devices(str(source), str(target))
+    # El temporal no coincide entero con el original: se copia de cero
+    assert recorded_offsets == [0]
+    assert target.read_bytes() == data
+    assert not part.exists() and not source.exists()
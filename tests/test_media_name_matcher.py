@@ -0,0 +1,87 @@
+import random
+import pytest
+from src.core.library_snapshot import LibrarySnapshot
+from src.core.models import MediaFile
+from src.modules.matchers import media_name_matcher
+from src.modules.matchers.media_name_matcher import MediaNameMatcher
+
+def folder_files(tmp_path, folders):
+    """Dos copias del mismo episodio en cada carpeta: cada entidad tiene ya un grupo propio."""
+    return [MediaFile(str(tmp_path / folder / name), 100, 0.0)
+            for folder in folders for name in ("Show.S01E01.mkv", "Show.S01E01.1080p.mkv")]
+
+def folders_of(entity):
+    return frozenset(f.parent.name for f in entity.files)
+
+def test_absorbed_entity_is_retracted(tmp_path, monkeypatch):
+    # Parecidos fijados a mano por conjunto de carpetas. Orden resultante:
+    # S y T se asientan y se entregan; X absorbe W y T los absorbe (vuelve a la
+    # cola); T absorbe Y y entonces S absorbe a T, que ya se había entregado.
+    similar = {frozenset([frozenset("X"), frozenset("W")]),
+               frozenset([frozenset("T"), frozenset("XW")]),
+               frozenset([frozenset("TXW"), frozenset("Y")]),
+               frozenset([frozenset("S"), frozenset("TXWY")])}
+    monkeypatch.setattr(media_name_matcher, "get_similarity_score",
+                        lambda a, b: 100.0 if frozenset([folders_of(a), folders_of(b)]) in similar else 0.0)
+    deliveries = []
+    final = MediaNameMatcher().find_duplicates(folder_files(tmp_path, "STXWY"), on_groups=deliveries.append)
+
+    assert [sorted(d.get("series", {})) or d["retracted"]["series"] for d in deliveries] == [["S"], ["T"], ["T"], ["S"]]
+    assert "retracted" in deliveries[2]
+    # Quien aplica las entregas en orden acaba con la estructura final, sin los archivos de T repetidos
+    series = {}
+    for delivery in deliveries:
+        for title in delivery.get("retracted", {}).get("series", []): series.pop(title, None)
+        series.update(delivery.get("series", {}))
+    assert series.keys() == final["series"].keys() == {"S"}
+    assert [len(group.files) for group in series["S"]] == [10]
+
+def reference_duration_score(entity_a, entity_b):
+    """El veto tal como se calculaba archivo a archivo."""
+    scores = []
+    for key in set(entity_a.episodes) & set(entity_b.episodes):
+        for fa in entity_a.episodes[key]:
+            for fb in entity_b.episodes[key]:
+                if fa.duration > 1 and fb.duration > 1:
+                    diff = abs(fa.duration - fb.duration) / max(fa.duration, fb.duration)
+                    if diff > 0.10: return None
+                    scores.append(max(0, 1 - diff / 0.05))
+    return sum(scores) / len(scores) if scores else 0.5
+
+def test_duration_score_matches_the_per_file_veto(tmp_path):
+    rng = random.Random(7)
+    def entity(folder):
+        files = []
+        for episode in rng.sample(range(1, 9), 5):
+            for copy in range(rng.randint(1, 3)):
+                media_file = MediaFile(str(tmp_path / folder / f"Show.S01E{episode:02d}.{copy}.mkv"), 100, 0.0)
+                media_file.parsed_info = {"season": 1, "episode": episode}
+                media_file.metadata_info = {"duration": rng.choice([0, 1300.0, 1310.0, 1340.0, 1500.0])}
+                files.append(media_file)
+        return files
+    outcomes = set()
+    for _ in range(50):
+        files_a, files_b = entity("a"), entity("b")
+        plain_a, plain_b = media_name_matcher.MediaEntity(tmp_path / "a", files_a), media_name_matcher.MediaEntity(tmp_path / "b", files_b)
+        expected = reference_duration_score(plain_a, plain_b)
+        outcomes.add(expected is None)
+        expected = pytest.approx(expected) if expected is not None else None
+        assert media_name_matcher.duration_score(plain_a, plain_b) == expected
+        # Con instantánea las duraciones salen de su columna; un archivo que no está en ella se lee aparte
+        snapshot = LibrarySnapshot.from_files(files_a + files_b[1:])
+        with_snapshot = [media_name_matcher.MediaEntity(tmp_path / name, files, snapshot)
+                         for name, files in (("a", files_a), ("b", files_b))]
+        assert media_name_matcher.duration_score(*with_snapshot) == expected
+    assert outcomes == {True, False} # Hay casos vetados y casos puntuados
+
+def test_merged_entity_keeps_its_durations(tmp_path):
+    def files(folder, duration):
+        media_file = MediaFile(str(tmp_path / folder / "Show.S01E01.mkv"), 100, 0.0)
+        media_file.parsed_info = {"season": 1, "episode": 1}
+        media_file.metadata_info = {"duration": duration}
+        return [media_file]
+    entity = media_name_matcher.MediaEntity(tmp_path / "a", files("a", 1300.0))
+    entity.episode_durations # Ya calculadas: la fusión las concatena
+    entity.merge(media_name_matcher.MediaEntity(tmp_path / "b", files("b", 1500.0)))
+    assert entity.episode_durations[1].tolist() == [1300.0, 1500.0]
+    assert media_name_matcher.duration_score(entity, media_name_matcher.MediaEntity(tmp_path / "c", files("c", 1310.0))) is None
@@ -0,0 +1,26 @@
+import threading
+import time
+from src.core.progress import ProgressAggregator
+
+def test_updates_from_several_threads_arrive_in_order():
+    seen = []
+    def on_update(stages):
+        time.sleep(0.001) # Una interfaz lenta: otro hilo puede tomar su instantánea mientras tanto
+        seen.append(stages[0].done)
+    progress = ProgressAggregator(on_update, fps=100000)
+    progress.start_stage("probe")
+    def work():
+        for _ in range(100): progress.advance("probe")
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert seen == sorted(seen)
+
+def test_flush_delivers_the_last_throttled_update():
+    seen = []
+    progress = ProgressAggregator(lambda stages: seen.append(stages[0].done), fps=1)
+    progress.start_stage("probe")
+    for _ in range(5): progress.advance("probe")
+    assert seen[-1] == 0 # Todo cayó dentro del límite de emisiones
+    progress.flush()
+    assert seen[-1] == 5
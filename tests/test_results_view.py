@@ -0,0 +1,32 @@
+from src.core.decision_store import DecisionStore
+from src.core.models import DuplicateGroup, MediaFile
+from src.ui.widgets.results_view import DuplicateResultsModel
+
+def episode(folders, count=2):
+    """Grupo S01E01 con `count` copias en cada carpeta (objetos nuevos en cada entrega, como llegan del proceso)."""
+    files = [MediaFile(f"/lib/{folder}/Show.S01E01.{i}.mkv", 100 + i, 0.0) for folder in folders for i in range(count)]
+    return DuplicateGroup(group_id="1-1.0", files=files, display_title="S01E01")
+
+def test_decisions_survive_redelivery_and_absorption(cache):
+    decisions = DecisionStore(cache)
+    model = DuplicateResultsModel()
+    model.decisions_changed.connect(decisions.record)
+    model.append_results({"series": {"A": [episode("A")]}, "movies": []})
+    model.append_results({"series": {"B": [episode("B")]}, "movies": []})
+    model.relayout()
+
+    # El usuario decide durante el escaneo: conserva la primera copia de A y la de B
+    for series in model._root.children:
+        group = series.children[0]
+        model.cycle_file(model.index_of(group.children[0]))
+
+    # A vuelve a llegar más grande y B, que A ha absorbido, se retira
+    model.append_results({"series": {"A": [episode("AB")]}, "movies": [], "retracted": {"series": ["B"], "movies": []}})
+    model.relayout()
+    assert model.group_count() == 1
+    recommendations = {f.path_str: f.recommendation for f in model.iter_files()}
+    assert recommendations == {"/lib/A/Show.S01E01.0.mkv": "KEEP", "/lib/A/Show.S01E01.1.mkv": "DELETE",
+                               "/lib/B/Show.S01E01.0.mkv": "KEEP", "/lib/B/Show.S01E01.1.mkv": "DELETE"}
+    # Lo marcado sigue llegando a las acciones con la clave del grupo nuevo
+    marked = model.files_marked(decisions.marked_for_deletion())
+    assert sorted(f.path_str for f in marked) == ["/lib/A/Show.S01E01.1.mkv", "/lib/B/Show.S01E01.1.mkv"]
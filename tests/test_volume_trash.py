@@ -0,0 +1,79 @@
+import os
+import pytest
+from conftest import add_files
+from src.core import action_engine, volume_trash
+from src.core.action_engine import ActionEngine, FileAction, OP_LINK, OP_MOVE, OP_TRASH
+from src.core.volume_trash import VolumeTrash
+from src.modules.scanners.default_scanner import DefaultScanner
+
+@pytest.fixture
+def two_devices(tmp_path, monkeypatch):
+    """Todo lo que cuelga de tmp_path/other pasa por estar en otro dispositivo."""
+    other = tmp_path / "other"
+    other.mkdir()
+    real_device_of = action_engine._device_of
+    def device_of(path):
+        device = real_device_of(path)
+        return device + 1 if os.path.abspath(path).startswith(str(other)) else device
+    monkeypatch.setattr(action_engine, "_device_of", device_of)
+    return other
+
+def test_trash_stays_on_the_volume_and_locates_newest(tmp_path, cache, library):
+    paths = add_files(cache, library, {"Serie/a.mkv": b"uno"})
+    trash = VolumeTrash(cache)
+    first = trash.trash(paths["Serie/a.mkv"])
+    assert first.startswith(str(tmp_path / ".mediaforge-trash-"))
+    assert os.lstat(first).st_dev == os.lstat(library).st_dev
+    add_files(cache, library, {"Serie/a.mkv": b"dos"})
+    second = trash.trash(paths["Serie/a.mkv"])
+    assert os.path.basename(first).startswith("0-") and os.path.basename(second).startswith("1-")
+    assert trash.locate(paths["Serie/a.mkv"]) == second
+
+def test_purge_empties_trash_and_index(cache, library):
+    paths = add_files(cache, library, {"a.mkv": b"a" * 10, "b.mkv": b"b" * 20})
+    trash = VolumeTrash(cache)
+    locations = [trash.trash(path) for path in paths.values()]
+    trash.record(list(zip(paths.values(), locations)))
+    assert trash.purge() == {"files": 2, "bytes": 30}
+    assert not any(os.path.exists(location) for location in locations)
+    assert cache.get_trash_entries() == []
+
+def test_cross_device_link_and_move_are_refused(cache, library, two_devices):
+    paths = add_files(cache, library, {"a.mkv": b"a", "b.mkv": b"b"})
+    kept = two_devices / "kept.mkv"
+    kept.write_bytes(b"a")
+    link = FileAction(OP_LINK, paths["a.mkv"], str(kept))
+    move = FileAction(OP_MOVE, paths["b.mkv"], str(two_devices / "b.mkv"))
+    same_device_move = FileAction(OP_MOVE, paths["a.mkv"], str(library / "Otra" / "a.mkv"))
+
+    engine = ActionEngine(cache)
+    assert [source for source, _ in engine.refusals([link, move, same_device_move])] == [paths["a.mkv"], paths["b.mkv"]]
+    with pytest.raises(ValueError):
+        engine.plan([same_device_move, move])
+    with pytest.raises(ValueError):
+        engine.plan([link])
+    # Nada se ha planificado ni tocado
+    assert cache.get_interrupted_action_run() is None
+    assert os.path.exists(paths["a.mkv"]) and os.path.exists(paths["b.mkv"])
+
+    # Con allow_cross_device los movimientos se aceptan, pero un enlace duro nunca cruza discos
+    permissive = ActionEngine(cache, allow_cross_device=True)
+    assert permissive.refusals([link, move]) == [(paths["a.mkv"], f"{kept} está en otro dispositivo")]
+
+def test_planning_does_not_create_trash_folders(tmp_path, cache, library):
+    paths = add_files(cache, library, {"a.mkv": b"a"})
+    engine = ActionEngine(cache)
+    assert engine.trash.check(paths["a.mkv"]) is None
+    run_id = engine.plan([FileAction(OP_TRASH, paths["a.mkv"])])
+    assert list(tmp_path.glob(".mediaforge-trash-*")) == []
+    # La papelera aparece con el primer envío
+    assert engine.run(run_id)["done"] == 1
+    assert len(list(tmp_path.glob(".mediaforge-trash-*"))) == 1
+
+def test_scan_skips_a_trash_inside_the_library(cache, library, monkeypatch):
+    # La raíz del volumen es la propia biblioteca: la papelera queda dentro de lo que se escanea
+    monkeypatch.setattr(volume_trash, "_mount_point", lambda path: str(library))
+    paths = add_files(cache, library, {"Movie.2020.mkv": b"a", "Otra/Movie.2020.mkv": b"a"})
+    trashed = VolumeTrash(cache).trash(paths["Movie.2020.mkv"])
+    assert trashed.startswith(str(library))
+    assert list(DefaultScanner().scan(library)) == [library / "Otra" / "Movie.2020.mkv"]